@@ -1,53 +1,89 @@
 import math
 import time
+import numpy as np
 from datetime import datetime
 from PIL import Image
 
 class CameraScanner():
-    def __init__(self, getfromcamera, config):
+    def __init__(self, getfromcamera, config, thumbnail_size=(100, 100)):
         self.getfromcamera = getfromcamera
         self.camera_width = config["camera"]["width"].get(int)
         self.camera_height = config["camera"]["height"].get(int)
         self.segment_rows = config["scanner"]["rows"].get(int)
         self.segment_cols = config["scanner"]["cols"].get(int)
-        segment_ceilwidth = math.ceil(self.camera_width / self.segment_cols)
-        segment_ceilheight = math.ceil(self.camera_height / self.segment_rows)
-        self.segment_size = math.floor(min(segment_ceilheight, segment_ceilwidth) * config["scanner"]["segment_overlap"].get())
         self.segment_size = config["scanner"]["segment_size"].get()
+        if not self.segment_size:
+            segment_ceilwidth = math.ceil(self.camera_width / self.segment_cols)
+            segment_ceilheight = math.ceil(self.camera_height / self.segment_rows)
+            self.segment_size = math.floor(min(segment_ceilheight, segment_ceilwidth) * config["scanner"]["segment_overlap"].get())
+        self.model_size = (config["model"]["input_width"].get(int), config["model"]["input_height"].get(int))
+        self.thumbnail_size = thumbnail_size
+        self.crop_tables = {}
         self.frame_image = None
+        self.scaled_frames = {}
 
     def get_frame_image(self):
         return self.frame_image
-    
+
     def get_segment_image(self, n):
         return self.segment_crop(n)
 
     def get_next_frame(self):
         self.frame_image = self.getfromcamera()
+        self.scaled_frames = {}
+
+    def crop_table(self, image_size):
+        """
+        The crop box of every segment for a frame size, worked out once per size.
+        """
+        if image_size not in self.crop_tables:
+            image_width, image_height = image_size
+            segment_floorwidth = image_width // self.segment_cols
+            segment_floorheight = image_height // self.segment_rows
+            boxes = []
+            for n in range(self.segment_cols*self.segment_rows):
+                segment_col = n % self.segment_cols
+                segment_row = n // self.segment_cols
+
+                # Shift segments that would overhang the frame back inside it
+                left = min(segment_floorwidth*segment_col, max(image_width-self.segment_size, 0))
+                top = min(segment_floorheight*segment_row, max(image_height-self.segment_size, 0))
+                boxes.append((left, top, left+self.segment_size, top+self.segment_size))
+            self.crop_tables[image_size] = boxes
+        return self.crop_tables[image_size]
 
     def segment_crop(self, n):
-        image_width, image_height = self.frame_image.size
-        segment_floorwidth = image_width // self.segment_cols
-        segment_floorheight = image_height // self.segment_rows
-        segment_col = n % self.segment_cols
-        segment_row = n // self.segment_cols
-
-        # Compute crop area
-        left = segment_floorwidth*segment_col
-        right = left+self.segment_size-1
-        if (right > image_width):
-            overlap = right-image_width
-            left -= overlap
-            right -= overlap
-        top = segment_floorheight*segment_row
-        bottom = top+self.segment_size-1
-        if (bottom > image_height):
-            overlap = bottom-image_height
-            top -= overlap
-            bottom -= overlap
-
-        # Crop it
-        cropped_image = self.frame_image.crop((left, top, right, bottom))
-        cropped_image = cropped_image.resize((self.segment_size, self.segment_size), Image.ANTIALIAS)
-        return cropped_image
+        return self.frame_image.crop(self.crop_table(self.frame_image.size)[n])
+
+    def scaled_frame(self, size):
+        """
+        The whole frame resampled once so that one segment comes out at size,
+        as an array that every segment can then be sliced from.
+        """
+        if size not in self.scaled_frames:
+            image_width, image_height = self.frame_image.size
+            xscale = size[0] / self.segment_size
+            yscale = size[1] / self.segment_size
+
+            # Shrink from an already scaled copy where there is a big enough one
+            source = self.frame_image
+            for frame, frame_xscale, frame_yscale in self.scaled_frames.values():
+                if frame_xscale >= xscale and frame_yscale >= yscale and frame.shape[1] < source.size[0]:
+                    source = Image.fromarray(frame)
+            scaled = source.resize((round(image_width*xscale), round(image_height*yscale)), Image.LANCZOS, reducing_gap=3.0)
+            self.scaled_frames[size] = (np.asarray(scaled), xscale, yscale)
+        return self.scaled_frames[size]
+
+    def scaled_segment(self, n, size):
+        frame, xscale, yscale = self.scaled_frame(size)
+        left, top, _, _ = self.crop_table(self.frame_image.size)[n]
+        frame_height, frame_width = frame.shape[:2]
+        x = min(round(left*xscale), max(frame_width-size[0], 0))
+        y = min(round(top*yscale), max(frame_height-size[1], 0))
+        return frame[y:y+size[1], x:x+size[0]]
+
+    def get_model_image(self, n):
+        return Image.fromarray(self.scaled_segment(n, self.model_size))
 
+    def get_thumbnail(self, n):
+        return Image.fromarray(self.scaled_segment(n, self.thumbnail_size))
@@ -10,6 +10,12 @@ class CameraZone:
         self.image = self.scanner.get_segment_image(self.id)
         return self.image
 
+    def get_model_image(self):
+        return self.scanner.get_model_image(self.id)
+
+    def get_thumbnail(self):
+        return self.scanner.get_thumbnail(self.id)
+
     def short_filename(self):
         return f"im{self.id}.jpg"    
 
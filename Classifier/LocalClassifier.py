@@ -0,0 +1,69 @@
+import logging
+import numpy as np
+
+from pigeonator.LocalModel import LocalModel, load_labels
+
+class LocalClassifier():
+    def __init__(self, endpoint, threads=4, labels=None, layout=None, mean=None, std=None, input_size=None, quantization=None, **kwargs):
+        """
+        Run an exported classification model on the Pi's own CPU instead of
+        calling the classifier server. endpoint is the path of the .onnx or
+        .tflite model and labels the path of a text file with one class name
+        per line, in the model's output order. Network options (wire_format,
+        client...) are accepted and ignored so this can be swapped in for
+        RemoteClassifier.
+        """
+        self.endpoint = endpoint
+        self.model = LocalModel(endpoint, threads, layout, mean, std, input_size, quantization)
+        self.labels = load_labels(labels)
+
+    def label_name(self, index):
+        if self.labels and index < len(self.labels):
+            return self.labels[index]
+        return str(index)
+
+    def probabilities(self, scores):
+        """
+        Softmax the outputs unless the model already gives probabilities.
+        """
+        scores = scores.astype(np.float64)
+        if scores.min() >= 0 and abs(scores.sum() - 1) < 0.01:
+            return scores
+        exps = np.exp(scores - scores.max())
+        return exps / exps.sum()
+
+    def outputs(self, scores):
+        probabilities = self.probabilities(scores.reshape(-1))
+        order = np.argsort(probabilities)[::-1]
+        labels = [[self.label_name(int(i)), float(probabilities[i])] for i in order]
+        return {"Prediction": [labels[0][0]], "Labels": labels}
+
+    def classify(self, images):
+        tensor = self.model.prepare(images)
+        _, scores = self.model.run(tensor)[0]
+        return [self.outputs(row) for row in scores.reshape(len(images), -1)]
+
+    def get_prediction(self, image):
+        """
+        Predict with the local classifier, returning the same Prediction/Labels
+        outputs as the classifier server.
+        """
+        try:
+            return self.classify([image])[0]
+        except Exception as error:
+            logging.error("Local classifier {model} failed: {error}", model=self.endpoint, error=str(error))
+            print(f"Local classifier {self.endpoint} failed: {error}")
+            return None
+
+    def get_predictions(self, images):
+        """
+        Predict a batch of images, in one run if the model takes a dynamic batch.
+        """
+        if not self.model.batch_dynamic:
+            return [self.get_prediction(image) for image in images]
+        try:
+            return self.classify(images)
+        except Exception as error:
+            logging.error("Local classifier {model} failed: {error}", model=self.endpoint, error=str(error))
+            print(f"Local classifier {self.endpoint} failed: {error}")
+            return [None] * len(images)
@@ -1,7 +0,0 @@
-import confuse
-
-class LocalConfiguration(confuse.Configuration):
-    def config_dir (self):
-        return "./"
-
-Config = LocalConfiguration("PigeonatorClassify")
\ No newline at end of file
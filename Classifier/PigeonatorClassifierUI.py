@@ -1,44 +1,63 @@
-import PySimpleGUI as sg
-import os.path
+import os
 import io
+import sys
 import time
-import picamera
-import RemoteClassifier
-import LinkTap
-import requests
-import base64
-import json
 import logging
-import logging.config
-import time
-import seqlog
-import importlib
+import requests
+
+# The shared pigeonator package is at the top of the repository
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from PIL import Image
-from datetime import datetime
-from gpiozero import CPUTemperature
-from ifttt_webhook import IftttWebhook
 from CameraScanner import CameraScanner
 from CameraZone import CameraZone
-from LocalConfiguration import *
+from ResultCache import ResultCache
+from ZoneScheduler import ZoneScheduler
+from pigeonator.PigeonatorApp import PigeonatorApp, launch, load_model
+from pigeonator.ActionExecutor import ActionError
+from pigeonator.LocalConfiguration import *
 
-seqlog.log_to_seq(
-   server_url=Config["seq"]["url"].get(),
-   api_key=Config["seq"]["api_key"].get(),
-   level=logging.DEBUG,
-   batch_size=10,
-   auto_flush_timeout=10,  # seconds
-   override_root_logger=True,
-   json_encoder_class=json.encoder.JSONEncoder  # Optional; only specify this if you want to use a custom JSON encoder
-)
+class PigeonatorClassifierUI(PigeonatorApp):
+    title = "Pigeonator Classifier UI"
 
+    def __init__(self, headless=False, started=None):
+        """
+        Classify square zones of each frame for pigeons, either all of them at
+        once or the zone most worth looking at next, and act on them.
+        """
+        super().__init__("classifier", headless, started)
+        self.frame_data = None
+        self.scanner = CameraScanner(lambda: self.get_camera_image(), Config)
 
-class PigeonatorClassifierUI:
-    def __init__(self):
+        self.zones = []
+        for id in range(self.scanner.segment_cols*self.scanner.segment_rows):
+            self.zones.append(CameraZone(id, self.scanner))
+            self.zones[id].is_active = True
+        self.scheduler = ZoneScheduler(
+            self.zones,
+            Settings.scheduler.adaptive,
+            Settings.scheduler.max_revisit,
+            Settings.scheduler.weights,
+            Settings.scheduler.recent_half_life,
+            Settings.scheduler.motion_scale,
+            Settings.scheduler.history_path)
+        self.reset_current_zone()
 
+        self.classifier_client = self.http_client("classifier")
+        self.ifttt_client = self.http_client("ifttt")
+        self.http_clients += [self.classifier_client, self.ifttt_client]
+        self.classifier_url = Settings.classifier.url
+        self.remote_classifier = self.classifier()
+        self.result_cache = ResultCache(
+            Settings.cache.max_entries if Settings.cache.active else 0,
+            Settings.cache.max_distance,
+            Settings.cache.ttl)
+        self.start()
+
+    def layout(self, sg):
         frame_image_column = [
             [sg.Image(key="-IMAGE-", size=(660,660), enable_events=True)],
-            [sg.Text("Exposure:"), sg.Combo(key="-EXPOSURE-", size=(12, 1), values=["Auto", "12000", "8000", "4000", "2000", "1500", "1000", "500"], default_value="Auto", readonly=True, enable_events=True),           
+            [sg.Text("Exposure:"), sg.Combo(key="-EXPOSURE-", size=(12, 1), values=["Auto", "12000", "8000", "4000", "2000", "1500", "1000", "500"], default_value="Auto", readonly=True, enable_events=True),
             sg.Text("Contrast:"), sg.Slider(key="-CONTRAST-", orientation="h", range=(-20, 20), size=(12, 12), disable_number_display=True, default_value=0, resolution=5, tooltip=0, enable_events =True)],
             [sg.Image(key="-IMAGE0-", size=(100,100), enable_events=True),
             sg.Image(key="-IMAGE1-", size=(100,100), enable_events=True),
@@ -52,85 +71,110 @@ class PigeonatorClassifierUI:
             sg.Text(key="-TEMP-", size=(27, 1), justification="right")]]
 
         # ----- Full layout -----
-        layout = [
+        return [
             [
                 sg.Column(frame_image_column),
             ]
-        ]   
+        ]
 
-        self.camera = picamera.PiCamera(resolution=(Config["camera"]["width"].get(), Config["camera"]["height"].get()), framerate=15)
-        self.camera.iso = 100
-        self.stream = io.BytesIO()
-        self.scanner = CameraScanner(lambda: self.get_camera_image(), Config)
-
-        self.zones = []
-        for id in range(self.scanner.segment_cols*self.scanner.segment_rows):
-            self.zones.append(CameraZone(id, self.scanner))
-            self.zones[id].is_active = True
-        self.reset_current_zone()
-        
-        self.window = sg.Window("Pigeonator Classifier UI", layout)
-        self.linktap = LinkTap.LinkTap(Config["linktap"]["username"].get(), Config["linktap"]["api_key"].get())
+    def setup_metrics(self):
+        super().setup_metrics()
+        self.classifications_total = self.metrics.counter("classifications_total", "Zone classifications, by label")
+        self.metrics.gauge("cache_hit_rate", "Fraction of classifications answered from the result cache", lambda: self.result_cache.stats()["hit_rate"])
 
     def reset_current_zone(self):
-        self.current_zone = -1
+        self.frame_zones = None
 
     def get_camera_image(self):
-        self.stream.seek(0)
-        image = Image.open(self.stream).convert('RGB')
-        self.stream.seek(0)
-        self.stream.truncate()   
-        return image
+        return Image.open(io.BytesIO(self.frame_data)).convert('RGB')
 
-    def get_next_zone(self):
-        self.current_zone = (self.current_zone+1) % len(self.zones)
-        if (self.current_zone == 0):
+    def next_frame(self):
+        with self.metrics.timer(self.stage_seconds, stage="decode"):
             self.scanner.get_next_frame()
-        return self.zones[self.current_zone]
-
-    def get_exposure(self):
-        return self.values["-EXPOSURE-"]
-
-    def get_contrast(self):
-        return int(self.values["-CONTRAST-"])
+        self.frame_zones = set()
+        for zone in self.zones:
+            self.scheduler.observe(zone.id, zone.get_thumbnail())
 
-    def get_detect_mode(self):
-        return self.values["-DETECT-"]
-
-    def get_deter_mode(self):
-        return self.values["-DETER-"]
+    def get_next_zone(self):
+        """
+        Pick the zone most worth classifying next, decoding a new frame once
+        the chosen zone has already been looked at in this one.
+        """
+        zone = self.scheduler.next_zone()
+        if zone != None and (self.frame_zones == None or zone.id in self.frame_zones):
+            self.next_frame()
+            zone = self.scheduler.next_zone()
+        if zone != None:
+            self.frame_zones.add(zone.id)
+            self.scheduler.visited(zone.id, zone.get_thumbnail())
+        return zone
 
     def set_classification(self, text):
         self.window["-CLASSIFICATION-"].update(text)
         self.window.refresh()
 
-    def set_temperature_display(self, text, color):
-        self.window["-TEMP-"].update(text, text_color=color)
-        self.window.refresh()
+    def camera_changed(self):
+        self.reset_current_zone()
+
+    def log_part_stats(self):
+        super().log_part_stats()
+        self.scheduler.log_stats()
+        logging.info("Result cache: {entries} entries, {hits} hits, {misses} misses, {expired} expired, hit rate {hit_rate}", **self.result_cache.stats())
+
+    def settings_changed(self, previous):
+        """
+        Rebuild the classifier if its section changed.
+        """
+        if self.settings.classifier != previous.classifier:
+            self.classifier_url = self.settings.classifier.url
+            self.remote_classifier = self.classifier()
+            logging.info("Switched classifier to {name} at {url}", name=self.settings.classifier.name, url=self.classifier_url)
 
     def classifier(self):
-        classifier_name = Config["classifier"]["name"].get()
-        classifier_url = Config["classifier"]["url"].get()
-        module = importlib.import_module(classifier_name)
-        clss = getattr(module, classifier_name)
-        return clss(classifier_url)
+        return load_model(Settings.classifier, wire_format=Settings.classifier.wire_format, jpeg_quality=Settings.classifier.jpeg_quality, client=self.classifier_client)
 
     def classify_image(self, image, n):
         zone = self.zones[n]
         if not zone.is_active:
             logging.warning("Zone {zone} is not active so not classified", zone=n)
             return
+        return self.interpret_prediction(self.predict_zones({n: image})[n], n)
 
-        imageForClassify = image.resize((Config["model"]["input_width"].get(int), Config["model"]["input_height"].get(int)), Image.ANTIALIAS)
-
-        # Make prediction
-        classifier = self.classifier()
-        prediction = classifier.get_prediction(imageForClassify)
+    def predict_zones(self, zone_images):
+        """
+        Classify the model-sized images of one or more zones. Zones that haven't
+        changed since they were last classified are answered from the result
+        cache and the rest sent in a single batched request. Returns a dict of
+        zone id to prediction, None where a zone couldn't be classified.
+        """
+        keys = {n: self.result_cache.key(image, n) for n, image in zone_images.items()}
+        predictions = {n: self.result_cache.get(self.classifier_url, keys[n]) for n in keys}
+        changed = [n for n in keys if predictions[n] == None]
+        if changed:
+            imagesForClassify = [self.model_image(zone_images[n]) for n in changed]
+            start = time.perf_counter()
+            batch = self.remote_classifier.get_predictions(imagesForClassify)
+            self.record_inference(time.perf_counter() - start, self.remote_classifier, "batch_inference" if len(changed) > 1 else "inference")
+            for n, prediction in zip(changed, batch):
+                predictions[n] = prediction
+                if prediction != None:
+                    self.result_cache.put(self.classifier_url, keys[n], prediction)
+        return predictions
+
+    def model_image(self, image):
+        size = (Settings.model.input_width, Settings.model.input_height)
+        if image.size == size:
+            return image
+        return image.resize(size, Image.LANCZOS)
+
+    def interpret_prediction(self, prediction, n):
         if (prediction == None):
+            self.errors_total.inc()
             self.set_classification("ERROR")
             return None
-        
+
         label = prediction["Prediction"][0]
+        self.classifications_total.inc(label=label)
 
         # Find confidence of prediction from all labels
         labels = prediction["Labels"]
@@ -141,180 +185,139 @@ class PigeonatorClassifierUI:
                 break
 
         logging.info("Classified zone {camera} as {label} @ {confidence}", label=label, camera=n, confidence=confidence)
-        print(f"Classified zone {n} as {label} @ {confidence} - temp={self.cpu.temperature}C")
+        print(f"Classified zone {n} as {label} @ {confidence} - temp={self.temperature}C")
         return (label, confidence)
 
     def set_frame_image(self, image):
+        if self.headless:
+            return
         view = image.resize((660, 440))
         bio = io.BytesIO()
         view.save(bio, format="PNG")
         self.window[f"-IMAGE-"].update(data=bio.getvalue())
 
     def set_zone_image(self, n, image):
-        thumb = image.resize((100,100))
+        if self.headless:
+            return
+        thumb = image if image.size == (100,100) else image.resize((100,100))
         bio = io.BytesIO()
         thumb.save(bio, format="PNG")
         self.window[f"-IMAGE{n}-"].update(data=bio.getvalue())
 
-    def set_camera_exposure(self, exposure):
-        if exposure == "Auto":
-            self.camera.exposure_mode = 'auto'
-        else:
-            self.camera.exposure_mode = 'off'
-            self.camera.shutter_speed = int(exposure)
-        self.reset_current_zone()
-
-    def set_camera_contrast(self, contrast):
-        self.camera.contrast = contrast
-        self.window["-CONTRAST-"].SetTooltip(str(contrast))
-        self.reset_current_zone()
-
-    def save_classified_image(self, image, n, label):
-        label_dir = f"images/{label}"
-        if (not os.path.isdir(label_dir)):
-            os.makedirs(label_dir)
-        save_file = f"{label_dir}/{self.zones[n].long_filename()}"
-        image.save(save_file)
+    def save_classified_image(self, image, n, label, dedupe=True):
+        self.archive.save(image, f"images/{label}", f"im{n}", dedupe)
 
     def save_full_image(self, image):
-        dir = f"images/Full"
-        if (not os.path.isdir(dir)):
-            os.makedirs(dir)
+        self.archive.save(image, "images/Full", "frame", dedupe=False)
 
-        now = datetime.now()
-        date_time = now.strftime("%Y%m%d%H%M%S")
-        save_file = f"{dir}/frame-{date_time}.jpg"
-        image.save(save_file)
+    def ifttt_trigger(self, event, **values):
+        url = f"https://maker.ifttt.com/trigger/{event}/with/key/{Settings.ifttt.api_key}"
+        try:
+            self.ifttt_client.post(url, json=values)
+        except requests.RequestException:
+            raise ActionError(f"Could not trigger IFTTT event {event}")
 
-    def check_cpu_temperature(self):
+    def handle_classification(self, zone, zone_image, label, confidence):
         """
-        Check the CPU temperature and wait for cool down if necessary.
+        Save, report and deter if a zone has been classified as a pigeon.
         """
-        self.cpu = CPUTemperature()
-        self.temperature = round(self.cpu.temperature, 1)
-
-        while (self.cpu.temperature >= Config["cpu"]["throttle_temp"].get(int)):
-            logging.warning("Over-temperature throttling ({temp}C)...", temp=self.temperature)
-            print(f"Over-temperature throttling ({self.temperature}C)...")
-            self.set_temperature_display(f"{self.temperature}C", "red")
-            time.sleep(Config["cpu"]["throttle_sleep"].get(int))
-            self.cpu = CPUTemperature()
-            self.temperature = round(self.cpu.temperature, 1)
-        logging.debug("System temperature {temp}C", temp=self.temperature)
-        self.set_temperature_display(f"{self.temperature}C", "white")
-
-    def image_to_base64(self, image):
-        in_mem_file = io.BytesIO()
-        image.save(in_mem_file, format = "PNG")
-        
-        # reset file pointer to start
-        in_mem_file.seek(0)
-        img_bytes = in_mem_file.read()
-        return base64.b64encode(img_bytes).decode('ascii')
-
-    def fire_sprinkler(self, secs, label):
-        try:
-            secs = max(secs, 3)
-            logging.info(f"Deterring {label} with sprinkler for {secs} seconds", label=label)
-            self.linktap.activate_instant_mode(Config["linktap"]["gateway_id"].get(), Config["linktap"]["taplinker_id"].get(), True, 0, secs, False)
-            print(f"Deterring {label} with sprinkler for {secs} seconds")
-        except:
-            logging.error("Failed to execute linktap command")
-            print("Failed to execute linktap command")
-
-    def imgbb_upload(self, image, label, description):
-        payload = {
-            "key": Config["imgbb"]["api_key"].get(),
-            "image": self.image_to_base64(image),
-            "name": description,
-            "expiration": 3600*24
+        if label == "Pigeon" and confidence >= Settings.model.confidence_threshold:
+            self.detections_total.inc(label=label)
+            self.scheduler.detected(zone.id)
+            self.save_classified_image(zone_image, zone.id, label)
+            description = f"{label}-{zone.long_filename()}"
+            self.actions.submit("imgbb", self.upload_image, zone_image, label, description, callback=self.action_done)
+
+            if Settings.ifttt.active:
+                self.actions.submit("ifttt", self.ifttt_trigger, "PigeonatorDetect", callback=self.action_done, value1=label, value2=confidence, value3=str(zone.id))
+
+            logging.info("Detected {label} @ {confidence} in zone {zone}", label=label, confidence=confidence, zone=zone.id)
+            if self.get_deter_mode():
+                self.fire_sprinkler(15, label)
+
+    def stages(self):
+        return {
+            "preprocess": self.preprocess_frame,
+            "infer": self.infer_frame,
+            "postprocess": self.interpret_frame,
+            "actions": self.act_on_frame,
+            "sinks": self.show_frame,
         }
-        if not(Config["imgbb"]["active"].get(bool)):
-            return ("None", "None", "None")
-
-        reply = requests.post(Config["imgbb"]["upload_url"].get(), payload)
-        if reply.reason=="OK":
-            result = json.loads(reply.content)
-            data = result["data"]
-            url = data["url_viewer"]
-            thumb_url = data["thumb"]["url"]
-            image_url = data["url"]
-            logging.info("Saved IMGBB image {url} for {label}", url=image_url, label=label)
-            return (url, thumb_url, image_url)
-
-        logging.error("Unable to save IMGBB image for {label}", label=label)
-        return None, 
-
-
-    def run(self):
-        # Run the Event Loop
-        for _ in self.camera.capture_continuous(self.stream, format='jpeg', resize=None, use_video_port=True):
-            event, self.values = self.window.read(timeout=500)
-            if event == "Exit" or event == sg.WIN_CLOSED:
-                break
 
-            if event == "__TIMEOUT__":  
-                current_zone = self.get_next_zone()
-                if current_zone.id == 0:
-                    frame_image = self.scanner.get_frame_image()
-                    self.set_frame_image(frame_image)
-                    frame_image.save("images/im.jpg")
-                    self.check_cpu_temperature()
-
-                zone_image = current_zone.get_image()
-                zone_image.save(f"images/im{current_zone.id}.jpg")
-                self.set_zone_image(current_zone.id, zone_image)
-
-                if self.get_detect_mode():
-                    result = self.classify_image(zone_image, current_zone.id)
-                    if result==None:
-                        continue
-                    label, confidence = result
-                        
-                    if label == "Pigeon" and confidence >= Config["model"]["confidence_threshold"].get(float):
-                        self.save_classified_image(zone_image, current_zone.id, label)
-                        description = f"{label}-{current_zone.long_filename()}"
-                        url, _, _ = self.imgbb_upload(zone_image, label, description)
-
-                        if Config["ifttt"]["active"].get(bool):
-                            ifttt = IftttWebhook(Config["ifttt"]["api_key"].get())
-                            ifttt.trigger("PigeonatorDetect", value1=label, value2=confidence, value3=str(current_zone.id))
-
-                        logging.info("Detected {label} @ {confidence} in zone {zone} and saved image: {im}", label=label, confidence=confidence, im=url, zone=current_zone.id)
-                        if self.get_deter_mode():
-                            self.fire_sprinkler(15, label)
-
-            if event == "-EXPOSURE-":
-                self.set_camera_exposure(self.get_exposure())
-
-            if event == "-CONTRAST-":
-                self.set_camera_contrast(self.get_contrast())
-
-            for i in range(6):
-              if event == f"-IMAGE{i}-":
-                self.set_classification("Working...")
-                zone_image = self.zones[i].get_image()
-                result = self.classify_image(zone_image, i)
-                if result==None:
-                    self.set_classification("Not classified")
-                    break
+    def preprocess_frame(self, frame):
+        """
+        Pick the zones to classify: every zone of a newly decoded frame when
+        batching, otherwise the zone most worth classifying next, decoding the
+        frame only once that zone has already been looked at in the current one.
+        """
+        self.frame_data = frame.data
+        last_image = self.scanner.get_frame_image()
+        if Settings.classifier.batch:
+            with self.metrics.timer(self.stage_seconds, stage="decode"):
+                self.scanner.get_next_frame()
+            zones = self.zones
+        else:
+            zone = self.get_next_zone()
+            zones = [zone] if zone != None else []
+
+        frame_image = self.scanner.get_frame_image()
+        frame.frame_image = frame_image if frame_image is not last_image else None
+        frame.zone_images = {zone.id: zone.get_image() for zone in zones}
+        frame.thumbnails = {} if self.headless else {zone.id: zone.get_thumbnail() for zone in zones}
+        frame.model_images = {}
+        if self.get_detect_mode():
+            frame.model_images = {zone.id: zone.get_model_image() for zone in zones if zone.is_active}
+        return frame
+
+    def infer_frame(self, frame):
+        frame.predictions = self.predict_zones(frame.model_images) if frame.model_images else {}
+        return frame
+
+    def interpret_frame(self, frame):
+        frame.results = {n: self.interpret_prediction(prediction, n) for n, prediction in frame.predictions.items()}
+        return frame
+
+    def act_on_frame(self, frame):
+        for n, result in frame.results.items():
+            if result != None:
                 label, confidence = result
+                self.handle_classification(self.zones[n], frame.zone_images[n], label, confidence)
+        return frame
+
+    def show_frame(self, frame):
+        if frame.frame_image is not None:
+            self.set_frame_image(frame.frame_image)
+            frame.frame_image.save("images/im.jpg")
+        for n, zone_image in frame.zone_images.items():
+            zone_image.save(f"images/im{n}.jpg")
+            if n in frame.thumbnails:
+                self.set_zone_image(n, frame.thumbnails[n])
+        return frame
+
+    def handle_event(self, event):
+        super().handle_event(event)
+
+        for i in range(6):
+          if event == f"-IMAGE{i}-":
+            self.set_classification("Working...")
+            zone_image = self.zones[i].get_image()
+            result = self.classify_image(self.zones[i].get_model_image(), i)
+            if result==None:
+                self.set_classification("Not classified")
+                break
+            label, confidence = result
 
-                if label == "Pigeon":
-                    description = f"{label}-{self.zones[i].long_filename()}"
-                    #url, _, _ = self.imgbb_upload(zone_image, label, description)
-                    #ifttt = IftttWebhook(Secrets.IFTTT_API_KEY)
-                    #ifttt.trigger("PigeonatorDetect", value1=label, value2=str(i), value3=url)
+            if label == "Pigeon":
+                description = f"{label}-{self.zones[i].long_filename()}"
+                #url, _, _ = self.imgbb_upload(zone_image, label, description)
+                #self.ifttt_trigger("PigeonatorDetect", value1=label, value2=str(i), value3=url)
 
-                # Save in an ALL batch
-                self.save_classified_image(zone_image, i, "Training")
-                self.save_full_image(self.scanner.get_frame_image())
+            # Save in an ALL batch
+            self.save_classified_image(zone_image, i, "Training", dedupe=False)
+            self.save_full_image(self.scanner.get_frame_image())
 
-        self.window.close()
+def main(argv=None, started=None):
+    launch(PigeonatorClassifierUI, "Classify camera zones for pigeons and deter them", argv, started)
 
-def main():
-    ui = PigeonatorClassifierUI()
-    ui.run()
-    
 if __name__ == '__main__':
-  main()
\ No newline at end of file
+  main()
@@ -1,43 +1,38 @@
-import json
-import io
-import base64
-import requests
 import logging
+import requests
+
+from pigeonator import WireFormat
+from pigeonator.RemoteModel import RemoteModel
 
-class RemoteClassifier():
-    def __init__(self, endpoint):
-        self.endpoint = endpoint
+class RemoteClassifier(RemoteModel):
+    def __init__(self, endpoint, wire_format=WireFormat.JSON_PNG, jpeg_quality=85, client=None, deadline=None):
+        super().__init__(endpoint, wire_format, jpeg_quality, client, deadline)
+        self.batch_supported = True
 
-    def get_prediction(self, image):
+    def get_predictions(self, images):
         """
-        Predict with the remote classifier!
+        Predict a batch of same-sized images with one request. The server replies
+        with a list of outputs, one per image, in the same order. Servers that
+        reply that they can't take a batch (eg. 404 or 415, or a reply of the
+        wrong shape) are remembered and sent one request per image instead. Any
+        other failure, eg. a 503 while the server restarts, only fails this batch.
         """
-
-        in_mem_file = io.BytesIO()
-        image.save(in_mem_file, format = "PNG")
-        
-        # reset file pointer to start
-        in_mem_file.seek(0)
-        img_bytes = in_mem_file.read()
-
-        b64data = base64.b64encode(img_bytes).decode('ascii')
-        
-        payload = "{\"inputs\":{\"Image\":\"%s\"}}" % b64data
-        try:
-            response = requests.request("POST", self.endpoint, data=payload)
-            if response.reason == "OK":
-                result = json.loads(response.text)
-                outputs = result['outputs']
-                # print(response.text)
-            else:
-                print(response.reason)
-                outputs = None
-            return outputs
-        except:
-            logging.error("Could not contact: {endpoint}", endpoint=self.endpoint)
-            print(f"Could not contact: {self.endpoint}")
-            return None
-
-
-
-
+        if self.batch_supported and len(images) > 1:
+            payload, headers = WireFormat.encode_batch(images, self.wire_format, self.jpeg_quality)
+            try:
+                response = self.post(payload, headers, self.request_deadline())
+                if response.status_code not in WireFormat.UNSUPPORTED_STATUS_CODES and response.status_code != requests.codes.ok:
+                    logging.error("{endpoint} failed a batch of {count} ({code})", endpoint=self.endpoint, count=len(images), code=response.status_code)
+                    print(f"{self.endpoint} failed a batch of {len(images)} ({response.status_code})")
+                    return [None] * len(images)
+                outputs = self.parse_response(response) if response.status_code == requests.codes.ok else None
+                if isinstance(outputs, list) and len(outputs) == len(images):
+                    return outputs
+                logging.warning("{endpoint} did not accept a batch of {count} ({code}), classifying one at a time", endpoint=self.endpoint, count=len(images), code=response.status_code)
+                self.batch_supported = False
+            except (requests.RequestException, ValueError, KeyError) as error:
+                logging.error("Could not contact: {endpoint}: {error}", endpoint=self.endpoint, error=str(error))
+                print(f"Could not contact: {self.endpoint}: {error}")
+                return [None] * len(images)
+
+        return [self.get_prediction(image) for image in images]
@@ -0,0 +1,71 @@
+import time
+import threading
+import collections
+
+from pigeonator.ImageHash import dhash, hamming
+
+class ResultCache():
+    def __init__(self, max_entries=64, max_distance=0, ttl=60):
+        """
+        An LRU cache of classification results keyed by model endpoint, zone
+        and the perceptual hash of the zone's image. A lookup matches any entry
+        for the same endpoint and zone within max_distance bits of the image's
+        hash, so a patch of lawn that hasn't changed isn't sent for
+        classification again. Entries older than ttl seconds are thrown away.
+        """
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def key(self, image, zone):
+        return (zone, dhash(image))
+
+    def get(self, endpoint, key):
+        """
+        Returns the cached result for a similar image of the same zone, or None.
+        """
+        zone, image_hash = key
+        now = time.time()
+        with self.lock:
+            match = None
+            best = self.max_distance + 1
+            for entry_key, (result, stored) in list(self.entries.items()):
+                if now - stored > self.ttl:
+                    del self.entries[entry_key]
+                    self.expired += 1
+                    continue
+                entry_endpoint, (entry_zone, entry_hash) = entry_key
+                if entry_endpoint == endpoint and entry_zone == zone:
+                    distance = hamming(entry_hash, image_hash)
+                    if distance < best:
+                        match, best = entry_key, distance
+
+            if match is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(match)
+            self.hits += 1
+            return self.entries[match][0]
+
+    def put(self, endpoint, key, result):
+        with self.lock:
+            self.entries[(endpoint, key)] = (result, time.time())
+            self.entries.move_to_end((endpoint, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
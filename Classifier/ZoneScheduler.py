@@ -0,0 +1,113 @@
+import os
+import re
+import time
+import logging
+import numpy as np
+
+ZONE_FILE = re.compile(r"^im(\d+)-\d{14}(-\d+)*\.jpg$")
+
+def count_history(path, zone_count):
+    """
+    Count past detections per zone from the images saved by save_classified_image,
+    which are named im<zone>-<timestamp>-<ms>.jpg.
+    """
+    counts = [0] * zone_count
+    if path and os.path.isdir(path):
+        for name in os.listdir(path):
+            match = ZONE_FILE.match(name)
+            if match and int(match.group(1)) < zone_count:
+                counts[int(match.group(1))] += 1
+    return counts
+
+class ZoneScheduler():
+    def __init__(self, zones, adaptive=True, max_revisit=30, weights=None, recent_half_life=60, motion_scale=0.05, history_path=None):
+        """
+        Decide which zone to classify next. Each zone's priority adds up how long
+        it has been since it was classified, how much its thumbnail has changed
+        since then, how recently a pigeon was seen there and how often pigeons
+        have been seen there before, weighted by weights. A zone that hasn't been
+        classified for max_revisit seconds is always picked first, so quiet zones
+        are still checked. With adaptive off the zones are simply taken in turn.
+        """
+        self.zones = zones
+        self.adaptive = adaptive
+        self.max_revisit = max_revisit
+        self.weights = {"age": 1.0, "motion": 1.0, "recent": 2.0, "history": 0.5}
+        self.weights.update(weights or {})
+        self.recent_half_life = recent_half_life
+        self.motion_scale = motion_scale
+
+        count = len(zones)
+        self.last_visit = [None] * count
+        self.last_detection = [None] * count
+        self.baselines = [None] * count
+        self.motion = [0.0] * count
+        self.history = count_history(history_path, count)
+        self.visits = [0] * count
+        self.forced = 0
+        self.current_zone = -1
+
+    def grey(self, thumbnail):
+        return np.asarray(thumbnail.convert("L"), dtype=np.float32)
+
+    def observe(self, n, thumbnail):
+        """
+        Measure how much a zone has changed since it was last classified.
+        """
+        if self.baselines[n] is None:
+            self.motion[n] = 0.0
+        else:
+            self.motion[n] = float(np.mean(np.abs(self.grey(thumbnail) - self.baselines[n]))) / 255
+
+    def visited(self, n, thumbnail, now=None):
+        self.last_visit[n] = now or time.time()
+        self.baselines[n] = self.grey(thumbnail)
+        self.motion[n] = 0.0
+        self.visits[n] += 1
+
+    def detected(self, n, now=None):
+        self.last_detection[n] = now or time.time()
+        self.history[n] += 1
+
+    def priority(self, n, now):
+        age = min((now - self.last_visit[n]) / self.max_revisit, 1.0)
+        motion = min(self.motion[n] / self.motion_scale, 1.0)
+        recent = 0.0
+        if self.last_detection[n] is not None:
+            recent = 0.5 ** ((now - self.last_detection[n]) / self.recent_half_life)
+        history = self.history[n] / max(self.history) if max(self.history) else 0.0
+        return (self.weights["age"] * age + self.weights["motion"] * motion +
+                self.weights["recent"] * recent + self.weights["history"] * history)
+
+    def next_zone(self, now=None):
+        """
+        Returns the active zone most worth classifying next, or None if none are active.
+        """
+        active = [zone for zone in self.zones if zone.is_active]
+        if not active:
+            return None
+
+        if not self.adaptive:
+            ids = [zone.id for zone in active]
+            later = [n for n in ids if n > self.current_zone]
+            self.current_zone = later[0] if later else ids[0]
+            return self.zones[self.current_zone]
+
+        now = now or time.time()
+
+        # Zones never classified, or overdue, go first - the most overdue of all
+        overdue = [zone for zone in active if self.last_visit[zone.id] is None or now - self.last_visit[zone.id] >= self.max_revisit]
+        if overdue:
+            zone = min(overdue, key=lambda zone: self.last_visit[zone.id] or 0)
+            if self.last_visit[zone.id] is not None:
+                self.forced += 1
+        else:
+            zone = max(active, key=lambda zone: self.priority(zone.id, now))
+        self.current_zone = zone.id
+        return zone
+
+    def stats(self):
+        return {"visits": list(self.visits), "forced": self.forced, "history": list(self.history)}
+
+    def log_stats(self):
+        logging.info("Zone scheduler: {visits} visits, {forced} forced revisits, {history} detections", **self.stats())
@@ -0,0 +1,240 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import platform
+import numpy as np
+
+# The shared pigeonator package is at the top of the repository
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+from RemoteDetector import RemoteDetector
+from CameraFrame import CameraFrame
+from DetectionStore import DetectionStore
+from pigeonator.WireFormat import WIRE_FORMATS
+
+STAGES = ["decode", "resize", "encode", "http", "parse", "scale", "store", "preview"]
+
+class StubDetectorHandler(BaseHTTPRequestHandler):
+    """
+    Answers detect requests like the real detector server, with one Pigeon in the
+    middle of the frame. Optionally waits delay_ms to simulate inference time.
+    """
+    delay_ms = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+
+        outputs = {
+            "Items": [{"label": "Pigeon", "score": 0.9, "box": [250, 250, 350, 350]}],
+            "Elapsed": self.delay_ms
+        }
+        body = json.dumps({"outputs": outputs}).encode("utf-8")
+        self.send_response(200, "OK")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubDetectorServer():
+    def __init__(self, delay_ms=0):
+        handler = type("Handler", (StubDetectorHandler,), {"delay_ms": delay_ms})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/detect/stub"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+def load_frames(path, count, width, height):
+    """
+    Load JPEG frames from path. Files that aren't real JPEGs (eg. git-lfs pointers)
+    are skipped and, if none are left, synthetic camera-sized frames are used instead.
+    """
+    frames = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if not name.lower().endswith((".jpg", ".jpeg")):
+                continue
+            with open(os.path.join(path, name), "rb") as f:
+                data = f.read()
+            if data.startswith(b"\xff\xd8"):
+                frames.append(data)
+            if len(frames) >= count:
+                break
+
+    if not frames:
+        print(f"No readable JPEGs in {path}, using synthetic {width}x{height} frames")
+        rng = np.random.default_rng(0)
+        for _ in range(min(count, 4)):
+            noise = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+            image = Image.fromarray(noise).resize((width, height), Image.BILINEAR)
+            bio = io.BytesIO()
+            image.save(bio, format="JPEG")
+            frames.append(bio.getvalue())
+    return frames
+
+def run_detect_path(frame, detector, input_size, store, timings, preview_size=None):
+    """
+    Time one frame through the same steps as PigeonatorDetectorUI.detect_image and
+    set_display_image, recording milliseconds per stage in timings.
+    """
+    t0 = time.perf_counter()
+    camera_frame = CameraFrame(frame, preview_size)
+    image = camera_frame.preview()
+    t1 = time.perf_counter()
+    image_for_detect = image.resize(input_size, Image.LANCZOS)
+    t2 = time.perf_counter()
+    payload, headers = detector.encode_payload(image_for_detect)
+    t3 = time.perf_counter()
+    response = detector.post(payload, headers)
+    t4 = time.perf_counter()
+    prediction = detector.parse_response(response)
+    t5 = time.perf_counter()
+
+    image_width, image_height = camera_frame.size
+    xscale = image_width / input_size[0]
+    yscale = image_height / input_size[1]
+    boxes = []
+    for item in prediction["Items"]:
+        box = item["box"]
+        boxes.append((int(box[0]*xscale), int(box[1]*yscale), int(box[2]*xscale), int(box[3]*yscale)))
+    t6 = time.perf_counter()
+
+    for x1, y1, x2, y2 in boxes:
+        store.add("Pigeon", 0.9, ((x1, y1), (x2, y2)))
+    t7 = time.perf_counter()
+
+    view = image.resize((660, 660))
+    bio = io.BytesIO()
+    view.save(bio, format="PNG")
+    t8 = time.perf_counter()
+
+    marks = [t0, t1, t2, t3, t4, t5, t6, t7, t8]
+    for i, stage in enumerate(STAGES):
+        timings[stage].append((marks[i+1] - marks[i]) * 1000)
+    timings["total"].append((t8 - t0) * 1000)
+    return len(payload)
+
+def summarise(timings, wall_secs, payload_bytes):
+    summary = {"stages": {}}
+    for stage, values in timings.items():
+        values = np.array(values)
+        summary["stages"][stage] = {
+            "p50": round(float(np.percentile(values, 50)), 3),
+            "p95": round(float(np.percentile(values, 95)), 3),
+            "p99": round(float(np.percentile(values, 99)), 3),
+            "mean": round(float(values.mean()), 3)
+        }
+    frames = len(timings["total"])
+    summary["frames"] = frames
+    summary["fps"] = round(frames / wall_secs, 2)
+    summary["bytes_per_frame"] = int(np.mean(payload_bytes))
+    return summary
+
+def print_summary(summary, baseline=None):
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'vs base':>10}")
+    for stage, stats in summary["stages"].items():
+        change = ""
+        if baseline and stage in baseline["stages"] and baseline["stages"][stage]["p50"] > 0:
+            change = f"{(stats['p50'] / baseline['stages'][stage]['p50'] - 1) * 100:+.0f}%"
+        print(f"{stage:<10}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}{stats['mean']:>10}{change:>10}")
+    print(f"{summary['frames']} frames at {summary['fps']} fps, {summary['bytes_per_frame']} bytes per request")
+
+def find_regressions(summary, baseline, tolerance):
+    """
+    Return the stages whose p50 has slowed by more than tolerance (a fraction)
+    compared to the baseline.
+    """
+    regressions = []
+    for stage, stats in summary["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base and base["p50"] > 0 and stats["p50"] > base["p50"] * (1 + tolerance):
+            regressions.append(stage)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark of the detect path")
+    parser.add_argument("--images", default="../Training", help="directory of JPEG frames")
+    parser.add_argument("--frames", type=int, default=50, help="number of frames to time")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed frames to run first")
+    parser.add_argument("--width", type=int, default=2000, help="synthetic frame width")
+    parser.add_argument("--height", type=int, default=2000, help="synthetic frame height")
+    parser.add_argument("--input-size", type=int, nargs=2, default=(600, 600), help="model input width and height")
+    parser.add_argument("--url", help="benchmark against a real detector instead of the stub")
+    parser.add_argument("--wire-format", choices=WIRE_FORMATS, default=WIRE_FORMATS[0], help="request body format")
+    parser.add_argument("--jpeg-quality", type=int, default=85, help="quality for the jpeg and multipart formats")
+    parser.add_argument("--reduced-decode", action="store_true", help="decode frames at reduced scale as camera.reduced_decode does")
+    parser.add_argument("--delay-ms", type=int, default=0, help="simulated inference time of the stub")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="baseline file to compare against")
+    parser.add_argument("--save", action="store_true", help="save these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed p50 slowdown before failing")
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.frames, args.width, args.height)
+    timings = {stage: [] for stage in STAGES + ["total"]}
+
+    server = StubDetectorServer(args.delay_ms) if args.url is None else nullcontext()
+    with tempfile.TemporaryDirectory() as store_dir, server:
+        store = DetectionStore(os.path.join(store_dir, "bench.db"))
+        try:
+            detector = RemoteDetector(args.url or server.url, wire_format=args.wire_format, jpeg_quality=args.jpeg_quality)
+            payload_bytes = []
+            preview_size = (max(args.input_size[0], 660), max(args.input_size[1], 660)) if args.reduced_decode else None
+            for i in range(args.warmup):
+                run_detect_path(frames[i % len(frames)], detector, tuple(args.input_size), store, {stage: [] for stage in timings}, preview_size)
+
+            start = time.perf_counter()
+            for i in range(args.frames):
+                payload_bytes.append(run_detect_path(frames[i % len(frames)], detector, tuple(args.input_size), store, timings, preview_size))
+            wall_secs = time.perf_counter() - start
+        finally:
+            store.close()
+
+    summary = summarise(timings, wall_secs, payload_bytes)
+    summary["host"] = platform.node()
+    summary["machine"] = platform.machine()
+    summary["detector"] = args.url or "stub"
+    summary["wire_format"] = args.wire_format
+    summary["reduced_decode"] = args.reduced_decode
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif baseline:
+        regressions = find_regressions(summary, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
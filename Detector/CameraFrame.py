@@ -0,0 +1,46 @@
+import io
+
+from PIL import Image
+
+class CameraFrame():
+    def __init__(self, data, preview_size=None):
+        """
+        One captured frame, kept as its encoded bytes and decoded only as far as
+        each use needs. preview() decodes a JPEG at the smallest libjpeg scale
+        (1/2, 1/4 or 1/8) that still covers preview_size, which is plenty for the
+        model input, motion gate and display. full() decodes every pixel, and is
+        only needed to archive or annotate a detection. Without a preview_size,
+        or for formats other than JPEG, the preview is the full image.
+        """
+        self.data = data
+        self.preview_size = preview_size
+        self.full_image = None
+        self.preview_image = None
+
+        # Only reads the header
+        self.size = Image.open(io.BytesIO(data)).size
+
+    def full(self):
+        if self.full_image is None:
+            self.full_image = Image.open(io.BytesIO(self.data)).convert('RGB')
+        return self.full_image
+
+    def preview(self):
+        if self.full_image is not None:
+            return self.full_image
+        if self.preview_size is None:
+            return self.full()
+        if self.preview_image is None:
+            image = Image.open(io.BytesIO(self.data))
+            image.draft('RGB', self.preview_size)
+            self.preview_image = image.convert('RGB')
+        return self.preview_image
+
+    def scale_box(self, box, image):
+        """
+        Scale a box in frame coordinates to the given decoded image.
+        """
+        xscale = image.size[0] / self.size[0]
+        yscale = image.size[1] / self.size[1]
+        (x1, y1), (x2, y2) = box
+        return ((int(x1*xscale), int(y1*yscale)), (int(x2*xscale), int(y2*yscale)))
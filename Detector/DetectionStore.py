@@ -0,0 +1,218 @@
+import sys
+import csv
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+import collections
+
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    ts REAL NOT NULL,
+    label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    x INTEGER, y INTEGER, w INTEGER, h INTEGER,
+    area INTEGER,
+    track INTEGER
+);
+CREATE INDEX IF NOT EXISTS detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS detections_label_ts ON detections (label, ts);
+CREATE INDEX IF NOT EXISTS detections_location ON detections (x, y);
+"""
+
+COLUMNS = ["ts", "label", "confidence", "x1", "y1", "x2", "y2", "x", "y", "w", "h", "area", "track"]
+INSERT = f"INSERT INTO detections ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+def detection_row(label, confidence, box, ts=None, track=None):
+    (x1, y1), (x2, y2) = box
+    w = x2-x1
+    h = y2-y1
+    return (ts or time.time(), label, confidence, x1, y1, x2, y2, (x1+x2)//2, (y1+y2)//2, w, h, w*h, track)
+
+class DetectionStore():
+    def __init__(self, path, flush_interval=5, batch_size=500, max_buffer=10000, retention_days=180):
+        """
+        Record raw detections in an indexed SQLite database. add() only appends
+        to an in-memory buffer, so it never waits on the SD card; a background
+        thread writes the buffer in one transaction every flush_interval seconds,
+        or sooner once batch_size rows are waiting. If writes fall behind, the
+        buffer keeps the newest max_buffer rows. Rows older than retention_days
+        are deleted once an hour (0 keeps everything).
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self.buffer = collections.deque(maxlen=max_buffer)
+        self.condition = threading.Condition()
+        self.added = 0
+        self.written = 0
+        self.dropped = 0
+        self.deleted = 0
+        self.last_prune = 0
+
+        self.db = connect(path)
+        self.running = True
+        self.thread = threading.Thread(target=self.flush_loop, name="detection-store", daemon=True)
+        self.thread.start()
+
+    def add(self, label, confidence, box, ts=None, track=None):
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(detection_row(label, confidence, box, ts, track))
+            self.added += 1
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+
+    def flush(self):
+        with self.condition:
+            rows = list(self.buffer)
+            self.buffer.clear()
+        if rows:
+            try:
+                with self.db:
+                    self.db.executemany(INSERT, rows)
+                self.written += len(rows)
+            except sqlite3.Error as error:
+                logging.error("Could not write {count} detections to {path}: {error}", count=len(rows), path=self.path, error=str(error))
+        self.prune()
+
+    def prune(self):
+        now = time.time()
+        if self.retention_days <= 0 or now - self.last_prune < 3600:
+            return
+        self.last_prune = now
+        try:
+            with self.db:
+                cursor = self.db.execute("DELETE FROM detections WHERE ts < ?", (now - self.retention_days * 86400,))
+            self.deleted += cursor.rowcount
+        except sqlite3.Error as error:
+            logging.error("Could not prune detections in {path}: {error}", path=self.path, error=str(error))
+
+    def flush_loop(self):
+        while self.running:
+            with self.condition:
+                if len(self.buffer) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+            self.flush()
+
+    def stats(self):
+        with self.condition:
+            return {"buffered": len(self.buffer), "added": self.added, "written": self.written, "dropped": self.dropped, "deleted": self.deleted}
+
+    def log_stats(self):
+        logging.info("Detection store: {added} added, {written} written, {buffered} buffered, {dropped} dropped, {deleted} pruned", **self.stats())
+
+    def close(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
+        self.db.close()
+
+def parse_time(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+def where(args):
+    clauses, params = [], []
+    if args.label:
+        clauses.append("label = ?")
+        params.append(args.label)
+    if args.since:
+        clauses.append("ts >= ?")
+        params.append(parse_time(args.since))
+    if args.until:
+        clauses.append("ts < ?")
+        params.append(parse_time(args.until))
+    if args.min_confidence:
+        clauses.append("confidence >= ?")
+        params.append(args.min_confidence)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def hourly(db, args):
+    condition, params = where(args)
+    query = f"SELECT strftime('%Y-%m-%d %H:00', ts, 'unixepoch', 'localtime') AS hour, COUNT(*) FROM detections{condition} GROUP BY hour ORDER BY hour"
+    for hour, count in db.execute(query, params):
+        print(f"{hour}  {count}")
+
+def heatmap(db, args):
+    condition, params = where(args)
+    query = f"SELECT x / ? AS col, y / ? AS row, COUNT(*) FROM detections{condition} GROUP BY row, col"
+    cells = {(col, row): count for col, row, count in db.execute(query, [args.cell, args.cell] + params)}
+    if not cells:
+        return
+    cols = max(col for col, _ in cells) + 1
+    rows = max(row for _, row in cells) + 1
+    print(f"{args.cell}px cells")
+    for row in range(rows):
+        print(" ".join(f"{cells.get((col, row), 0):>6}" for col in range(cols)))
+
+def areas(db, args):
+    condition, params = where(args)
+    query = f"SELECT area / ? AS bin, COUNT(*) FROM detections{condition} GROUP BY bin ORDER BY bin"
+    for bin, count in db.execute(query, [args.bin] + params):
+        print(f"{bin*args.bin:>9}-{(bin+1)*args.bin-1:<9} {count}")
+
+def export(db, args):
+    condition, params = where(args)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(COLUMNS)
+    for row in db.execute(f"SELECT {', '.join(COLUMNS)} FROM detections{condition} ORDER BY ts", params):
+        writer.writerow((datetime.fromtimestamp(row[0]).strftime("%Y-%m-%d %H:%M:%S"),) + row[1:])
+
+def import_csv(db, args):
+    """
+    Load a rawdetect.csv written before the detection store existed.
+    """
+    rows = []
+    with open(args.csv) as f:
+        for fields in csv.reader(f):
+            ts, label, confidence, x1, y1, x2, y2 = fields[:7]
+            box = ((int(x1), int(y1)), (int(x2), int(y2)))
+            rows.append(detection_row(label, float(confidence), box, datetime.strptime(ts, "%Y-%m-%d %H:%M:%S").timestamp()))
+    with db:
+        db.executemany(INSERT, rows)
+    print(f"Imported {len(rows)} detections from {args.csv}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the detection store")
+    parser.add_argument("--db", default="detections.db", help="detection store database")
+    parser.add_argument("--label", help="only this label")
+    parser.add_argument("--since", help="from this local time, eg. 2024-05-01 or 2024-05-01T06:00")
+    parser.add_argument("--until", help="up to this local time")
+    parser.add_argument("--min-confidence", type=float, help="only detections at least this confident")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("hourly", help="detections per hour").set_defaults(run=hourly)
+    command = commands.add_parser("heatmap", help="detections per grid cell of the frame")
+    command.add_argument("--cell", type=int, default=200, help="cell size in pixels")
+    command.set_defaults(run=heatmap)
+    command = commands.add_parser("areas", help="histogram of box areas")
+    command.add_argument("--bin", type=int, default=5000, help="bin width in square pixels")
+    command.set_defaults(run=areas)
+    commands.add_parser("export", help="write detections as CSV").set_defaults(run=export)
+    command = commands.add_parser("import", help="load an old rawdetect.csv")
+    command.add_argument("csv", help="rawdetect.csv to load")
+    command.set_defaults(run=import_csv)
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    try:
+        args.run(db, args)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    main()
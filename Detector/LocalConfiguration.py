@@ -1,7 +0,0 @@
-import confuse
-
-class LocalConfiguration(confuse.Configuration):
-    def config_dir (self):
-        return "./"
-
-Config = LocalConfiguration("PigeonatorDetect")
\ No newline at end of file
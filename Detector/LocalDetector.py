@@ -0,0 +1,102 @@
+import time
+import logging
+import numpy as np
+
+from pigeonator.LocalModel import LocalModel, load_labels
+
+class LocalDetector():
+    def __init__(self, endpoint, threads=4, labels=None, score_threshold=0.3, layout=None, mean=None, std=None, input_size=None, quantization=None, **kwargs):
+        """
+        Run an exported detection model on the Pi's own CPU instead of calling
+        the detector server. endpoint is the path of the .onnx or .tflite model
+        and labels the path of a text file with one class name per line, in the
+        model's class index order. Network options (wire_format, client...) are
+        accepted and ignored so this can be swapped in for RemoteDetector.
+
+        Understands TFLite SSD-style outputs (normalised y1,x1,y2,x2 boxes,
+        classes, scores, count) and torchvision-style ONNX outputs (x1,y1,x2,y2
+        boxes in input pixels, labels, scores).
+        """
+        self.endpoint = endpoint
+        self.model = LocalModel(endpoint, threads, layout, mean, std, input_size, quantization)
+        self.labels = load_labels(labels)
+        self.score_threshold = score_threshold
+
+    def label_name(self, index):
+        index = int(index)
+        if self.labels and 0 <= index < len(self.labels):
+            return self.labels[index]
+        return str(index)
+
+    def is_count(self, name, position, outputs):
+        """
+        Whether an output is the number of detections: named so, or the fourth
+        of TFLite SSD's boxes, classes, scores and count. A one-element output
+        can otherwise be the labels or scores of a single detection.
+        """
+        name = name.lower()
+        if "num" in name or "count" in name:
+            return True
+        return self.model.backend == "tflite" and len(outputs) == 4 and position == 3
+
+    def split_outputs(self, outputs):
+        """
+        Work out which output is which from their names, shapes and values.
+        """
+        boxes = classes = scores = None
+        count = None
+        vectors = []
+        for position, (name, value) in enumerate(outputs):
+            value = np.asarray(value)
+            if value.ndim >= 2 and value.shape[-1] == 4:
+                boxes = value.reshape(-1, 4)
+            elif value.size == 1 and self.is_count(name, position, outputs):
+                count = int(value.reshape(-1)[0])
+            else:
+                vectors.append((name.lower(), value.reshape(-1)))
+
+        for name, value in vectors:
+            if "score" in name:
+                scores = value
+            elif "class" in name or "label" in name:
+                classes = value
+        for name, value in vectors:
+            if scores is None and value is not classes and not np.all(np.equal(np.mod(value, 1), 0)):
+                scores = value
+            elif classes is None and value is not scores:
+                classes = value
+
+        if count is not None:
+            boxes, classes, scores = boxes[:count], classes[:count], scores[:count]
+        return boxes, classes, scores
+
+    def get_prediction(self, image):
+        """
+        Predict with the local detector, returning the same Items/Elapsed outputs
+        as the detector server with boxes in the coordinates of the given image.
+        """
+        start = time.time()
+        try:
+            tensor = self.model.prepare([image])
+            boxes, classes, scores = self.split_outputs(self.model.run(tensor))
+
+            image_width, image_height = image.size
+            if self.model.backend == "tflite":
+                # Normalised y1, x1, y2, x2
+                boxes = boxes[:, [1, 0, 3, 2]] * [image_width, image_height, image_width, image_height]
+            else:
+                xscale = image_width / self.model.input_width
+                yscale = image_height / self.model.input_height
+                boxes = boxes * [xscale, yscale, xscale, yscale]
+
+            items = []
+            for box, label, score in zip(boxes, classes, scores):
+                if score >= self.score_threshold:
+                    items.append({"label": self.label_name(label), "score": float(score), "box": [float(n) for n in box]})
+        except Exception as error:
+            logging.error("Local detector {model} failed: {error}", model=self.endpoint, error=str(error))
+            print(f"Local detector {self.endpoint} failed: {error}")
+            return None
+        items.sort(key=lambda item: item["score"], reverse=True)
+
+        return {"Items": items, "Elapsed": int((time.time() - start) * 1000)}
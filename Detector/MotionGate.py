@@ -0,0 +1,98 @@
+import time
+import logging
+import numpy as np
+
+from PIL import Image
+
+class MotionGate():
+    def __init__(self, active=True, width=160, height=160, pixel_threshold=25, min_changed_fraction=0.002,
+                 grid_cols=8, grid_rows=8, min_region_fraction=0.05, learning_rate=0.05, max_skip_interval=10):
+        """
+        Decide whether a frame has changed enough to be worth sending to the detector.
+        A downsampled greyscale background is kept as a running average and each new
+        frame is compared against it. Takes the motion settings, eg. as **Settings.motion.
+        """
+        self.active = active
+        self.width = width
+        self.height = height
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.grid_cols = grid_cols
+        self.grid_rows = grid_rows
+        self.min_region_fraction = min_region_fraction
+        self.learning_rate = learning_rate
+        self.max_skip_interval = max_skip_interval
+
+        self.background = None
+        self.last_pass_time = 0
+        self.changed_fraction = 0.0
+        self.changed_regions = 0
+        # Whether the last frame passed because it moved, rather than being the
+        # first or overdue, or the gate being off
+        self.moved = False
+        self.passed_count = 0
+        self.skipped_count = 0
+
+    def reset(self):
+        """
+        Forget the background, eg. after an exposure or contrast change.
+        """
+        self.background = None
+
+    def downsample(self, image):
+        small = image.convert("L").resize((self.width, self.height), Image.BILINEAR)
+        return np.asarray(small, dtype=np.float32)
+
+    def measure(self, frame):
+        """
+        Compare a downsampled frame against the background and return the fraction of
+        changed pixels together with the number of grid regions that changed.
+        """
+        changed = np.abs(frame - self.background) > self.pixel_threshold
+        changed_fraction = float(changed.mean())
+
+        # Trim to a whole number of cells and average each one
+        cell_h = self.height // self.grid_rows
+        cell_w = self.width // self.grid_cols
+        cells = changed[:cell_h*self.grid_rows, :cell_w*self.grid_cols]
+        cells = cells.reshape(self.grid_rows, cell_h, self.grid_cols, cell_w).mean(axis=(1, 3))
+        changed_regions = int((cells >= self.min_region_fraction).sum())
+        return changed_fraction, changed_regions
+
+    def should_detect(self, image):
+        """
+        Returns True if the image should go to the detector.
+        """
+        self.moved = False
+        if not self.active:
+            return True
+
+        now = time.time()
+        frame = self.downsample(image)
+        if self.background is None:
+            self.background = frame
+            self.last_pass_time = now
+            self.passed_count += 1
+            return True
+
+        self.changed_fraction, self.changed_regions = self.measure(frame)
+        self.background += self.learning_rate * (frame - self.background)
+
+        moved = self.changed_fraction >= self.min_changed_fraction or self.changed_regions > 0
+        overdue = now - self.last_pass_time >= self.max_skip_interval
+        if moved or overdue:
+            if overdue and not moved:
+                logging.debug("Motion gate passing still frame after {secs}s", secs=round(now - self.last_pass_time, 1))
+            self.last_pass_time = now
+            self.passed_count += 1
+            self.moved = moved
+            return True
+
+        self.skipped_count += 1
+        return False
+
+    def skip_ratio(self):
+        total = self.passed_count + self.skipped_count
+        if total == 0:
+            return 0.0
+        return self.skipped_count / total
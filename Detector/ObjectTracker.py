@@ -0,0 +1,177 @@
+import time
+import math
+import logging
+
+def iou(a, b):
+    """
+    Intersection over union of two ((x1, y1), (x2, y2)) boxes.
+    """
+    (ax1, ay1), (ax2, ay2) = a
+    (bx1, by1), (bx2, by2) = b
+    w = min(ax2, bx2) - max(ax1, bx1)
+    h = min(ay2, by2) - max(ay1, by1)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = (ax2-ax1)*(ay2-ay1) + (bx2-bx1)*(by2-by1) - inter
+    return inter / union if union > 0 else 0.0
+
+def centre(box):
+    (x1, y1), (x2, y2) = box
+    return ((x1+x2)/2, (y1+y2)/2)
+
+class Track():
+    def __init__(self, id, result, now):
+        label, confidence, box, location, area = result
+        self.id = id
+        self.label = label
+        self.result = result
+        self.confidence = confidence
+        self.max_confidence = confidence
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.misses = 0
+        self.confirmed = False
+        self.actioned = False
+
+    @property
+    def box(self):
+        return self.result[2]
+
+    def dwell(self):
+        return self.last_seen - self.first_seen
+
+    def update(self, result, now, smoothing):
+        self.result = result
+        self.confidence += smoothing * (result[1] - self.confidence)
+        self.max_confidence = max(self.max_confidence, result[1])
+        self.last_seen = now
+        self.hits += 1
+        self.misses = 0
+
+    def smoothed_result(self):
+        """
+        The latest detection with the track's smoothed confidence.
+        """
+        label, _, box, location, area = self.result
+        return (label, round(self.confidence, 4), box, location, area)
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "label": self.label,
+            "hits": self.hits,
+            "dwell": round(self.dwell(), 1),
+            "confidence": round(self.confidence, 4),
+            "max_confidence": round(self.max_confidence, 4),
+            "confirmed": self.confirmed,
+            "actioned": self.actioned,
+        }
+
+class ObjectTracker():
+    def __init__(self, confidence_threshold, iou_threshold=0.3, max_centroid_distance=0.5, min_hits=3, min_dwell=1,
+                 smoothing=0.5, max_misses=3, max_age=10):
+        """
+        Follow detections from frame to frame. A detection continues the track
+        of the same label whose box it overlaps most (by IoU), or failing that
+        whose centre is within max_centroid_distance box sizes of its own;
+        anything else starts a new track. A track is confirmed once it has been
+        seen in min_hits frames over at least min_dwell seconds with a smoothed
+        confidence of confidence_threshold, so a single stray frame can't set
+        off the sprinkler. Tracks end after max_misses detection runs or
+        max_age seconds without being seen.
+        """
+        self.confidence_threshold = confidence_threshold
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.min_hits = min_hits
+        self.min_dwell = min_dwell
+        self.smoothing = smoothing
+        self.max_misses = max_misses
+        self.max_age = max_age
+
+        self.tracks = []
+        self.next_id = 1
+        self.started = 0
+        self.confirmed = 0
+        self.ended_unconfirmed = 0
+
+    def distance(self, track, box):
+        (x1, y1), (x2, y2) = track.box
+        size = max(x2-x1, y2-y1, 1)
+        tx, ty = centre(track.box)
+        bx, by = centre(box)
+        return math.hypot(tx-bx, ty-by) / size
+
+    def match(self, results):
+        """
+        Greedily pair tracks and detections, best overlap first.
+        """
+        pairs = []
+        for t, track in enumerate(self.tracks):
+            for d, result in enumerate(results):
+                if result[0] != track.label:
+                    continue
+                overlap = iou(track.box, result[2])
+                if overlap >= self.iou_threshold:
+                    pairs.append((1 + overlap, t, d))
+                else:
+                    distance = self.distance(track, result[2])
+                    if distance <= self.max_centroid_distance:
+                        pairs.append((1 - distance, t, d))
+
+        matches = {}
+        used = set()
+        for _, t, d in sorted(pairs, reverse=True):
+            if t not in matches and d not in used:
+                matches[t] = d
+                used.add(d)
+        return matches
+
+    def update(self, results, now=None):
+        """
+        Add one frame's detections, each (label, confidence, box, location, area),
+        and return the tracks seen in it.
+        """
+        now = now or time.time()
+        matches = self.match(results)
+
+        seen = []
+        for t, track in enumerate(self.tracks):
+            if t in matches:
+                track.update(results[matches[t]], now, self.smoothing)
+                seen.append(track)
+            else:
+                track.misses += 1
+
+        for d, result in enumerate(results):
+            if d not in matches.values():
+                track = Track(self.next_id, result, now)
+                self.next_id += 1
+                self.started += 1
+                self.tracks.append(track)
+                seen.append(track)
+
+        for track in seen:
+            if (not track.confirmed and track.hits >= self.min_hits and track.dwell() >= self.min_dwell
+                    and track.confidence >= self.confidence_threshold):
+                track.confirmed = True
+                self.confirmed += 1
+                logging.info("Confirmed track {id} of {label} after {hits} frames", id=track.id, label=track.label, hits=track.hits)
+
+        for track in [track for track in self.tracks if track.misses > self.max_misses or now - track.last_seen > self.max_age]:
+            self.end(track)
+        return seen
+
+    def end(self, track):
+        self.tracks.remove(track)
+        if not track.confirmed:
+            self.ended_unconfirmed += 1
+        logging.info("Track {id} of {label} ended: {hits} frames over {dwell}s, confidence {confidence} (max {max_confidence}), confirmed={confirmed}, actioned={actioned}", **track.stats())
+
+    def stats(self):
+        return {"active": len(self.tracks), "started": self.started, "confirmed": self.confirmed, "ended_unconfirmed": self.ended_unconfirmed}
+
+    def log_stats(self):
+        logging.info("Tracker: {active} active, {started} started, {confirmed} confirmed, {ended_unconfirmed} ended unconfirmed", **self.stats())
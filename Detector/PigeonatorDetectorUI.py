@@ -1,38 +1,82 @@
-import PySimpleGUI as sg
-import os.path
+import os
 import io
+import sys
 import time
-import picamera
-import RemoteDetector
-import LinkTap
-import requests
-import base64
-import json
 import logging
-import logging.config
-import time
-import seqlog
-import importlib
-
-from PIL import Image, ImageDraw, ImageEnhance, ImageFont
-from datetime import datetime
-from gpiozero import CPUTemperature
-from ifttt_webhook import IftttWebhook
-from LocalConfiguration import *
-
-seqlog.log_to_seq(
-   server_url=Config["seq"]["url"].get(),
-   api_key=Config["seq"]["api_key"].get(),
-   level=logging.DEBUG,
-   batch_size=10,
-   auto_flush_timeout=10,  # seconds
-   override_root_logger=True,
-   json_encoder_class=json.encoder.JSONEncoder  # Optional; only specify this if you want to use a custom JSON encoder
-)
-
-class PigeonatorDetectorUI:
-    def __init__(self):
+import threading
+
+# The shared pigeonator package is at the top of the repository
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+from MotionGate import MotionGate
+from CameraFrame import CameraFrame
+from ObjectTracker import ObjectTracker
+from DetectionStore import DetectionStore
+from pigeonator.PigeonatorApp import PigeonatorApp, launch, load_model
+from pigeonator.CircuitBreaker import CircuitBreaker, STATES
+from pigeonator.LocalConfiguration import *
+
+# Label of the whole-frame detection made on motion alone while the detector is down
+MOTION_LABEL = "Motion"
+
+FONT_PATH = "/usr/share/fonts/truetype/piboto/Piboto-Regular.ttf"
+
+class PigeonatorDetectorUI(PigeonatorApp):
+    title = "Pigeonator Detector UI"
+
+    def __init__(self, headless=False, started=None):
+        """
+        Detect pigeons in whole frames with an object detector, once the motion
+        gate has seen movement, and act on them.
+        """
+        super().__init__("detector", headless, started)
+        self.confidence_threshold = Settings.model.confidence_threshold
+        # The motion gate is used on the preprocess thread and replaced or
+        # reset on the window's
+        self.motion_lock = threading.Lock()
+        self.motion_gate = MotionGate(**Settings.motion)
+        self.click_lock = threading.Lock()
+        self.clicked = False
+        self.detection_store = DetectionStore(
+            Settings.store.path,
+            Settings.store.flush_interval,
+            Settings.store.batch_size,
+            Settings.store.max_buffer,
+            Settings.store.retention_days)
+        self.tracker = None
+        if Settings.tracker.active:
+            self.tracker = ObjectTracker(
+                self.confidence_threshold,
+                Settings.tracker.iou_threshold,
+                Settings.tracker.max_centroid_distance,
+                Settings.tracker.min_hits,
+                Settings.tracker.min_dwell,
+                Settings.tracker.smoothing,
+                Settings.tracker.max_misses,
+                Settings.tracker.max_age)
+
+        self.detector_client = self.http_client("detector")
+        self.http_clients.append(self.detector_client)
+        self.remote_detector = self.detector()
+        self.breaker = self.circuit_breaker()
+        self.fallback = self.fallback_detector()
+        self.font = self.load_font(80)
+        self.fonts = {}
+
+        # Decode just enough of each frame for detection and the display, if any
+        if Settings.camera.reduced_decode and self.headless:
+            self.preview_size = (Settings.model.input_width, Settings.model.input_height)
+        elif Settings.camera.reduced_decode:
+            self.preview_size = (max(Settings.model.input_width, 660), max(Settings.model.input_height, 660))
+        else:
+            self.preview_size = None
 
+        self.last_detect_time = 0
+        self.last_frame_time = time.time()
+        self.start()
+
+    def layout(self, sg):
         frame_image_column = [
             [sg.Image(key="-IMAGE-", size=(660,660), enable_events=True)],
             [sg.Text("Exposure:"), sg.Combo(key="-EXPOSURE-", size=(12, 1), values=["Auto", "12000", "8000", "4000", "2000", "1500", "1000", "500"], default_value="Auto", readonly=True, enable_events=True),           
@@ -45,187 +89,183 @@ class PigeonatorDetectorUI:
             sg.Text(key="-TEMP-", size=(5, 1), justification="right")]]
 
         # ----- Full layout -----
-        layout = [
+        return [
             [
                 sg.Column(frame_image_column),
             ]
-        ]  
-
-        self.camera = picamera.PiCamera(resolution=(Config["camera"]["width"].get(), Config["camera"]["height"].get()), framerate=15)
-        self.camera.iso = 100
-        self.stream = io.BytesIO()
-        self.confidence_threshold = Config["model"]["confidence_threshold"].get()
-       
-        self.window = sg.Window("Pigeonator Detector UI", layout)
-        self.linktap = LinkTap.LinkTap(Config["linktap"]["username"].get(), Config["linktap"]["api_key"].get())
-        self.font= ImageFont.truetype('/usr/share/fonts/truetype/piboto/Piboto-Regular.ttf', 80)
-    
-
-    def get_camera_image(self):
-        self.stream.seek(0)
-        image = Image.open(self.stream).convert('RGB')
-        self.stream.seek(0)
-        self.stream.truncate()   
-        return image
-
-    def get_exposure(self):
-        return self.values["-EXPOSURE-"]
-
-    def get_contrast(self):
-        return int(self.values["-CONTRAST-"])
-
-    def get_detect_mode(self):
-        return self.values["-DETECT-"]
-
-    def get_deter_mode(self):
-        return self.values["-DETER-"]
+        ]
+
+    def setup_metrics(self):
+        super().setup_metrics()
+        self.frame_seconds = self.metrics.histogram("frame_interval_seconds", "Time between frames")
+        self.server_seconds = self.metrics.histogram("server_elapsed_seconds", "Inference time reported by the detector")
+        self.metrics.gauge("motion_skipped", "Frames the motion gate kept from the detector", lambda: self.motion_gate.skipped_count)
+        self.degraded_total = self.metrics.counter("degraded_total", "Detections answered in degraded mode while the detector's circuit was open, by mode")
+        self.metrics.gauge("circuit_state", "1 for the state the detector's circuit is in", lambda: {state: int(self.breaker.state == state) for state in STATES}, "state")
+        self.metrics.gauge("circuit_state_seconds", "Time the detector's circuit has spent in each state", lambda: self.breaker.time_in_states(), "state")
+        self.metrics.gauge("circuit_opens", "Times the detector's circuit has opened", lambda: self.breaker.opens)
+
+    def queue_depths(self):
+        depths = super().queue_depths()
+        depths["store"] = self.detection_store.stats()["buffered"]
+        return depths
 
     def set_detection(self, text):
         self.window["-DETECTION-"].update(text)
         self.window.refresh()
 
-    def set_temperature_display(self, text, color):
-        self.window["-TEMP-"].update(text, text_color=color)
-        self.window.refresh()
-
     def set_elapsed_display(self, time):
         self.window["-ELAPSED-"].update(f"{time}ms")
         self.window.refresh()
 
     def set_frametime_display(self, time):
+        self.frame_seconds.observe(time / 1000)
         self.window["-FRAMETIME-"].update(f"{time}ms")
         self.window.refresh()
 
     def set_display_image(self, image):
-        view = image.resize((660, 660))
-        bio = io.BytesIO()
-        view.save(bio, format="PNG")
-        self.window[f"-IMAGE-"].update(data=bio.getvalue())
-        self.window.refresh()
-
-    def set_camera_exposure(self, exposure):
-        if exposure == "Auto":
-            self.camera.exposure_mode = 'auto'
-        else:
-            self.camera.exposure_mode = 'off'
-            self.camera.shutter_speed = int(exposure)
-
-
-    def set_camera_contrast(self, contrast):
-        self.camera.contrast = contrast
-        self.window["-CONTRAST-"].SetTooltip(str(contrast))
-
-
-    def detector(self):
-        detector_name = Config["detector"]["name"].get()
-        detector_url = Config["detector"]["url"].get()
-        module = importlib.import_module(detector_name)
-        clss = getattr(module, detector_name)
-        return clss(detector_url)
-
-    def check_cpu_temperature(self):
+        if self.headless:
+            return
+        with self.metrics.timer(self.stage_seconds, stage="display"):
+            view = image.resize((660, 660))
+            bio = io.BytesIO()
+            view.save(bio, format="PNG")
+            self.window[f"-IMAGE-"].update(data=bio.getvalue())
+            self.window.refresh()
+
+    def camera_changed(self):
+        with self.motion_lock:
+            self.motion_gate.reset()
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        # Held until the next frame is captured, which may be on another thread
+        if event == "-IMAGE-":
+            with self.click_lock:
+                self.clicked = True
+
+    def log_part_stats(self):
+        super().log_part_stats()
+        if hasattr(self.remote_detector, "log_stats"):
+            self.remote_detector.log_stats()
+        self.breaker.log_stats()
+        if self.tracker != None:
+            self.tracker.log_stats()
+        self.detection_store.log_stats()
+
+    def settings_changed(self, previous):
         """
-        Check the CPU temperature and wait for cool down if necessary.
+        Pass the confidence threshold on to the tracker, and rebuild the detector
+        and motion gate if their sections changed.
         """
-        self.cpu = CPUTemperature()
-        self.temperature = round(self.cpu.temperature, 1)
-
-        while (self.cpu.temperature >= Config["cpu"]["throttle_temp"].get(int)):
-            logging.warning("Over-temperature throttling ({temp}C)...", temp=self.temperature)
-            print(f"Over-temperature throttling ({self.temperature}C)...")
-            self.set_temperature_display(f"{self.temperature}C", "red")
-            time.sleep(Config["cpu"]["throttle_sleep"].get(int))
-            self.cpu = CPUTemperature()
-            self.temperature = round(self.cpu.temperature, 1)
-        logging.debug("System temperature {temp}C", temp=self.temperature)
-        self.set_temperature_display(f"{self.temperature}C", "white")
-
-    def image_to_base64(self, image):
-        in_mem_file = io.BytesIO()
-        image.save(in_mem_file, format = "PNG")
-        
-        # reset file pointer to start
-        in_mem_file.seek(0)
-        img_bytes = in_mem_file.read()
-        return base64.b64encode(img_bytes).decode('ascii')
-
-    def fire_sprinkler(self, secs, label):
-        try:
-            secs = max(secs, 3)
-            logging.info(f"Deterring {label} with sprinkler for {secs} seconds", label=label)
-            print(f"Deterring {label} with sprinkler for {secs} seconds")
-            self.linktap.activate_instant_mode(Config["linktap"]["gateway_id"].get(), Config["linktap"]["taplinker_id"].get(), True, 0, secs, False)
-            time.sleep(secs)
-        
-        except LinkTap.LinkTapError as error:
-            logging.error(f"Failed to execute linktap command: {error.message}")
-            print(f"Failed to execute linktap command: {error.message}")
-
-    def imgbb_upload(self, image, label, description):
-        payload = {
-            "key": Config["imgbb"]["api_key"].get(),
-            "image": self.image_to_base64(image.resize((600,600))),
-            "name": description,
-            "expiration": 3600*24
-        }
-        if not(Config["imgbb"]["active"].get(bool)):
-            return ("None", "None", "None")
-
-        reply = requests.post(Config["imgbb"]["upload_url"].get(), payload)
-        if reply.reason=="OK":
-            result = json.loads(reply.content)
-            data = result["data"]
-            url = data["url_viewer"]
-            thumb_url = data["thumb"]["url"]
-            image_url = data["url"]
-            logging.info("Saved IMGBB image {url} for {label}", url=image_url, label=label)
-            return (url, thumb_url, image_url)
-
-        logging.error("Unable to save IMGBB image for {label}", label=label)
-        return None, 
+        self.confidence_threshold = self.settings.model.confidence_threshold
+        if self.tracker != None:
+            self.tracker.confidence_threshold = self.confidence_threshold
+        if self.settings.detector != previous.detector:
+            old_detector, self.remote_detector = self.remote_detector, self.detector()
+            if hasattr(old_detector, "close"):
+                old_detector.close()
+            logging.info("Switched detector to {name} at {url}", name=self.settings.detector.name, url=self.settings.detector.url)
+        if self.settings.detector != previous.detector or self.settings.circuit != previous.circuit:
+            self.breaker = self.circuit_breaker()
+            old_fallback, self.fallback = self.fallback, self.fallback_detector()
+            if hasattr(old_fallback, "close"):
+                old_fallback.close()
+        if self.settings.motion != previous.motion:
+            motion_gate = MotionGate(**self.settings.motion)
+            with self.motion_lock:
+                self.motion_gate = motion_gate
 
-    def save_image(self, image, dir):
-        if (not os.path.isdir(dir)):
-            os.makedirs(dir)
+    def detector(self):
+        return load_model(Settings.detector, wire_format=Settings.detector.wire_format, jpeg_quality=Settings.detector.jpeg_quality, client=self.detector_client, deadline=Settings.circuit.deadline)
 
-        now = datetime.now()
-        date_time = now.strftime("%Y%m%d%H%M%S")
-        name =  f"im-{date_time}.jpg"
-        save_file = f"{dir}/{name}"
+    def circuit_breaker(self):
+        return CircuitBreaker(
+            Settings.detector.url,
+            Settings.circuit.failure_threshold,
+            Settings.circuit.reset_timeout,
+            Settings.circuit.max_reset_timeout,
+            Settings.circuit.backoff)
 
-        image.save(save_file)
+    def fallback_detector(self):
+        """
+        The detector used while the detector's circuit is open, if the degraded
+        mode is local, eg. a smaller LocalDetector model.
+        """
+        if Settings.circuit.degraded != "local":
+            return None
+        return load_model(Settings.circuit.fallback)
 
+    def thermal_deferred(self):
+        """
+        True if the governor wants longer between detections than has passed,
+        otherwise starts timing the next interval.
+        """
+        now = time.time()
+        if now - self.last_detect_time < self.governor.value("detect_interval"):
+            return True
+        self.last_detect_time = now
+        return False
 
-    def detect_image(self, image):
-        imageForDetect = image.resize((Config["model"]["input_width"].get(int), Config["model"]["input_height"].get(int)), Image.ANTIALIAS)
+    def model_image(self, image):
+        return image.resize((Settings.model.input_width, Settings.model.input_height), Image.LANCZOS)
 
-        # Make prediction
-        detector = self.detector()
-        prediction = detector.get_prediction(imageForDetect)
+    def predict(self, image, motion=False):
+        """
+        Detect through the detector's circuit breaker. While the circuit is open
+        the detector isn't asked; instead, depending on circuit.degraded, the
+        fallback detector answers, the whole image counts as a Motion detection
+        if the motion gate saw real motion in it, or there is no prediction.
+        """
+        if self.breaker.allow():
+            start = time.perf_counter()
+            prediction = self.remote_detector.get_prediction(image)
+            self.record_inference(time.perf_counter() - start, self.remote_detector)
+            if prediction != None:
+                self.server_seconds.observe(prediction["Elapsed"] / 1000)
+                self.breaker.succeeded()
+            else:
+                self.errors_total.inc()
+                self.breaker.failed()
+            return prediction
+
+        mode = Settings.circuit.degraded
+        self.degraded_total.inc(mode=mode)
+        if mode == "local" and self.fallback != None:
+            with self.metrics.timer(self.stage_seconds, stage="fallback_inference"):
+                return self.fallback.get_prediction(image)
+        if mode == "motion" and not motion:
+            return {"Items": [], "Elapsed": 0}
+        if mode == "motion":
+            return {"Items": [{"label": MOTION_LABEL, "score": 1.0, "box": [0, 0, image.width, image.height]}], "Elapsed": 0}
+        return None
+
+    def interpret_detection(self, frame, prediction):
+        """
+        Pick out the pigeons (or Motion, in degraded mode) from a prediction, best
+        first, with their boxes scaled to the full frame. Returns None if there was no prediction.
+        """
         if (prediction == None):
-            self.set_detection("ERROR")
+            self.set_detection("ERROR" if self.breaker.is_closed() else f"Detector {self.breaker.state}")
             return None
 
         elapsedMs = prediction["Elapsed"]
         self.set_elapsed_display(elapsedMs)
 
-        bestitem = None
-        items = prediction["Items"]
-        for item in items:
-            if item["label"] == "Pigeon":
-                bestitem = item
-                break
-
-        if bestitem == None:
+        items = [item for item in prediction["Items"] if item["label"] in ("Pigeon", MOTION_LABEL)]
+        if not items:
             self.set_detection("None")
-            return None
+        return [self.interpret_item(frame, item) for item in items]
 
-        xscale = Config["camera"]["width"].get(int) / Config["model"]["input_width"].get(int)
-        yscale = Config["camera"]["height"].get(int) / Config["model"]["input_height"].get(int)
-        bestbox = bestitem["box"]
+    def interpret_item(self, frame, item):
+        # Scale from the actual frame, which may not be camera sized when replaying
+        image_width, image_height = frame.size
+        xscale = image_width / Settings.model.input_width
+        yscale = image_height / Settings.model.input_height
+        bestbox = item["box"]
 
-        label = bestitem["label"]
-        confidence = round(bestitem["score"], 4)
+        label = item["label"]
+        confidence = round(item["score"], 4)
         box = ((int(bestbox[0]*xscale), int(bestbox[1]*yscale)), (int(bestbox[2]*xscale), int(bestbox[3]*yscale)))
 
         lt, rb = box
@@ -237,83 +277,200 @@ class PigeonatorDetectorUI:
         h=y2-y1
         area = w*h
         location = (x, y)  
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         logging.info("RawDetect {label} @ {confidence} at {location} A={area}", label=label, confidence=confidence, location=location, area=area)
-        raw_detect_file = open("rawdetect.csv", "a")
-        raw_detect_file.write(f"{ts},{label},{confidence},{x1},{y1},{x2},{y2},{x},{y},{w},{h},{area}\n")
-        raw_detect_file.close()
 
         return (label, confidence, box, location, area)
 
-    def run(self):
-        cycle_count = 0
-        this_frame_time = last_frame_time = int(time.time()*1000)
-
-        # Run the Event Loop
-        for _ in self.camera.capture_continuous(self.stream, format='jpeg', resize=None, use_video_port=True):
-            event, self.values = self.window.read(timeout=200)
-            if event == "Exit" or event == sg.WIN_CLOSED:
-                break
+    def load_font(self, size):
+        try:
+            return ImageFont.truetype(FONT_PATH, size)
+        except OSError as error:
+            logging.warning("Could not load font {path}, using the default: {error}", path=FONT_PATH, error=str(error))
+            return ImageFont.load_default(size)
 
-            last_frame_time = this_frame_time
-            this_frame_time = int(time.time()*1000)
-            frame_time = this_frame_time - last_frame_time
-            self.set_frametime_display(frame_time)
+    def annotate(self, frame, image, box, text, color, text_at_box=False):
+        """
+        Draw a detection on a decoded image of the frame, scaled to its size.
+        """
+        scale = image.size[0] / frame.size[0]
+        font_size = max(int(80*scale), 10)
+        if font_size not in self.fonts:
+            # Without FreeType the default font is a bitmap of one size
+            self.fonts[font_size] = self.font.font_variant(size=font_size) if isinstance(self.font, ImageFont.FreeTypeFont) else self.font
+        draw = ImageDraw.Draw(image)
+        scaled_box = frame.scale_box(box, image)
+        draw.rectangle(scaled_box, outline=color, width=3)
+        position = (scaled_box[0][0], max(scaled_box[0][1]-font_size, 0)) if text_at_box else (int(50*scale),int(50*scale))
+        draw.text(position, text, fill=color, font=self.fonts[font_size])
+
+    def handle_detections(self, frame, results):
+        """
+        Without a tracker act on the best detection in the frame. With one, act
+        once for each track, when it has been confirmed over several frames.
+        """
+        if self.tracker == None:
+            for label, confidence, box, _, _ in results:
+                self.detection_store.add(label, confidence, box)
+            if results:
+                self.handle_detection(frame, results[0])
+            return
+
+        for track in self.tracker.update(results):
+            label, confidence, box, _, _ = track.result
+            self.detection_store.add(label, confidence, box, track=track.id)
+            if track.confirmed and not track.actioned:
+                # Acted on once per track; a failed upload is retried by the action executor
+                track.actioned = self.handle_detection(frame, track.smoothed_result())
+            else:
+                self.show_track(frame, track)
 
-            if event == "__TIMEOUT__":  
-                self.check_cpu_temperature()
-                current_image = self.get_camera_image()
+    def show_track(self, frame, track):
+        label, confidence, box, location, area = track.smoothed_result()
+        if track.actioned:
+            self.set_detection(f"{label} #{track.id} @ {confidence}")
+            color = "red"
+        else:
+            self.set_detection(f"Tracking #{track.id} @ {confidence} ({track.hits})")
+            color = "orange"
+        if self.headless:
+            return
+        self.annotate(frame, frame.preview(), box, f"#{track.id} {label} @ {confidence}", color, text_at_box=True)
 
-            cycle_count = cycle_count+1
-            if (cycle_count <= Config["camera"]["warm_up_cycles"].get(int)):
+    def handle_detection(self, frame, result):
+        """
+        If confident enough, save, deter and upload, then annotate the frame.
+        Only a confident detection needs the frame decoded at full resolution.
+        Returns True if it was acted on, even if drawing it then failed.
+        """
+        label, confidence, box, location, area= result
+        confidence = round(confidence,4)        
+
+        if confidence >= self.confidence_threshold:
+            logging.info("Detected {label} @ {confidence} at {location} A={area}", label=label, confidence=confidence, location=location, area=area)
+            self.set_detection(f"{label} @ {confidence}")
+            self.detections_total.inc(label=label)
+            current_image = frame.full()
+            self.archive.save(current_image.copy(), f"images/{label}/actual", source="actual")
+            text = f"{label} @ {confidence} at {location}, A={area}"
+
+            # Motion alone only deters or uploads if set up to. Both go before
+            # any drawing, which is only for show
+            if label != MOTION_LABEL or Settings.circuit.motion_actions:
+                if self.get_deter_mode():
+                    self.fire_sprinkler(25, label)
+                description = f"{label} @ {confidence}"
+                self.actions.submit("imgbb", self.upload_detection, frame, current_image.copy(), box, text, label, description, callback=self.action_done)
+
+            # Having acted, a failure to draw mustn't stop the track counting as deterred
+            try:
+                self.annotate(frame, current_image, box, text, "red")
+                self.archive.save(current_image.copy(), f"images/{label}/annotated", dedupe=False, source="annotated")
                 self.set_display_image(current_image)
-                continue
-
-            if event == "-IMAGE-" or self.get_detect_mode():
-                result = self.detect_image(current_image)
-                if result != None:
-                    label, confidence, box, location, area= result
-                    confidence = round(confidence,4)        
-
-                    if confidence >= self.confidence_threshold:
-                        logging.info("Detected {label} @ {confidence} at {location} A={area}", label=label, confidence=confidence, location=location, area=area)
-                        self.set_detection(f"{label} @ {confidence}")
-                        self.save_image(current_image, f"images/{label}/actual")
-
-                        draw = ImageDraw.Draw(current_image)
-                        draw.rectangle(box, outline="red", width=3)
-                        draw.text((50,50), f"{label} @ {confidence} at {location}, A={area}", fill="red", font=self.font)
-                        self.save_image(current_image, f"images/{label}/annotated")
-                        self.set_display_image(current_image)
-
-                        if self.get_deter_mode():
-                            self.fire_sprinkler(25, label)
-
-                        description = f"{label} @ {confidence}"
-                        url, _, _ = self.imgbb_upload(current_image, label, description)
-                    else:
-                        self.set_detection(f"None @ {round(1-confidence,4)}")
-                        
-                        draw = ImageDraw.Draw(current_image)
-                        draw.rectangle(box, outline="blue", width=3)
-                        draw.text((50,50), f"{label} @ {confidence} at {location}, A={area}", fill="blue", font=self.font)
-            else:
-                time.sleep(3)
+            except Exception as error:
+                logging.error("Could not annotate {label}: {error}", label=label, error=str(error))
+            return True
+        else:
+            self.set_detection(f"None @ {round(1-confidence,4)}")
 
-            self.set_display_image(current_image)
-                    
-            if event == "-EXPOSURE-":
-                self.set_camera_exposure(self.get_exposure())
+            if not self.headless:
+                self.annotate(frame, frame.preview(), box, f"{label} @ {confidence} at {location}, A={area}", "blue")
+            return False
 
-            if event == "-CONTRAST-":
-                self.set_camera_contrast(self.get_contrast())
+    def upload_detection(self, frame, image, box, text, label, description):
+        """
+        Background action: annotate the detection on an image sized for upload
+        and upload it.
+        """
+        image = image.resize((600, 600))
+        self.annotate(frame, image, box, text, "red")
+        return self.upload_image(image, label, description)
+
+    def stages(self):
+        return {
+            "source": self.source_frame,
+            "preprocess": self.preprocess_frame,
+            "infer": self.infer_frame,
+            "postprocess": self.interpret_frame,
+            "actions": self.act_on_frame,
+            "sinks": self.show_frame,
+        }
 
-        self.window.close()
+    def source_frame(self, frame):
+        """
+        Note whether the image was clicked and Auto Detect ticked when the frame
+        was captured, as the later stages may run on other threads.
+        """
+        with self.click_lock:
+            frame.clicked, self.clicked = self.clicked, False
+        frame.detect = self.get_detect_mode()
+        return frame
 
-def main():
-    ui = PigeonatorDetectorUI()
-    ui.run()
+    def preprocess_frame(self, frame):
+        """
+        Decode the frame and, if it is to be detected on, resize it for the model.
+        Once the camera has warmed up a frame is detected on if the image was
+        clicked, or with Auto Detect if the motion gate has seen movement and
+        the thermal governor isn't holding detections back.
+        """
+        frame.camera_frame = CameraFrame(frame.data, self.preview_size)
+        with self.metrics.timer(self.stage_seconds, stage="decode"):
+            image = frame.camera_frame.preview()
+        frame.model_image = None
+        frame.moved = True
+        frame.motion = False
+        frame.deferred = False
+        frame.changed_fraction = 0.0
+        clicked = frame.clicked
+        if frame.number > Settings.camera.warm_up_cycles and (clicked or frame.detect):
+            with self.motion_lock:
+                frame.moved = clicked or self.motion_gate.should_detect(image)
+                frame.motion = not clicked and self.motion_gate.moved
+                frame.changed_fraction = self.motion_gate.changed_fraction
+            frame.deferred = not clicked and frame.moved and self.thermal_deferred()
+            if frame.moved and not frame.deferred:
+                with self.metrics.timer(self.stage_seconds, stage="resize"):
+                    frame.model_image = self.model_image(image)
+        return frame
+
+    def infer_frame(self, frame):
+        frame.prediction = self.predict(frame.model_image, frame.motion) if frame.model_image is not None else None
+        return frame
+
+    def interpret_frame(self, frame):
+        frame.results = None
+        if frame.model_image is not None:
+            frame.results = self.interpret_detection(frame.camera_frame, frame.prediction)
+        elif not frame.moved:
+            self.set_detection(f"Still ({frame.changed_fraction:.3f})")
+        elif frame.deferred:
+            self.set_detection(f"Cooling ({self.temperature}C)")
+        return frame
+
+    def act_on_frame(self, frame):
+        if frame.results != None:
+            self.handle_detections(frame.camera_frame, frame.results)
+        return frame
+
+    def show_frame(self, frame):
+        now = time.time()
+        self.set_frametime_display(int((now - self.last_frame_time) * 1000))
+        self.last_frame_time = now
+        self.set_display_image(frame.camera_frame.preview())
+        return frame
+
+    def close(self):
+        if hasattr(self.remote_detector, "close"):
+            self.remote_detector.close()
+        if hasattr(self.fallback, "close"):
+            self.fallback.close()
+        self.breaker.log_stats()
+        self.detection_store.close()
+        self.detection_store.log_stats()
+        super().close()
+
+def main(argv=None, started=None):
+    launch(PigeonatorDetectorUI, "Detect pigeons and deter them", argv, started)
     
 if __name__ == '__main__':
-  main()
\ No newline at end of file
+  main()
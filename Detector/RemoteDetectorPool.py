@@ -0,0 +1,169 @@
+import time
+import logging
+import requests
+import threading
+
+from RemoteDetector import RemoteDetector
+from pigeonator import WireFormat
+from pigeonator.HttpClient import HttpClient
+
+class PoolNode():
+    def __init__(self, detector):
+        self.detector = detector
+        self.endpoint = detector.endpoint
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.probe_successes = 0
+        self.latency_ms = None
+        self.ejections = 0
+
+    def record_latency(self, ms, weight=0.2):
+        self.latency_ms = ms if self.latency_ms is None else self.latency_ms + weight * (ms - self.latency_ms)
+
+    def stats(self):
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "latency_ms": round(self.latency_ms) if self.latency_ms is not None else None,
+        }
+
+class RemoteDetectorPool():
+    def __init__(self, endpoint, urls=None, balance="least-outstanding", probe_interval=10, eject_after=3, readmit_after=2,
+                 wire_format=WireFormat.JSON_PNG, jpeg_quality=85, client=None, deadline=None):
+        """
+        Spread detection requests over several detector servers. endpoint and
+        any further urls make up the pool. Each request goes to the healthy
+        server with the fewest requests in flight (ties broken by recent latency),
+        or with balance "latency" to the one with the lowest latency weighted by
+        its load. A server that fails eject_after requests or probes in a row is
+        taken out of the pool, and put back after readmit_after successful
+        background probes. A failed request is retried once on each other server,
+        all within deadline seconds.
+        """
+        self.endpoint = endpoint
+        self.balance = balance
+        self.eject_after = eject_after
+        self.readmit_after = readmit_after
+        self.probe_interval = probe_interval
+        self.client = client or HttpClient("detector-pool")
+        self.deadline = deadline
+
+        endpoints = [endpoint] + [url for url in (urls or []) if url != endpoint]
+        self.nodes = [PoolNode(RemoteDetector(url, wire_format, jpeg_quality, self.client)) for url in endpoints]
+        self.lock = threading.Lock()
+
+        self.probing = True
+        self.probe_thread = threading.Thread(target=self.probe_loop, name="detector-probe", daemon=True)
+        self.probe_thread.start()
+
+    def choose(self, exclude):
+        with self.lock:
+            candidates = [node for node in self.nodes if node.healthy and node not in exclude]
+            if not candidates:
+                return None
+            if self.balance == "latency":
+                node = min(candidates, key=lambda node: (node.latency_ms or 0) * (node.outstanding + 1))
+            else:
+                node = min(candidates, key=lambda node: (node.outstanding, node.latency_ms or 0))
+            node.outstanding += 1
+            node.requests += 1
+            return node
+
+    def succeeded(self, node, ms):
+        with self.lock:
+            node.outstanding -= 1
+            node.consecutive_failures = 0
+            node.record_latency(ms)
+
+    def failed(self, node, in_flight=True):
+        with self.lock:
+            if in_flight:
+                node.outstanding -= 1
+            node.failures += 1
+            node.consecutive_failures += 1
+            if node.healthy and node.consecutive_failures >= self.eject_after:
+                node.healthy = False
+                node.probe_successes = 0
+                node.ejections += 1
+                logging.warning("Ejected detector {endpoint} after {count} failures", endpoint=node.endpoint, count=node.consecutive_failures)
+
+    def request(self, node, image, deadline=None):
+        detector = node.detector
+        payload, headers = detector.encode_payload(image)
+        response = detector.post(payload, headers, deadline)
+        if detector.fall_back(response):
+            payload, headers = detector.encode_payload(image)
+            response = detector.post(payload, headers, deadline)
+        return detector.parse_response(response)
+
+    def get_prediction(self, image):
+        """
+        Predict with whichever detector in the pool is best placed to answer.
+        """
+        tried = []
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        while True:
+            node = self.choose(tried)
+            if node is None:
+                break
+            tried.append(node)
+            start = time.time()
+            try:
+                outputs = self.request(node, image, deadline)
+                error = None if outputs is not None else "no outputs"
+            except (requests.RequestException, ValueError, KeyError) as request_error:
+                outputs, error = None, str(request_error)
+            if outputs is not None:
+                self.succeeded(node, (time.time() - start) * 1000)
+                return outputs
+            self.failed(node)
+            logging.error("Could not contact: {endpoint}: {error}", endpoint=node.endpoint, error=error)
+
+        print(f"No detector in the pool could answer ({len(tried)} tried)")
+        return None
+
+    def probe(self, node):
+        """
+        Any HTTP reply, even one refusing the GET, means the detector is up,
+        unless it says it is unavailable.
+        """
+        try:
+            return self.client.get(node.endpoint).status_code not in (502, 503, 504)
+        except requests.RequestException:
+            return False
+
+    def probe_loop(self):
+        while self.probing:
+            time.sleep(self.probe_interval)
+            for node in self.nodes:
+                if self.probe(node):
+                    with self.lock:
+                        if node.healthy:
+                            node.consecutive_failures = 0
+                            continue
+                        node.probe_successes += 1
+                        if node.probe_successes >= self.readmit_after:
+                            node.healthy = True
+                            node.consecutive_failures = 0
+                            logging.info("Readmitted detector {endpoint}", endpoint=node.endpoint)
+                else:
+                    with self.lock:
+                        node.probe_successes = 0
+                    self.failed(node, in_flight=False)
+
+    def stats(self):
+        with self.lock:
+            return {node.endpoint: node.stats() for node in self.nodes}
+
+    def log_stats(self):
+        for endpoint, stats in self.stats().items():
+            logging.info("Detector {endpoint}: healthy={healthy}, {requests} requests, {failures} failures, {ejections} ejections, {latency_ms}ms latency", endpoint=endpoint, **stats)
+
+    def close(self):
+        self.probing = False
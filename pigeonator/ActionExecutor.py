@@ -0,0 +1,171 @@
+import time
+import queue
+import logging
+import threading
+import collections
+
+class ActionError(Exception):
+     def __init__(self, message):
+         self.message = message
+
+class ActionResult():
+    def __init__(self, name, ok, value=None, error=None, attempts=1, queued_secs=0, run_secs=0):
+        self.name = name
+        self.ok = ok
+        self.value = value
+        self.error = error
+        self.attempts = attempts
+        self.queued_secs = queued_secs
+        self.run_secs = run_secs
+
+class Action():
+    def __init__(self, name, function, args, kwargs, callback, retries):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = callback
+        self.retries = retries
+        self.submit_time = time.time()
+
+class ActionStats():
+    def __init__(self):
+        self.submitted = 0
+        self.dropped = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.total_queued_secs = 0.0
+        self.max_queued_secs = 0.0
+
+    def as_dict(self):
+        started = self.succeeded + self.failed
+        return {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "avg_queue_ms": round(self.total_queued_secs / started * 1000) if started else 0,
+            "max_queue_ms": round(self.max_queued_secs * 1000),
+        }
+
+class ActionExecutor():
+    def __init__(self, workers=3, limits=None, max_pending=None, retries=0, retry_delay=1):
+        """
+        Run slow side effects (deterring, archiving, uploading) on background
+        worker threads so the detection loop never waits for them.
+
+        limits caps how many actions of one name run at once; further actions of
+        that name wait in line, up to max_pending of them, after which new ones
+        are dropped. Failed actions (ones that raise) are retried with
+        exponential backoff before their callback sees the failure.
+        """
+        self.limits = limits or {}
+        self.max_pending = max_pending or {}
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.running = collections.Counter()
+        self.pending = collections.defaultdict(collections.deque)
+        self.stats = collections.defaultdict(ActionStats)
+        self.threads = [threading.Thread(target=self.work, name=f"action-{i}", daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, name, function, *args, callback=None, retries=None, **kwargs):
+        """
+        Queue function(*args, **kwargs) as an action called name. callback, if
+        given, is called with an ActionResult on a worker thread when it's done.
+        Returns False if the action was dropped because too many are waiting.
+        """
+        action = Action(name, function, args, kwargs, callback, self.retries if retries is None else retries)
+        with self.lock:
+            stats = self.stats[name]
+            stats.submitted += 1
+            limit = self.limits.get(name)
+            if limit is None or self.running[name] < limit:
+                self.running[name] += 1
+                self.queue.put(action)
+                return True
+
+            max_pending = self.max_pending.get(name)
+            if max_pending is not None and len(self.pending[name]) >= max_pending:
+                stats.dropped += 1
+                logging.info("Dropped {action} action, {running} already running", action=name, running=self.running[name])
+                return False
+            self.pending[name].append(action)
+            return True
+
+    def work(self):
+        while True:
+            action = self.queue.get()
+            if action is None:
+                break
+            result = self.execute(action)
+            self.finish(action, result)
+            if action.callback:
+                try:
+                    action.callback(result)
+                except Exception as error:
+                    logging.error("Callback for {action} failed: {error}", action=action.name, error=str(error))
+
+    def execute(self, action):
+        queued_secs = time.time() - action.submit_time
+        start = time.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                value = action.function(*action.args, **action.kwargs)
+                return ActionResult(action.name, True, value=value, attempts=attempt, queued_secs=queued_secs, run_secs=time.time() - start)
+            except Exception as error:
+                if attempt > action.retries:
+                    return ActionResult(action.name, False, error=error, attempts=attempt, queued_secs=queued_secs, run_secs=time.time() - start)
+                with self.lock:
+                    self.stats[action.name].retried += 1
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+    def finish(self, action, result):
+        with self.lock:
+            stats = self.stats[action.name]
+            if result.ok:
+                stats.succeeded += 1
+            else:
+                stats.failed += 1
+            stats.total_queued_secs += result.queued_secs
+            stats.max_queued_secs = max(stats.max_queued_secs, result.queued_secs)
+
+            # Hand the freed slot to the next waiting action of the same name
+            if self.pending[action.name]:
+                self.queue.put(self.pending[action.name].popleft())
+            else:
+                self.running[action.name] -= 1
+
+    def busy(self, name):
+        with self.lock:
+            return self.running[name] > 0
+
+    def pending_counts(self):
+        with self.lock:
+            return {name: len(pending) for name, pending in self.pending.items()}
+
+    def get_stats(self):
+        with self.lock:
+            return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def log_stats(self):
+        for name, stats in self.get_stats().items():
+            logging.info("Action {action}: {submitted} submitted, {succeeded} ok, {failed} failed, {retried} retries, {dropped} dropped, queue wait {avg_queue_ms}ms avg / {max_queue_ms}ms max", action=name, **stats)
+
+    def stop(self, timeout=10):
+        """
+        Let queued actions finish for up to timeout seconds, then stop the workers.
+        """
+        for _ in self.threads:
+            self.queue.put(None)
+        deadline = time.time() + timeout
+        for thread in self.threads:
+            thread.join(max(deadline - time.time(), 0))
@@ -0,0 +1,110 @@
+import time
+import logging
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+class CircuitBreaker():
+    def __init__(self, name, failure_threshold=3, reset_timeout=5, max_reset_timeout=120, backoff=2):
+        """
+        Stop calling an endpoint that keeps failing. After failure_threshold
+        failures in a row the circuit opens and allow() turns requests away
+        without trying, for reset_timeout seconds. Then it is half open: one
+        request at a time is let through as a probe. A probe that succeeds closes
+        the circuit again; one that fails reopens it for backoff times as long,
+        up to max_reset_timeout.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.backoff = backoff
+        self.lock = threading.Lock()
+
+        self.state = CLOSED
+        self.state_since = time.time()
+        self.state_secs = {state: 0.0 for state in STATES}
+        self.consecutive_failures = 0
+        self.timeout = reset_timeout
+        self.open_until = 0
+        self.probing = False
+        self.opens = 0
+        self.rejected = 0
+
+    def change_state(self, state, now):
+        self.state_secs[self.state] += now - self.state_since
+        self.state = state
+        self.state_since = now
+
+    def allow(self, now=None):
+        """
+        True if a request may go ahead, in which case succeeded() or failed()
+        must be called with its outcome.
+        """
+        now = now or time.time()
+        with self.lock:
+            if self.state == OPEN and now >= self.open_until:
+                self.change_state(HALF_OPEN, now)
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self.probing):
+                self.probing = self.state == HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def succeeded(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            self.consecutive_failures = 0
+            self.probing = False
+            if self.state != CLOSED:
+                self.change_state(CLOSED, now)
+                self.timeout = self.reset_timeout
+                logging.info("Circuit to {name} closed", name=self.name)
+
+    def failed(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self.probing = False
+                self.timeout = min(self.timeout * self.backoff, self.max_reset_timeout)
+                self.open(now)
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.open(now)
+
+    def open(self, now):
+        self.change_state(OPEN, now)
+        self.open_until = now + self.timeout
+        self.opens += 1
+        logging.warning("Circuit to {name} opened for {secs}s after {count} failures", name=self.name, secs=self.timeout, count=self.consecutive_failures)
+        print(f"Circuit to {self.name} opened for {self.timeout}s after {self.consecutive_failures} failures")
+
+    def is_closed(self):
+        return self.state == CLOSED
+
+    def time_in_states(self):
+        """
+        Seconds spent in each state so far, including the current one.
+        """
+        with self.lock:
+            secs = dict(self.state_secs)
+            secs[self.state] += time.time() - self.state_since
+            return secs
+
+    def stats(self):
+        secs = self.time_in_states()
+        with self.lock:
+            return {
+                "state": self.state,
+                "opens": self.opens,
+                "rejected": self.rejected,
+                "closed_secs": round(secs[CLOSED]),
+                "half_open_secs": round(secs[HALF_OPEN]),
+                "open_secs": round(secs[OPEN]),
+            }
+
+    def log_stats(self):
+        logging.info("Circuit to {name}: {state}, opened {opens} times, {rejected} requests turned away, {closed_secs}s closed, {half_open_secs}s half open, {open_secs}s open", name=self.name, **self.stats())
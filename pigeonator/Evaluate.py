@@ -0,0 +1,265 @@
+import os
+import re
+import sys
+import json
+import logging
+import time
+import hashlib
+import argparse
+import threading
+import concurrent.futures
+
+from PIL import Image
+from pigeonator.__main__ import TOOLS, enter_tool
+from pigeonator.KeywordLogger import use_keyword_logging
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# eg. 20200518-172134-bird(46%).jpg: when it was taken, what was seen and the
+# confidence of the detector that saw it
+LABELLED_NAME = re.compile(r"^\d{8}-\d{6}-(?P<label>[^(]+?)(\(\d+%\))?$")
+
+def image_label(root, path):
+    """
+    The label of an image, from its name as in Training/, or else from the
+    directory it is in below root, as in images/Pigeon/actual. None if it has
+    neither.
+    """
+    match = LABELLED_NAME.match(os.path.splitext(os.path.basename(path))[0])
+    if match:
+        return match.group("label").strip()
+    parts = os.path.relpath(path, root).split(os.sep)
+    return parts[0] if len(parts) > 1 else None
+
+def find_images(root):
+    """
+    Every image below root, with its label.
+    """
+    images = []
+    for folder, _, files in os.walk(root):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(folder, name)
+                images.append((path, image_label(root, path)))
+    return sorted(images)
+
+class PredictionCache():
+    def __init__(self, path):
+        """
+        Raw predictions saved to a JSON file, so that evaluating again with
+        other thresholds or filters doesn't need the model. An image is
+        predicted again if its size or modification time changes.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def key(self, image_path):
+        info = os.stat(image_path)
+        return f"{os.path.abspath(image_path)}:{info.st_size}:{info.st_mtime_ns}"
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, record):
+        with self.lock:
+            self.entries[key] = record
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(self.entries, f)
+            os.replace(self.path + ".tmp", self.path)
+
+def cache_path(folder, section, input_size):
+    """
+    Where the predictions of one model are cached: a file named after the
+    model class and a hash of its settings and input size.
+    """
+    settings = json.dumps([section.name, section.url, dict(section.options), input_size], sort_keys=True, default=list)
+    return os.path.join(folder, f"{section.name}-{hashlib.sha1(settings.encode()).hexdigest()[:12]}.json")
+
+def predict_images(model, images, input_size, cache, workers, save_every=20):
+    """
+    Predict every image not already in the cache with a pool of workers.
+    Failed predictions aren't cached, so are tried again next time. Returns
+    how many were predicted, how many failed and the seconds it took.
+    """
+    def predict(path):
+        image = Image.open(path).convert("RGB")
+        size = image.size
+        image = image.resize(input_size, Image.LANCZOS)
+        start = time.perf_counter()
+        prediction = model.get_prediction(image)
+        return {"prediction": prediction, "size": size, "secs": time.perf_counter() - start}
+
+    todo = [path for path, _ in images if cache.get(cache.key(path)) == None]
+    failed = 0
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        futures = {pool.submit(predict, path): path for path in todo}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            path = futures[future]
+            try:
+                record = future.result()
+            except Exception as error:
+                record = None
+                print(f"Could not predict {path}: {error}")
+            if record != None and record["prediction"] != None:
+                cache.put(cache.key(path), record)
+            else:
+                failed += 1
+            if done % save_every == 0:
+                cache.save()
+                print(f"{done}/{len(todo)} predicted")
+    cache.save()
+    return len(todo) - failed, failed, time.perf_counter() - start
+
+def detector_result(record, input_size, targets, threshold, min_area, max_area):
+    """
+    The label of the best detection at or above threshold whose box, scaled
+    to the image, is within the area limits, or "None". As in the detector, a
+    target label is acted on ahead of any other.
+    """
+    xscale = record["size"][0] / input_size[0]
+    yscale = record["size"][1] / input_size[1]
+    items = sorted(record["prediction"]["Items"], key=lambda item: (item["label"].lower() in targets, item["score"]), reverse=True)
+    for item in items:
+        box = item["box"]
+        area = (box[2] - box[0]) * xscale * (box[3] - box[1]) * yscale
+        if item["score"] >= threshold and area >= min_area and (not max_area or area <= max_area):
+            return item["label"]
+    return "None"
+
+def classifier_result(record, input_size, targets, threshold, min_area, max_area):
+    """
+    The predicted label if its confidence is at or above threshold, or "None".
+    A classified image is the whole zone, so there is no area to filter on.
+    """
+    prediction = record["prediction"]
+    label = prediction["Prediction"][0]
+    confidence = next((score for name, score in prediction["Labels"] if name == label), 0)
+    return label if confidence >= threshold else "None"
+
+RESULTS = {"detect": detector_result, "classify": classifier_result}
+
+def score(images, records, result, targets, positives):
+    """
+    Count the images where the target label would have been acted on against
+    those whose label counts as positive, and tally truth against result.
+    """
+    counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
+    confusion = {}
+    for path, label in images:
+        predicted = result(records[path])
+        confusion.setdefault(label, {}).setdefault(predicted, 0)
+        confusion[label][predicted] += 1
+        acted = predicted.lower() in targets
+        positive = label.lower() in positives
+        counts[("t" if acted == positive else "f") + ("p" if acted else "n")] += 1
+    counts["precision"] = round(counts["tp"] / (counts["tp"] + counts["fp"]), 3) if counts["tp"] + counts["fp"] else None
+    counts["recall"] = round(counts["tp"] / (counts["tp"] + counts["fn"]), 3) if counts["tp"] + counts["fn"] else None
+    return counts, confusion
+
+def print_sweep(rows, current):
+    print(f"{'threshold':>10}{'min area':>10}{'tp':>6}{'fp':>6}{'fn':>6}{'tn':>6}{'precision':>11}{'recall':>8}")
+    for (threshold, min_area), counts in rows:
+        mark = " *" if threshold == current else ""
+        print(f"{threshold:>10}{min_area:>10}{counts['tp']:>6}{counts['fp']:>6}{counts['fn']:>6}{counts['tn']:>6}{str(counts['precision']):>11}{str(counts['recall']):>8}{mark}")
+
+def print_confusion(confusion):
+    predicted = sorted({name for row in confusion.values() for name in row})
+    width = max([len(name) for name in list(confusion) + predicted] + [12]) + 2
+    print(f"{'truth':<{width}}" + "".join(f"{name:>{width}}" for name in predicted))
+    for label in sorted(confusion):
+        print(f"{label:<{width}}" + "".join(f"{confusion[label].get(name, 0):>{width}}" for name in predicted))
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m pigeonator.Evaluate", description="Measure a detector or classifier against labelled images and sweep its thresholds")
+    parser.add_argument("tool", choices=TOOLS, help="evaluate the detector or the classifier, as set up in its config.yaml")
+    parser.add_argument("--images", default="Training", help="directory of images labelled by file name, eg. 20200509-201002-cow.jpg, or by directory, eg. Pigeon/actual/")
+    parser.add_argument("--name", help="model class to use instead of the configured one, eg. LocalDetector")
+    parser.add_argument("--url", help="model endpoint or file to use instead of the configured one")
+    parser.add_argument("--workers", type=int, default=4, help="images predicted at once")
+    parser.add_argument("--target", nargs="+", default=["Pigeon"], help="predicted labels that would be acted on")
+    parser.add_argument("--positive", nargs="+", help="image labels that should be acted on (default: the targets)")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95], help="confidence thresholds to sweep")
+    parser.add_argument("--min-areas", type=int, nargs="+", default=[0], help="smallest detection box areas (pixels) to sweep")
+    parser.add_argument("--max-area", type=int, default=0, help="largest detection box area (0 for no limit)")
+    parser.add_argument("--cache", default="evaluation", help="directory, in the tool's, for cached predictions")
+    parser.add_argument("--report", help="save the sweep and confusion matrices to this JSON file")
+    args = parser.parse_args()
+    # Offline, so logged to the console rather than Seq
+    use_keyword_logging(logging.WARNING)
+
+    images_path = os.path.abspath(args.images)
+    report_path = os.path.abspath(args.report) if args.report else None
+    enter_tool(args.tool)
+    # Settings are read from the tool's directory, so only once it is the current one
+    from pigeonator.LocalConfiguration import Settings, Snapshot
+    from pigeonator.HttpClient import HttpClient
+    from pigeonator.PigeonatorApp import load_model
+
+    section = Settings.detector if args.tool == "detect" else Settings.classifier
+    section = {**section, "name": args.name or section.name, "url": args.url or section.url}
+    section = Snapshot(section)
+    input_size = (Settings.model.input_width, Settings.model.input_height)
+
+    images = find_images(images_path)
+    labelled = [(path, label) for path, label in images if label != None]
+    print(f"{len(images)} images in {images_path}, {len(labelled)} labelled")
+    if not labelled:
+        sys.exit(1)
+
+    cache = PredictionCache(cache_path(args.cache, section, input_size))
+    if any(cache.get(cache.key(path)) == None for path, _ in labelled):
+        client = HttpClient("evaluate", Settings.http.connect_timeout, Settings.http.read_timeout, args.workers)
+        model = load_model(section, wire_format=section.wire_format, jpeg_quality=section.jpeg_quality, client=client)
+        count, failed, secs = predict_images(model, labelled, input_size, cache, args.workers)
+        if hasattr(model, "close"):
+            model.close()
+        client.close()
+        print(f"Predicted {count} images with {section.name} in {secs:.1f}s, {count / secs:.2f} images/s")
+        if failed:
+            print(f"{failed} images could not be predicted and will be tried again next time")
+    records = {path: cache.get(cache.key(path)) for path, _ in labelled}
+    labelled = [(path, label) for path, label in labelled if records[path] != None]
+    if labelled:
+        model_secs = [records[path]["secs"] for path, _ in labelled]
+        print(f"Model time {sum(model_secs) / len(model_secs) * 1000:.0f}ms per image, {len(model_secs) / sum(model_secs):.2f} images/s on one worker (cached in {cache.path})")
+
+    targets = {label.lower() for label in args.target}
+    positives = {label.lower() for label in (args.positive or args.target)}
+    result = RESULTS[args.tool]
+    rows = []
+    confusions = {}
+    for min_area in args.min_areas:
+        for threshold in args.thresholds:
+            counts, confusion = score(labelled, records, lambda record: result(record, input_size, targets, threshold, min_area, args.max_area), targets, positives)
+            rows.append(((threshold, min_area), counts))
+            confusions[(threshold, min_area)] = confusion
+    print_sweep(rows, Settings.model.confidence_threshold)
+
+    current = (Settings.model.confidence_threshold, args.min_areas[0])
+    if current not in confusions:
+        counts, confusions[current] = score(labelled, records, lambda record: result(record, input_size, targets, current[0], current[1], args.max_area), targets, positives)
+    print(f"\nConfusion at threshold {current[0]}, min area {current[1]} (rows are image labels, columns what was acted on):")
+    print_confusion(confusions[current])
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump({
+                "model": {"name": section.name, "url": section.url},
+                "images": images_path,
+                "sweep": [{"threshold": threshold, "min_area": min_area, **counts} for (threshold, min_area), counts in rows],
+                "confusion": [{"threshold": threshold, "min_area": min_area, "matrix": confusion} for (threshold, min_area), confusion in confusions.items()],
+            }, f, indent=2)
+        print(f"Saved report to {report_path}")
+
+if __name__ == '__main__':
+    main()
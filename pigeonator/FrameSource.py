@@ -0,0 +1,177 @@
+import os
+import abc
+import glob
+import time
+import logging
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+MJPEG_EXTENSIONS = (".mjpg", ".mjpeg")
+
+class FrameSource(abc.ABC):
+    """
+    Base class for anything that supplies camera frames. Each step of frames()
+    leaves one encoded image in the shared stream, exactly as picamera's
+    capture_continuous() does, so the rest of the pipeline doesn't need to know
+    where the frame came from.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+
+    @abc.abstractmethod
+    def frames(self):
+        """
+        Yield once for each frame left in the stream.
+        """
+
+    def set_exposure(self, exposure):
+        pass
+
+    def set_contrast(self, contrast):
+        pass
+
+    def close(self):
+        pass
+
+class PiCameraSource(FrameSource):
+    def __init__(self, stream, config):
+        import picamera
+
+        super().__init__(stream)
+        self.camera = picamera.PiCamera(resolution=(config["camera"]["width"].get(int), config["camera"]["height"].get(int)), framerate=15)
+        self.camera.iso = 100
+
+        # Have the GPU scale frames down before they are encoded
+        resize = config["camera"]["resize"].get()
+        self.resize = tuple(resize) if resize else None
+
+    def frames(self):
+        return self.camera.capture_continuous(self.stream, format='jpeg', resize=self.resize, use_video_port=True)
+
+    def set_exposure(self, exposure):
+        if exposure == "Auto":
+            self.camera.exposure_mode = 'auto'
+        else:
+            self.camera.exposure_mode = 'off'
+            self.camera.shutter_speed = int(exposure)
+
+    def set_contrast(self, contrast):
+        self.camera.contrast = contrast
+
+    def close(self):
+        self.camera.close()
+
+class ReplaySource(FrameSource):
+    def __init__(self, stream, config):
+        """
+        Replay frames from a directory of images, a glob such as images/*/actual,
+        an MJPEG file or (if OpenCV is installed) any other video file.
+        A replay_fps of 0 replays as fast as the consumer can take them.
+        """
+        super().__init__(stream)
+        self.path = config["source"]["replay_path"].get()
+        self.fps = config["source"]["replay_fps"].get(float)
+        self.loop = config["source"]["replay_loop"].get(bool)
+        self.frame_count = 0
+
+    def image_files(self):
+        if os.path.isdir(self.path):
+            dirs = [self.path]
+        else:
+            dirs = [d for d in sorted(glob.glob(self.path)) if os.path.isdir(d)]
+        if dirs:
+            files = []
+            for dir in dirs:
+                files += [os.path.join(dir, f) for f in sorted(os.listdir(dir)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+            return files
+        return sorted(f for f in glob.glob(self.path) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+    def read_images(self):
+        files = self.image_files()
+        if not files:
+            raise FileNotFoundError(f"No replay images found at {self.path}")
+
+        for file in files:
+            with open(file, "rb") as f:
+                data = f.read()
+
+            # Skip anything that isn't a real image, eg. an unfetched git-lfs pointer
+            if file.lower().endswith((".jpg", ".jpeg")) and not data.startswith(JPEG_SOI):
+                logging.warning("Skipping unreadable replay image {file}", file=file)
+                continue
+            yield data
+
+    def read_mjpeg(self):
+        with open(self.path, "rb") as f:
+            buffer = b""
+            while True:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    break
+                buffer += chunk
+                while True:
+                    start = buffer.find(JPEG_SOI)
+                    end = buffer.find(JPEG_EOI, start + 2) if start >= 0 else -1
+                    if end < 0:
+                        break
+                    yield buffer[start:end + 2]
+                    buffer = buffer[end + 2:]
+
+    def read_video(self):
+        import cv2
+
+        capture = cv2.VideoCapture(self.path)
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                ok, data = cv2.imencode(".jpg", frame)
+                if ok:
+                    yield data.tobytes()
+        finally:
+            capture.release()
+
+    def read_frames(self):
+        if os.path.isfile(self.path):
+            if self.path.lower().endswith(MJPEG_EXTENSIONS):
+                return self.read_mjpeg()
+            if not self.path.lower().endswith(IMAGE_EXTENSIONS):
+                return self.read_video()
+        return self.read_images()
+
+    def frames(self):
+        interval = 1 / self.fps if self.fps > 0 else 0
+        next_time = time.time()
+        while True:
+            pass_count = self.frame_count
+            for data in self.read_frames():
+                if interval:
+                    delay = next_time - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_time = max(next_time, time.time()) + interval
+
+                self.stream.seek(0)
+                self.stream.truncate()
+                self.stream.write(data)
+                self.frame_count += 1
+                yield self.stream
+
+            if self.frame_count == pass_count:
+                raise ValueError(f"No readable replay frames at {self.path}")
+            if not self.loop:
+                logging.info("Replay of {path} finished after {count} frames", path=self.path, count=self.frame_count)
+                return
+
+def create_frame_source(stream, config):
+    """
+    Build the frame source named in the source section of the config.
+    """
+    name = config["source"]["name"].get()
+    if name == "picamera":
+        return PiCameraSource(stream, config)
+    if name == "replay":
+        return ReplaySource(stream, config)
+    raise ValueError(f"Unknown frame source: {name}")
@@ -0,0 +1,40 @@
+import threading
+
+# The event PySimpleGUI's Window.read returns once the window has been closed
+WIN_CLOSED = None
+
+class HeadlessElement():
+    def update(self, *args, **kwargs):
+        pass
+
+    def SetTooltip(self, tooltip):
+        pass
+
+class HeadlessWindow():
+    def __init__(self, values):
+        """
+        Stands in for the PySimpleGUI window when running as a service. read()
+        just waits out its timeout and returns the fixed control values, element
+        updates do nothing, and stop() (eg. from a signal handler) makes the
+        next read() report the window closed so the loop shuts down cleanly.
+        """
+        self.values = values
+        self.element = HeadlessElement()
+        self.stopping = threading.Event()
+
+    def read(self, timeout=None):
+        if self.stopping.wait(timeout / 1000 if timeout != None else None):
+            return WIN_CLOSED, None
+        return "__TIMEOUT__", self.values
+
+    def __getitem__(self, key):
+        return self.element
+
+    def refresh(self):
+        pass
+
+    def stop(self):
+        self.stopping.set()
+
+    def close(self):
+        self.stopping.set()
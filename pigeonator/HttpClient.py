@@ -0,0 +1,123 @@
+import time
+import logging
+import threading
+import urllib3
+import requests
+
+from requests.adapters import HTTPAdapter
+
+class HttpClient():
+    def __init__(self, name, connect_timeout=3.05, read_timeout=10, pool_size=2):
+        """
+        A long-lived HTTP client for one service. Connections are kept alive and
+        pooled between requests and every request has a connect and read timeout,
+        so a stalled server can't hang the caller indefinitely.
+        """
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.timeout_count = 0
+        self.error_count = 0
+
+    def read_body(self, response, deadline):
+        """
+        Read a streamed response's body, giving up with requests.Timeout once
+        the deadline passes even if the server is still sending.
+        """
+        # urllib3 2's read1 returns as soon as anything has arrived
+        read = getattr(response.raw, "read1", response.raw.read)
+        chunks = []
+        try:
+            while True:
+                chunk = read(16384, decode_content=True)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Deadline passed reading {response.url}")
+        except requests.RequestException:
+            response.close()
+            raise
+        except urllib3.exceptions.ReadTimeoutError as error:
+            response.close()
+            raise requests.Timeout(error)
+        except Exception as error:
+            # Part read, so the connection can't be reused
+            response.close()
+            raise requests.ConnectionError(error)
+        response._content = b"".join(chunks)
+        response._content_consumed = True
+        response.raw.release_conn()
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """
+        deadline is a time.monotonic() time by which the whole request, body
+        included, must be over. It caps the connect and read timeouts, which are
+        otherwise per operation, and the body is read in chunks so a server
+        sending it slowly can't keep the caller past it either. A request whose
+        deadline has already passed raises requests.Timeout without being sent.
+        """
+        timeout = kwargs.pop("timeout", self.timeout)
+        if deadline != None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self.lock:
+                    self.timeout_count += 1
+                raise requests.Timeout(f"Deadline passed before {method} {url}")
+            if not isinstance(timeout, tuple):
+                timeout = (timeout, timeout)
+            timeout = (min(timeout[0], remaining), min(timeout[1], remaining))
+            kwargs["stream"] = True
+        kwargs["timeout"] = timeout
+        with self.lock:
+            self.request_count += 1
+        try:
+            response = self.session.request(method, url, **kwargs)
+            if deadline != None:
+                self.read_body(response, deadline)
+            return response
+        except requests.Timeout:
+            with self.lock:
+                self.timeout_count += 1
+            raise
+        except requests.RequestException:
+            with self.lock:
+                self.error_count += 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request("POST", url, data=data, **kwargs)
+
+    def connections_opened(self):
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self):
+        """
+        Returns request, connection open/reuse, timeout and error counts.
+        """
+        opens = self.connections_opened()
+        with self.lock:
+            return {
+                "requests": self.request_count,
+                "opens": opens,
+                "reuses": max(self.request_count - opens - self.timeout_count - self.error_count, 0),
+                "timeouts": self.timeout_count,
+                "errors": self.error_count,
+            }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info("HTTP {name}: {requests} requests, {opens} connections opened, {reuses} reused, {timeouts} timeouts, {errors} errors", name=self.name, **stats)
+
+    def close(self):
+        self.session.close()
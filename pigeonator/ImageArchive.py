@@ -0,0 +1,209 @@
+import os
+import time
+import queue
+import logging
+import threading
+import collections
+
+from datetime import datetime
+from PIL import Image
+from pigeonator.ImageHash import dhash, hamming
+
+class ArchiveItem():
+    def __init__(self, image, dir, prefix, dedupe, source):
+        self.image = image
+        self.dir = dir
+        self.prefix = prefix
+        self.dedupe = dedupe
+        self.source = source
+        self.time = time.time()
+
+class ImageArchive():
+    def __init__(self, root="images", budget_mb=2000, quality=90, variants=None, dedupe_distance=4, dedupe_window=30, queue_size=50, keep=None):
+        """
+        Save archive images on a background thread so the capture loop never
+        waits on the SD card. Images are named <prefix>-<timestamp>-<ms>.jpg, with
+        a further -n added in the unlikely event of a clash. An image within
+        dedupe_distance bits (of its 64 bit difference hash) of one saved to the
+        same directory from the same source in the last dedupe_window seconds
+        is skipped. variants
+        maps a subdirectory name to a longest side, eg. {"thumbs": 200}, and
+        also saves a downscaled copy there. Once everything under root's
+        subdirectories takes more than budget_mb, the oldest files are deleted.
+        Subdirectories of root named in keep, eg. hand-labelled Training images,
+        are neither counted against the budget nor deleted. If the writer falls
+        behind by queue_size images, new ones are dropped.
+        """
+        self.root = root
+        self.budget = budget_mb * 1024 * 1024
+        self.quality = quality
+        self.variants = variants or {}
+        self.dedupe_distance = dedupe_distance
+        self.dedupe_window = dedupe_window
+        self.keep = [os.path.join(os.path.normpath(root), dir) for dir in keep or []]
+        self.queue = queue.Queue(queue_size)
+        self.recent = collections.defaultdict(collections.deque)
+        self.lock = threading.Lock()
+
+        self.queued = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.write_secs = 0.0
+        self.duplicates = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.max_depth = 0
+
+        self.files = collections.deque()
+        self.total_bytes = 0
+        self.made_dirs = set()
+        self.index()
+
+        self.thread = threading.Thread(target=self.write_loop, name="image-archive", daemon=True)
+        self.thread.start()
+
+    def index(self):
+        """
+        Find the files already archived, oldest first, to enforce the budget against.
+        """
+        files = []
+        if os.path.isdir(self.root):
+            for dir, dirs, names in os.walk(self.root):
+                dirs[:] = [name for name in dirs if not self.is_kept(os.path.join(dir, name))]
+                if dir == self.root:
+                    continue
+                for name in names:
+                    path = os.path.join(dir, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, path, stat.st_size))
+        files.sort()
+        self.files = collections.deque((path, size) for _, path, size in files)
+        self.total_bytes = sum(size for _, size in self.files)
+
+    def is_kept(self, dir):
+        dir = os.path.normpath(dir)
+        return any(dir == kept or dir.startswith(kept + os.sep) for kept in self.keep)
+
+    def save(self, image, dir, prefix="im", dedupe=True, source=None):
+        """
+        Queue an image to be saved in dir. Only images from the same source, eg.
+        a camera or zone, and of the same kind (by default the prefix) are
+        deduplicated against each other. The caller must not change the image
+        afterwards. Returns False if it was dropped because the writer is behind.
+        """
+        try:
+            self.queue.put_nowait(ArchiveItem(image, dir, prefix, dedupe, source or prefix))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            logging.warning("Image archive queue full, dropped image for {dir}", dir=dir)
+            return False
+        with self.lock:
+            self.queued += 1
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def is_duplicate(self, item):
+        recent = self.recent[(item.dir, item.source)]
+        while recent and item.time - recent[0][1] > self.dedupe_window:
+            recent.popleft()
+        key = dhash(item.image)
+        for other, _ in recent:
+            if hamming(key, other) <= self.dedupe_distance:
+                return True
+        recent.append((key, item.time))
+        return False
+
+    def file_name(self, dir, prefix, when):
+        stamp = datetime.fromtimestamp(when)
+        base = f"{prefix}-{stamp.strftime('%Y%m%d%H%M%S')}-{stamp.microsecond // 1000:03d}"
+        name = f"{base}.jpg"
+        n = 1
+        while os.path.exists(os.path.join(dir, name)):
+            name = f"{base}-{n}.jpg"
+            n += 1
+        return name
+
+    def write_file(self, image, path):
+        dir = os.path.dirname(path)
+        if dir not in self.made_dirs:
+            os.makedirs(dir, exist_ok=True)
+            self.made_dirs.add(dir)
+        image.save(path, quality=self.quality)
+        size = os.path.getsize(path)
+        if not self.is_kept(dir):
+            self.files.append((path, size))
+            self.total_bytes += size
+        return size
+
+    def write(self, item):
+        if item.dedupe and self.dedupe_distance >= 0 and self.is_duplicate(item):
+            with self.lock:
+                self.duplicates += 1
+            return
+
+        start = time.time()
+        name = self.file_name(item.dir, item.prefix, item.time)
+        size = self.write_file(item.image, os.path.join(item.dir, name))
+        for variant, longest in self.variants.items():
+            copy = item.image.copy()
+            copy.thumbnail((longest, longest), Image.LANCZOS)
+            size += self.write_file(copy, os.path.join(item.dir, variant, name))
+        with self.lock:
+            self.written += 1
+            self.bytes_written += size
+            self.write_secs += time.time() - start
+        self.evict()
+
+    def evict(self):
+        while self.total_bytes > self.budget and self.files:
+            path, size = self.files.popleft()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.total_bytes -= size
+            with self.lock:
+                self.evicted += 1
+
+    def write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                self.write(item)
+            except Exception as error:
+                logging.error("Could not archive image in {dir}: {error}", dir=item.dir, error=str(error))
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "depth": self.queue.qsize(),
+                "max_depth": self.max_depth,
+                "queued": self.queued,
+                "written": self.written,
+                "duplicates": self.duplicates,
+                "dropped": self.dropped,
+                "evicted": self.evicted,
+                "used_mb": round(self.total_bytes / 1024 / 1024, 1),
+                "mb_per_sec": round(self.bytes_written / 1024 / 1024 / self.write_secs, 2) if self.write_secs else 0.0,
+            }
+
+    def log_stats(self):
+        logging.info("Image archive: {written} written at {mb_per_sec}MB/s, {duplicates} duplicates, {dropped} dropped, {evicted} evicted, queue {depth} (max {max_depth}), {used_mb}MB used", **self.stats())
+
+    def close(self, timeout=10):
+        """
+        Finish writing whatever is queued, waiting up to timeout seconds.
+        """
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
@@ -0,0 +1,20 @@
+from PIL import Image
+
+def dhash(image, size=8):
+    """
+    Difference hash: shrink to (size+1) x size greys and set one bit for each
+    pixel that is brighter than its right hand neighbour. Images that look
+    alike get hashes a small Hamming distance apart.
+    """
+    small = image.resize((size + 1, size), Image.BILINEAR, reducing_gap=2.0).convert("L")
+    pixels = small.tobytes()
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
@@ -0,0 +1,22 @@
+import logging
+
+class KeywordLogger(logging.RootLogger):
+    """
+    A root logger that takes seqlog's keyword properties, eg.
+    logging.info("Loaded {model}", model=path), and formats them into the
+    message, for when logs aren't going to Seq.
+    """
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1, **properties):
+        if properties:
+            try:
+                msg = msg.format(**properties)
+            except (KeyError, IndexError, ValueError):
+                msg = f"{msg} {properties}"
+        super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel)
+
+def use_keyword_logging(level=logging.INFO):
+    """
+    Log to stderr with the standard library, keeping the seqlog-style calls working.
+    """
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(message)s")
+    logging.root.__class__ = KeywordLogger
@@ -1,24 +1,33 @@
 import sys
 import requests
 
+from pigeonator.HttpClient import HttpClient
+
 class LinkTapError(Exception):
      def __init__(self, message):
          self.message = message
 
 class LinkTap:
-    def __init__(self, username, apiKey):
-        self.base_url = "https://www.link-tap.com/api/"
+    def __init__(self, username, apiKey, client=None, base_url="https://www.link-tap.com/api/"):
+        self.base_url = base_url
         self.username = username
         self.apiKey = apiKey
+        self.client = client or HttpClient("linktap")
 
     def call_api(self, url, payload):
-        r = requests.post(url, data=payload)
+        try:
+            r = self.client.post(url, data=payload)
+        except requests.RequestException as error:
+            raise LinkTapError(f"Failed to connect to API ({error})")
         if r.status_code == requests.codes.ok:
-            data = r.json()
-            if data["result"] == "error":
-                raise LinkTapError("API returned error (code={r.status_code})")
-            elif data is None:
-                raise LinkTapError("Failed to return data (code={r.status_code})")
+            try:
+                data = r.json()
+            except ValueError as error:
+                raise LinkTapError(f"API returned invalid JSON ({error})")
+            if not isinstance(data, dict):
+                raise LinkTapError(f"Failed to return data (code={r.status_code})")
+            elif data.get("result") == "error":
+                raise LinkTapError(f"API returned error ({data.get('message', 'no message')})")
             else:
                 return data
         else:
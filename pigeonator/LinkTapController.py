@@ -0,0 +1,179 @@
+import math
+import time
+import logging
+import threading
+
+from pigeonator.LinkTap import LinkTapError
+
+class CachedCall():
+    def __init__(self, function, ttl):
+        """
+        Remember what function returned for ttl seconds.
+        """
+        self.function = function
+        self.ttl = ttl
+        self.value = None
+        self.time = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            if self.time is not None and now - self.time < self.ttl:
+                self.hits += 1
+                return self.value
+            self.misses += 1
+        value = self.function()
+        with self.lock:
+            self.value = value
+            self.time = now
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.time = None
+
+class LinkTapController():
+    def __init__(self, linktap, gateway_id, taplinker_id, min_interval=15, max_duration=60, extend_margin=3, status_ttl=30, devices_ttl=300):
+        """
+        Run one LinkTap valve for any number of detections without sending the
+        cloud API a command for each. The controller keeps track of when the valve
+        will turn off. spray() only records how long the valve is wanted on for:
+        a request that ends within extend_margin seconds of the current or
+        already wanted spray is merged into it, and a later one extends it. A
+        background thread sends the commands, never two within min_interval
+        seconds of each other, and never for more than max_duration seconds.
+        Watering status and the device list are cached for status_ttl and
+        devices_ttl seconds.
+        """
+        self.linktap = linktap
+        self.gateway_id = gateway_id
+        self.taplinker_id = taplinker_id
+        self.min_interval = min_interval
+        self.max_duration = max_duration
+        self.extend_margin = extend_margin
+        self.status = CachedCall(lambda: linktap.get_watering_status(taplinker_id), status_ttl)
+        self.devices = CachedCall(linktap.get_all_devices, devices_ttl)
+        self.condition = threading.Condition()
+
+        self.watering_until = 0
+        self.wanted_until = 0
+        self.last_command = None
+        self.requests = 0
+        self.coalesced = 0
+        self.deferred = 0
+        self.commands = 0
+        self.extensions = 0
+        self.failures = 0
+
+        self.running = True
+        self.thread = threading.Thread(target=self.command_loop, name="linktap", daemon=True)
+        self.thread.start()
+
+    def is_watering(self, now=None):
+        return (now or time.time()) < self.watering_until
+
+    def spray(self, secs, label=None, now=None):
+        """
+        Ask for the valve to be on for the next secs seconds. Never waits on the
+        API. Returns False if an earlier request already covers it.
+        """
+        now = now or time.time()
+        until = now + secs
+        with self.condition:
+            self.requests += 1
+            if until <= max(self.watering_until, self.wanted_until) + self.extend_margin:
+                self.coalesced += 1
+                return False
+            self.wanted_until = until
+            if self.last_command is not None and now - self.last_command < self.min_interval:
+                self.deferred += 1
+            self.condition.notify()
+        logging.info("Deterring {label} with sprinkler for {secs} seconds", label=label, secs=secs)
+        print(f"Deterring {label} with sprinkler for {secs} seconds")
+        return True
+
+    def next_command_time(self, now):
+        """
+        When the next command is due, or None if the valve is already on for as
+        long as it is wanted.
+        """
+        if self.wanted_until <= now or self.wanted_until <= self.watering_until + self.extend_margin:
+            return None
+        if self.last_command is None:
+            return now
+        return max(now, self.last_command + self.min_interval)
+
+    def command_loop(self):
+        while True:
+            with self.condition:
+                while self.running:
+                    now = time.time()
+                    due = self.next_command_time(now)
+                    if due is not None and due <= now:
+                        break
+                    self.condition.wait(due - now if due is not None else None)
+                if not self.running:
+                    return
+                secs = min(max(math.ceil(self.wanted_until - now), 3), self.max_duration)
+                extending = self.is_watering(now)
+                self.last_command = now
+            try:
+                self.send(now, secs, extending)
+            except Exception as error:
+                # Keep the thread alive for later requests, whatever went wrong
+                with self.condition:
+                    self.failures += 1
+                logging.error("Linktap command failed unexpectedly: {error}", error=str(error))
+                print(f"Linktap command failed unexpectedly: {error}")
+
+    def send(self, now, secs, extending):
+        try:
+            self.linktap.activate_instant_mode(self.gateway_id, self.taplinker_id, True, 0, secs, False)
+        except LinkTapError as error:
+            with self.condition:
+                self.failures += 1
+            logging.error("Failed to execute linktap command: {message}", message=error.message)
+            print(f"Failed to execute linktap command: {error.message}")
+            return
+
+        self.status.clear()
+        with self.condition:
+            self.watering_until = now + secs
+            self.commands += 1
+            if extending:
+                self.extensions += 1
+        logging.debug("Sprinkler on for {secs}s", secs=secs)
+
+    def watering_status(self):
+        """
+        The valve's watering status from the API, at most status_ttl seconds old.
+        """
+        return self.status.get()
+
+    def all_devices(self):
+        return self.devices.get()
+
+    def stats(self):
+        with self.condition:
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "deferred": self.deferred,
+                "commands": self.commands,
+                "extensions": self.extensions,
+                "failures": self.failures,
+                "cache_hits": self.status.hits + self.devices.hits,
+                "cache_misses": self.status.misses + self.devices.misses,
+            }
+
+    def log_stats(self):
+        logging.info("Sprinkler: {requests} requests, {commands} commands ({extensions} extending a spray), {coalesced} coalesced, {deferred} deferred, {failures} failures, status cache {cache_hits} hits/{cache_misses} misses", **self.stats())
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
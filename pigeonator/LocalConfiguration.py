@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import logging
+import threading
+import confuse
+
+from collections.abc import Mapping
+
+DEFAULT_FILE = "config_default.yaml"
+
+def tool_dir():
+    """
+    The directory of the tool being run, which holds its config.yaml and
+    config_default.yaml: the one its script is in, or that python -m pigeonator
+    put first on the path. Falls back on the current directory.
+    """
+    for path in (sys.path[0], os.getcwd()):
+        if path and os.path.exists(os.path.join(path, DEFAULT_FILE)):
+            return os.path.abspath(path)
+    return os.getcwd()
+
+class LocalConfiguration(confuse.Configuration):
+    def config_dir (self):
+        return tool_dir()
+
+    def _add_default_source(self):
+        """
+        Fall back on config_default.yaml for anything config.yaml leaves out.
+        """
+        path = os.path.join(self.config_dir(), DEFAULT_FILE)
+        self.add(confuse.YamlSource(path, loader=self.loader, optional=True, default=True))
+
+def kind(value):
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, (int, float)):
+        return float
+    if isinstance(value, dict):
+        return dict
+    if isinstance(value, list):
+        return list
+    return type(value)
+
+def typed(value, default, path):
+    """
+    Check a value against its default from config_default.yaml, turning whole
+    numbers into floats where the default is a float.
+    """
+    if value is None or default is None:
+        return value
+    if kind(value) != kind(default):
+        raise confuse.ConfigTypeError(f"{path} must be a {kind(default).__name__}, not {type(value).__name__}")
+    if isinstance(default, float) and not isinstance(value, float):
+        return float(value)
+    if isinstance(default, dict):
+        return {key: typed(item, default.get(key), f"{path}.{key}") for key, item in value.items()}
+    return value
+
+def freeze(value):
+    if isinstance(value, dict):
+        return Snapshot(value)
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+class Snapshot(Mapping):
+    def __init__(self, values):
+        """
+        An immutable copy of (a section of) the configuration, read with plain
+        attribute access, eg. snapshot.model.confidence_threshold. Sections are
+        snapshots too and lists are tuples, and it is still a mapping so it can
+        be passed as **options.
+        """
+        object.__setattr__(self, "_values", {key: freeze(value) for key, value in values.items()})
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are read only")
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"Snapshot({dict(self._values)!r})"
+
+def snapshot(config):
+    defaults = next((source for source in config.sources if source.default), {})
+    values = config.flatten()
+    return Snapshot({key: typed(value, defaults.get(key), key) for key, value in values.items()})
+
+def modified_time(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+class LiveSettings():
+    def __init__(self, config):
+        """
+        The current settings snapshot, taken once at startup so that reading a
+        setting is two attribute lookups rather than a walk through confuse's
+        layered views. watch() polls config.yaml and, when it changes, swaps
+        in a new snapshot in one assignment, so a reader holding the old one
+        sees it unchanged. A config.yaml that doesn't load or type check is
+        logged and the old settings kept.
+        """
+        self.configuration = config
+        self.current = snapshot(config)
+        self.version = 0
+        self.path = config.user_config_path()
+        self.mtime = modified_time(self.path)
+        self.running = False
+
+    def __getattr__(self, name):
+        if name == "current":
+            raise AttributeError(name)
+        return getattr(self.current, name)
+
+    def reload(self):
+        try:
+            config = LocalConfiguration(self.configuration.appname)
+            current = snapshot(config)
+        except confuse.ConfigError as error:
+            logging.error("Could not reload {path}, keeping the current settings: {error}", path=self.path, error=str(error))
+            print(f"Could not reload {self.path}: {error}")
+            return False
+
+        changed = [key for key in current if current.get(key) != self.current.get(key)]
+        self.configuration = config
+        self.current = current
+        self.version += 1
+        logging.info("Reloaded {path}, changed {sections}", path=self.path, sections=changed)
+        print(f"Reloaded {self.path}, changed {changed}")
+        return True
+
+    def watch(self, interval):
+        """
+        Check config.yaml for changes every interval seconds on a background thread.
+        """
+        if interval <= 0 or self.running:
+            return
+        self.running = True
+        threading.Thread(target=self.watch_loop, args=(interval,), name="settings-watch", daemon=True).start()
+
+    def watch_loop(self, interval):
+        while self.running:
+            time.sleep(interval)
+            mtime = modified_time(self.path)
+            if mtime != self.mtime:
+                self.mtime = mtime
+                self.reload()
+
+    def close(self):
+        self.running = False
+
+Config = LocalConfiguration("Pigeonator")
+Settings = LiveSettings(Config)
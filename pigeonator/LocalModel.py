@@ -0,0 +1,216 @@
+import logging
+import threading
+import numpy as np
+
+ONNX_TYPES = {"tensor(uint8)": np.uint8, "tensor(int8)": np.int8, "tensor(float16)": np.float16}
+
+# Input of each ONNX op at which its output's scale, then zero point, is given
+OUTPUT_SCALE_INPUTS = {"QuantizeLinear": 1, "QLinearConv": 6, "QLinearMatMul": 6}
+
+class LocalModel():
+    def __init__(self, model_path, threads=4, layout=None, mean=None, std=None, input_size=None, quantization=None):
+        """
+        Load an exported ONNX (.onnx) or TensorFlow Lite (.tflite) model once and
+        run it on the CPU with the given number of threads. Quantized models are
+        supported: integer inputs are quantized and integer outputs dequantized
+        using the scales stored in the model. For ONNX the input's scale and zero
+        point come from the DequantizeLinear (or QLinear op) that reads it, and
+        each output's from the QuantizeLinear (or QLinear op) that makes it,
+        which needs the onnx package; quantization, as [scale, zero_point],
+        gives the input's instead.
+
+        layout is "nchw" or "nhwc" (by default taken from the model's input shape),
+        and mean/std, if given, normalise 0-1 pixel values per channel. input_size
+        (width, height) is needed for models exported with a dynamic image size.
+        """
+        self.model_path = model_path
+        self.lock = threading.Lock()
+        self.mean = np.array(mean, dtype=np.float32) if mean else None
+        self.std = np.array(std, dtype=np.float32) if std else None
+
+        if model_path.endswith(".tflite"):
+            self.load_tflite(threads)
+        elif model_path.endswith(".onnx"):
+            self.load_onnx(threads)
+        else:
+            raise ValueError(f"Unsupported model type: {model_path}")
+
+        self.layout = layout or ("nchw" if self.input_shape[1] in (1, 3) else "nhwc")
+        if self.layout == "nchw":
+            self.input_height, self.input_width = self.input_shape[2], self.input_shape[3]
+        else:
+            self.input_height, self.input_width = self.input_shape[1], self.input_shape[2]
+        if input_size:
+            self.input_width, self.input_height = input_size
+        if quantization:
+            self.input_quantization = (float(quantization[0]), int(quantization[1]))
+        self.check_quantization()
+        logging.info("Loaded {model} with {threads} threads, input {width}x{height} {dtype}", model=model_path, threads=threads, width=self.input_width, height=self.input_height, dtype=str(self.input_dtype))
+
+    def load_tflite(self, threads):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.backend = "tflite"
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=threads)
+        self.interpreter.allocate_tensors()
+        input_details = self.interpreter.get_input_details()[0]
+        self.input_index = input_details["index"]
+        self.input_shape = [int(n) for n in input_details["shape"]]
+        self.input_dtype = input_details["dtype"]
+        self.input_quantization = input_details["quantization"]
+        self.batch_dynamic = False
+
+    def load_onnx(self, threads):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.backend = "onnx"
+        self.session = onnxruntime.InferenceSession(self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.batch_dynamic = not isinstance(model_input.shape[0], int)
+        self.input_shape = [n if isinstance(n, int) else 1 for n in model_input.shape]
+        self.input_dtype = ONNX_TYPES.get(model_input.type, np.float32)
+        integer_outputs = [output.name for output in self.session.get_outputs() if np.issubdtype(ONNX_TYPES.get(output.type, np.float32), np.integer)]
+
+        graph, constants = None, {}
+        if np.issubdtype(self.input_dtype, np.integer) or integer_outputs:
+            graph, constants = self.onnx_graph()
+        self.input_quantization = self.onnx_input_quantization(graph, constants) if np.issubdtype(self.input_dtype, np.integer) else (0.0, 0)
+        self.output_quantization = self.onnx_output_quantization(graph, constants, integer_outputs)
+        unknown = [name for name in integer_outputs if name not in self.output_quantization]
+        if unknown:
+            logging.warning("Integer outputs {outputs} of {model} have no known scale, so are returned as they are", outputs=unknown, model=self.model_path)
+
+    def onnx_graph(self):
+        """
+        The ONNX model's graph and its constant tensors by name, or (None, {})
+        without the onnx package.
+        """
+        try:
+            import onnx
+            from onnx import numpy_helper
+        except ImportError:
+            return None, {}
+
+        graph = onnx.load(self.model_path).graph
+        constants = {initializer.name: numpy_helper.to_array(initializer) for initializer in graph.initializer}
+        for node in graph.node:
+            if node.op_type == "Constant":
+                constants.update({name: numpy_helper.to_array(attribute.t) for name in node.output for attribute in node.attribute if attribute.name == "value"})
+        return graph, constants
+
+    def onnx_input_quantization(self, graph, constants):
+        """
+        The scale and zero point of an ONNX model's integer input, from the
+        DequantizeLinear or QLinear op that reads it, or (0.0, 0) if unknown.
+        """
+        if graph is None:
+            return (0.0, 0)
+        for node in graph.node:
+            if node.input[:1] != [self.input_name] or not (node.op_type == "DequantizeLinear" or node.op_type.startswith("QLinear")):
+                continue
+            quantization = scale_and_zero_point(constants, node, 1)
+            if quantization is not None:
+                return quantization
+        return (0.0, 0)
+
+    def onnx_output_quantization(self, graph, constants, names):
+        """
+        The scale and zero point of each of the named integer outputs, from the
+        QuantizeLinear, QLinearConv or QLinearMatMul op that makes it. Outputs
+        of unknown scale are left out.
+        """
+        quantization = {}
+        if graph is None:
+            return quantization
+        for node in graph.node:
+            scale_index = OUTPUT_SCALE_INPUTS.get(node.op_type)
+            if scale_index is None or node.output[0] not in names:
+                continue
+            output = scale_and_zero_point(constants, node, scale_index)
+            if output is not None:
+                quantization[node.output[0]] = output
+        return quantization
+
+    def check_quantization(self):
+        """
+        Refuse an integer input that can't be filled without knowing its scale:
+        int8, or normalised with mean/std. A uint8 input without them takes the
+        camera's pixel values as they are.
+        """
+        scale, _ = self.input_quantization
+        if np.issubdtype(self.input_dtype, np.integer) and not scale and (self.input_dtype != np.uint8 or self.mean is not None):
+            raise ValueError(f"{self.model_path} takes {np.dtype(self.input_dtype).name} input of unknown scale and zero point; "
+                             "give them in options as quantization: [scale, zero_point]")
+
+    def prepare(self, images):
+        """
+        Turn a list of PIL images into one input tensor for the model.
+        """
+        pixels = np.stack([np.asarray(image.convert("RGB").resize((self.input_width, self.input_height)), dtype=np.uint8) for image in images])
+        if self.layout == "nchw":
+            pixels = pixels.transpose(0, 3, 1, 2)
+
+        # Quantized uint8 models take the camera's pixel values as they are
+        if self.input_dtype == np.uint8 and self.mean is None:
+            return np.ascontiguousarray(pixels)
+
+        values = pixels.astype(np.float32) / 255.0
+        if self.mean is not None:
+            shape = (1, 3, 1, 1) if self.layout == "nchw" else (1, 1, 1, 3)
+            values = (values - self.mean.reshape(shape)) / self.std.reshape(shape)
+
+        scale, zero_point = self.input_quantization
+        if np.issubdtype(self.input_dtype, np.integer) and scale:
+            info = np.iinfo(self.input_dtype)
+            return np.clip(np.round(values / scale + zero_point), info.min, info.max).astype(self.input_dtype)
+        return values.astype(self.input_dtype)
+
+    def run(self, tensor):
+        """
+        Run the model and return its outputs as a list of (name, float array).
+        """
+        if self.backend == "onnx":
+            names = [output.name for output in self.session.get_outputs()]
+            with self.lock:
+                values = self.session.run(None, {self.input_name: tensor})
+            return [(name, dequantize(value, self.output_quantization.get(name))) for name, value in zip(names, values)]
+
+        outputs = []
+        with self.lock:
+            self.interpreter.set_tensor(self.input_index, tensor)
+            self.interpreter.invoke()
+            values = [(details, self.interpreter.get_tensor(details["index"])) for details in self.interpreter.get_output_details()]
+        for details, value in values:
+            outputs.append((details["name"], dequantize(value, details["quantization"])))
+        return outputs
+
+def scale_and_zero_point(constants, node, scale_index):
+    """
+    The per-tensor scale and zero point an ONNX node takes as its inputs from
+    scale_index, or None if they aren't constants.
+    """
+    scale = constants.get(node.input[scale_index]) if len(node.input) > scale_index else None
+    zero_point = constants.get(node.input[scale_index + 1]) if len(node.input) > scale_index + 1 else None
+    if scale is None or scale.size != 1:
+        return None
+    return (float(scale.reshape(-1)[0]), int(zero_point.reshape(-1)[0]) if zero_point is not None else 0)
+
+def dequantize(value, quantization):
+    scale, zero_point = quantization or (0.0, 0)
+    if not scale:
+        return value
+    return (value.astype(np.float32) - zero_point) * scale
+
+def load_labels(path):
+    if path is None:
+        return None
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
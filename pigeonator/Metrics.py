@@ -0,0 +1,210 @@
+import time
+import bisect
+import logging
+import threading
+import contextlib
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in sorted(labels.items())) + "}"
+
+class Counter():
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.type = "counter"
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, dict(key), value) for key, value in self.values.items()]
+
+class Gauge():
+    def __init__(self, name, help, function=None, label=None):
+        """
+        A value that goes up and down. Either set() it, or give a function that
+        returns the value when scraped, or a dict of values keyed by the value
+        of label.
+        """
+        self.name = name
+        self.help = help
+        self.type = "gauge"
+        self.function = function
+        self.label = label
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+            if isinstance(value, dict):
+                return [(self.name, {self.label: key}, v) for key, v in value.items() if v is not None]
+            return [(self.name, {}, value)] if value is not None else []
+        with self.lock:
+            return [(self.name, dict(key), value) for key, value in self.values.items()]
+
+class Histogram():
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, series in self.series.items():
+                labels = dict(key)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                    cumulative += count
+                    samples.append((self.name + "_bucket", dict(labels, le="+Inf" if bound == float("inf") else str(bound)), cumulative))
+                samples.append((self.name + "_sum", labels, series["sum"]))
+                samples.append((self.name + "_count", labels, series["count"]))
+        return samples
+
+    def quantile(self, q, series):
+        """
+        Estimate a quantile by interpolating within its bucket, as Prometheus does.
+        """
+        rank = q * series["count"]
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, series["counts"]):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return self.buckets[-1]
+
+    def summary(self):
+        with self.lock:
+            return {key: {"count": series["count"],
+                          "mean": series["sum"] / series["count"],
+                          "p50": self.quantile(0.5, series),
+                          "p95": self.quantile(0.95, series),
+                          "p99": self.quantile(0.99, series)}
+                    for key, series in self.series.items() if series["count"]}
+
+class Metrics():
+    def __init__(self, prefix, labels=None):
+        """
+        A registry of counters, gauges and histograms that can be served in the
+        Prometheus text format. Every metric name starts with prefix and every
+        sample carries labels (eg. the host name) so a fleet can share one dashboard.
+        """
+        self.prefix = prefix
+        self.labels = labels or {}
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def add(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help=""):
+        return self.add(Counter(f"{self.prefix}_{name}", help))
+
+    def gauge(self, name, help="", function=None, label=None):
+        return self.add(Gauge(f"{self.prefix}_{name}", help, function, label))
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(f"{self.prefix}_{name}", help, buckets))
+
+    @contextlib.contextmanager
+    def timer(self, histogram, **labels):
+        """
+        Observe how long the with block takes, in seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{label_text(dict(self.labels, **labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self):
+        lines = []
+        with self.lock:
+            histograms = [metric for metric in self.metrics.values() if metric.type == "histogram"]
+        for histogram in histograms:
+            for key, stats in histogram.summary().items():
+                name = histogram.name[len(self.prefix) + 1:] + label_text(dict(key))
+                lines.append(f"{name}: n={stats['count']} mean={stats['mean']*1000:.1f}ms p50={stats['p50']*1000:.1f}ms p95={stats['p95']*1000:.1f}ms p99={stats['p99']*1000:.1f}ms")
+        return lines
+
+    def log_summary(self):
+        for line in self.summary_lines():
+            logging.info("Metrics {summary}", summary=line)
+
+    def serve(self, port, host="0.0.0.0"):
+        """
+        Serve /metrics on a background thread.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        logging.info("Serving metrics on port {port}", port=port)
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,119 @@
+import json
+import time
+import argparse
+import threading
+
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockLinkTapHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        fields = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+        reply = self.server.mock.handle(self.path.rstrip("/").split("/")[-1], fields)
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockLinkTap():
+    def __init__(self, command_interval=15, status_interval=30, devices_interval=300, port=0):
+        """
+        A local stand-in for the LinkTap cloud API, to try the sprinkler without
+        a valve or an account. It keeps each taplinker's valve state, answers
+        like the real API, and rate limits as it does: a command within
+        command_interval seconds of the last, or a status or device list request
+        sooner than its interval, gets an error. Every call is recorded in calls.
+        Use as a context manager and point LinkTap's base_url at base_url.
+        """
+        self.command_interval = command_interval
+        self.intervals = {"getWateringStatus": status_interval, "getAllDevices": devices_interval}
+        self.port = port
+        self.lock = threading.Lock()
+        self.calls = []
+        self.last_call = {}
+        self.valves = {}
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+
+    def rate_limited(self, api, now):
+        key = "command" if api.startswith("activate") else api
+        interval = self.command_interval if key == "command" else self.intervals.get(api, 0)
+        last = self.last_call.get(key)
+        if last is not None and now - last < interval:
+            return True
+        self.last_call[key] = now
+        return False
+
+    def handle(self, api, fields):
+        now = time.time()
+        with self.lock:
+            self.calls.append((now, api, fields))
+            if fields.get("username") is None or fields.get("apiKey") is None:
+                return {"result": "error", "message": "username and apiKey are required"}
+            if self.rate_limited(api, now):
+                return {"result": "error", "message": f"{api} called too often"}
+
+            taplinker = fields.get("taplinkerId")
+            if api == "activateInstantMode":
+                if fields.get("action") == "true":
+                    self.valves[taplinker] = (now, int(fields.get("durationSec") or 0) + 60 * int(fields.get("duration") or 0))
+                else:
+                    self.valves.pop(taplinker, None)
+                return {"result": "ok"}
+            if api.startswith("activate"):
+                self.valves.pop(taplinker, None)
+                return {"result": "ok"}
+            if api == "getWateringStatus":
+                return {"result": "ok", "status": self.watering_status(taplinker, now)}
+            if api == "getAllDevices":
+                taplinkers = [{"taplinkerId": id, "status": "Connected", "watering": self.watering_status(id, now) is not None} for id in self.valves]
+                return {"result": "ok", "devices": [{"gatewayId": "mock", "status": "Connected", "taplinker": taplinkers}]}
+            return {"result": "error", "message": f"Unknown API {api}"}
+
+    def watering_status(self, taplinker, now):
+        if taplinker not in self.valves:
+            return None
+        start, secs = self.valves[taplinker]
+        remaining = start + secs - now
+        if remaining <= 0:
+            return None
+        return {"onDuration": round(remaining), "total": secs, "onStamp": int(start * 1000)}
+
+    def command_count(self):
+        with self.lock:
+            return sum(1 for _, api, _ in self.calls if api.startswith("activate"))
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), MockLinkTapHandler)
+        self.server.mock = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock LinkTap API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--command-interval", type=float, default=15, help="least seconds between commands")
+    args = parser.parse_args()
+    with MockLinkTap(args.command_interval, port=args.port) as mock:
+        print(f"Mock LinkTap API at {mock.base_url}, set linktap.base_url to use it")
+        try:
+            while True:
+                time.sleep(10)
+                print(f"{len(mock.calls)} calls, {mock.command_count()} commands")
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+import io
+import abc
+import time
+import json
+import base64
+import signal
+import logging
+import argparse
+import platform
+import importlib
+import requests
+
+from pigeonator.FrameSource import create_frame_source
+from pigeonator.Pipeline import Pipeline
+from pigeonator.ActionExecutor import ActionExecutor, ActionError
+from pigeonator.ImageArchive import ImageArchive
+from pigeonator.Metrics import Metrics
+from pigeonator.ThermalGovernor import ThermalGovernor
+from pigeonator.HttpClient import HttpClient
+from pigeonator.LinkTap import LinkTap
+from pigeonator.LinkTapController import LinkTapController
+from pigeonator.HeadlessWindow import HeadlessWindow, WIN_CLOSED
+from pigeonator.KeywordLogger import use_keyword_logging
+from pigeonator.LocalConfiguration import Config, Settings
+
+def setup_logging():
+    """
+    Send logs to Seq, or without seqlog installed just log to stderr.
+    """
+    try:
+        import seqlog
+    except ImportError:
+        use_keyword_logging(logging.DEBUG)
+        return
+    seqlog.log_to_seq(
+       server_url=Settings.seq.url,
+       api_key=Settings.seq.api_key,
+       level=logging.DEBUG,
+       batch_size=10,
+       auto_flush_timeout=10,  # seconds
+       override_root_logger=True,
+       json_encoder_class=json.encoder.JSONEncoder  # Optional; only specify this if you want to use a custom JSON encoder
+    )
+
+def load_model(section, **kwargs):
+    """
+    Build the detector or classifier a config section names, eg.
+    RemoteDetector or LocalClassifier, from the tool's module of that name.
+    """
+    module = importlib.import_module(section.name)
+    clss = getattr(module, section.name)
+    return clss(section.url, **kwargs, **section.options)
+
+class PigeonatorApp(abc.ABC):
+    def __init__(self, name, headless=False, started=None):
+        """
+        What the detector and the classifier have in common: the frame source,
+        window, HTTP clients, background actions, sprinkler, image archive,
+        thermal governor and metrics, and a loop that runs each frame through
+        the tool's pipeline stages. A tool subclasses this, builds its own
+        parts, calls start() and supplies stages().
+
+        With headless set there is no window and no display work, for units
+        that run unattended. started is when the process started, to report
+        the time to the first inference from.
+        """
+        self.name = name
+        self.headless = headless
+        self.started = started or time.time()
+        self.first_inference_secs = None
+        self.event = None
+        self.values = None
+        self.pipeline = None
+
+        self.stream = io.BytesIO()
+        self.source = create_frame_source(self.stream, Config)
+        self.archive = ImageArchive(
+            "images",
+            Settings.archive.budget_mb,
+            Settings.archive.quality,
+            Settings.archive.variants,
+            Settings.archive.dedupe_distance,
+            Settings.archive.dedupe_window,
+            Settings.archive.queue_size,
+            Settings.archive.keep)
+
+        self.window = self.create_window()
+        self.linktap_client = self.http_client("linktap")
+        self.imgbb_client = self.http_client("imgbb")
+        self.http_clients = [self.linktap_client, self.imgbb_client]
+        self.last_stats_time = time.time()
+
+        self.actions = ActionExecutor(
+            Settings.actions.workers,
+            Settings.actions.limits,
+            Settings.actions.max_pending,
+            Settings.actions.retries,
+            Settings.actions.retry_delay)
+        self.linktap = LinkTap(Settings.linktap.username, Settings.linktap.api_key, self.linktap_client, Settings.linktap.base_url)
+        self.sprinkler = LinkTapController(
+            self.linktap,
+            Settings.linktap.gateway_id,
+            Settings.linktap.taplinker_id,
+            Settings.linktap.min_interval,
+            Settings.linktap.max_duration,
+            Settings.linktap.extend_margin,
+            Settings.linktap.status_ttl,
+            Settings.linktap.devices_ttl)
+
+        from gpiozero import CPUTemperature
+        self.cpu = CPUTemperature()
+        self.governor = ThermalGovernor(
+            lambda: self.cpu.temperature,
+            Settings.cpu.curves,
+            Settings.cpu.sample_interval,
+            Settings.cpu.smoothing)
+        self.temperature = None
+
+    def start(self):
+        """
+        Serve metrics and watch config.yaml once the tool has built everything.
+        """
+        self.setup_metrics()
+        port = Settings.metrics.port
+        if port:
+            self.metrics.serve(port)
+
+        self.settings = Settings.current
+        Settings.watch(Settings.config.reload_interval)
+        logging.info("Started in {secs}s", secs=round(time.time() - self.started, 2))
+
+    @abc.abstractmethod
+    def layout(self, sg):
+        """
+        The viewer window's PySimpleGUI layout.
+        """
+
+    def create_window(self):
+        """
+        The viewer window, or a stand-in for it when headless. PySimpleGUI is only
+        imported for the viewer.
+        """
+        if self.headless:
+            return HeadlessWindow({"-EXPOSURE-": "Auto", "-CONTRAST-": 0, "-DETECT-": Settings.headless.detect, "-DETER-": Settings.headless.deter})
+
+        import PySimpleGUI as sg
+        return sg.Window(self.title, self.layout(sg))
+
+    def setup_metrics(self):
+        """
+        Register the metrics every tool has. Tools add their own after these.
+        """
+        self.metrics = Metrics(f"pigeonator_{self.name}", {"host": platform.node()})
+        self.stage_seconds = self.metrics.histogram("stage_seconds", f"Time spent in each step of the {self.name}")
+        self.pipeline_seconds = self.metrics.histogram("pipeline_stage_seconds", "Time spent in each pipeline stage")
+        self.action_seconds = self.metrics.histogram("action_seconds", "Run time of background actions")
+        self.actions_total = self.metrics.counter("actions_total", "Background actions finished, by outcome")
+        self.detections_total = self.metrics.counter("detections_total", "Confident detections")
+        self.errors_total = self.metrics.counter("inference_errors_total", "Inferences that got no prediction")
+        self.metrics.gauge("cpu_temperature_celsius", "Smoothed CPU temperature", lambda: self.governor.temperature)
+        self.metrics.gauge("thermal_throttling", "1 while the thermal governor is slowing the loop", lambda: int(self.governor.throttling))
+        self.metrics.gauge("thermal_throttle_episodes", "Times the thermal governor has started throttling", lambda: self.governor.throttle_count)
+        self.metrics.gauge("thermal_setting", "Settings chosen by the thermal governor", self.governor.curve_values, "setting")
+        self.metrics.gauge("queue_depth", "Items waiting in each queue", self.queue_depths, "queue")
+        self.metrics.gauge("sprinkler_requests", "Sprinkler requests and the LinkTap commands sent for them", self.sprinkler_counts, "outcome")
+        self.metrics.gauge("first_inference_seconds", "Time from process start to the first inference", lambda: self.first_inference_secs)
+
+    def sprinkler_counts(self):
+        stats = self.sprinkler.stats()
+        return {name: stats[name] for name in ("requests", "coalesced", "deferred", "commands", "extensions", "failures")}
+
+    def queue_depths(self):
+        depths = {"archive": self.archive.stats()["depth"]}
+        for name, count in self.actions.pending_counts().items():
+            depths[f"action_{name}"] = count
+        if self.pipeline != None:
+            for name, stats in self.pipeline.stats()["queues"].items():
+                depths[f"pipeline_{name}"] = stats["depth"]
+        return depths
+
+    def record_inference(self, secs, model, stage="inference"):
+        """
+        Time an inference, along with the encode, HTTP and parse steps of a remote model.
+        """
+        if self.first_inference_secs == None:
+            self.first_inference_secs = round(time.time() - self.started, 2)
+            logging.info("First inference {secs}s after start", secs=self.first_inference_secs)
+            print(f"First inference {self.first_inference_secs}s after start")
+        self.stage_seconds.observe(secs, stage=stage)
+        for name, stage_secs in getattr(model, "timings", {}).items():
+            self.stage_seconds.observe(stage_secs, stage=name)
+
+    def http_client(self, name):
+        return HttpClient(name, Settings.http.connect_timeout, Settings.http.read_timeout, Settings.http.pool_size)
+
+    def get_exposure(self):
+        return self.values["-EXPOSURE-"]
+
+    def get_contrast(self):
+        return int(self.values["-CONTRAST-"])
+
+    def get_detect_mode(self):
+        return self.values["-DETECT-"]
+
+    def get_deter_mode(self):
+        return self.values["-DETER-"]
+
+    def set_temperature_display(self, text, color):
+        self.window["-TEMP-"].update(text, text_color=color)
+        self.window.refresh()
+
+    def set_camera_exposure(self, exposure):
+        self.source.set_exposure(exposure)
+        self.camera_changed()
+
+    def set_camera_contrast(self, contrast):
+        self.source.set_contrast(contrast)
+        self.window["-CONTRAST-"].SetTooltip(str(contrast))
+        self.camera_changed()
+
+    def camera_changed(self):
+        """
+        Called when the exposure or contrast changes, so that comparisons with
+        earlier frames can start again.
+        """
+        pass
+
+    def check_cpu_temperature(self):
+        """
+        Show the temperature last read by the thermal governor, which slows the
+        loop down as the CPU heats up rather than stopping it.
+        """
+        if self.governor.temperature == None:
+            return
+        self.temperature = round(self.governor.temperature, 1)
+        if self.temperature >= Settings.cpu.throttle_temp:
+            color = "red"
+        elif self.governor.throttling:
+            color = "orange"
+        else:
+            color = "white"
+        self.set_temperature_display(f"{self.temperature}C", color)
+
+    def image_to_base64(self, image):
+        in_mem_file = io.BytesIO()
+        image.save(in_mem_file, format = "PNG")
+
+        # reset file pointer to start
+        in_mem_file.seek(0)
+        img_bytes = in_mem_file.read()
+        return base64.b64encode(img_bytes).decode('ascii')
+
+    def fire_sprinkler(self, secs, label):
+        """
+        Ask for the sprinkler to run. The LinkTap controller merges this with any
+        spray already running and sends the command in the background.
+        """
+        self.sprinkler.spray(secs, label)
+
+    def upload_image(self, image, label, description, size=None):
+        if size != None:
+            image = image.resize(size)
+        url, _, _ = self.imgbb_upload(image, label, description)
+        if url == None:
+            raise ActionError(f"IMGBB upload failed for {label}")
+        return url
+
+    def action_done(self, result):
+        """
+        Called on an action worker thread as each background action completes.
+        """
+        self.action_seconds.observe(result.run_secs, action=result.name)
+        self.actions_total.inc(action=result.name, outcome="ok" if result.ok else "failed")
+        if result.ok:
+            logging.debug("Action {action} done in {secs}s after waiting {wait}s", action=result.name, secs=round(result.run_secs, 1), wait=round(result.queued_secs, 1))
+            return
+
+        message = getattr(result.error, "message", str(result.error))
+        logging.error("Action {action} failed after {attempts} attempts: {message}", action=result.name, attempts=result.attempts, message=message)
+        print(f"Action {result.name} failed after {result.attempts} attempts: {message}")
+
+    def imgbb_upload(self, image, label, description):
+        if not(Settings.imgbb.active):
+            return ("None", "None", "None")
+        payload = {
+            "key": Settings.imgbb.api_key,
+            "image": self.image_to_base64(image),
+            "name": description,
+            "expiration": 3600*24
+        }
+
+        try:
+            reply = self.imgbb_client.post(Settings.imgbb.upload_url, payload)
+        except requests.RequestException:
+            logging.error("Could not contact IMGBB to save image for {label}", label=label)
+            return (None, None, None)
+
+        if reply.reason=="OK":
+            result = json.loads(reply.content)
+            data = result["data"]
+            url = data["url_viewer"]
+            thumb_url = data["thumb"]["url"]
+            image_url = data["url"]
+            logging.info("Saved IMGBB image {url} for {label}", url=image_url, label=label)
+            return (url, thumb_url, image_url)
+
+        logging.error("Unable to save IMGBB image for {label}", label=label)
+        return (None, None, None)
+
+    def log_stats(self):
+        """
+        Log the statistics of every part and a metrics summary every stats_interval seconds.
+        """
+        now = time.time()
+        if now - self.last_stats_time < Settings.http.stats_interval:
+            return
+        self.last_stats_time = now
+        self.log_part_stats()
+        self.metrics.log_summary()
+
+    def log_part_stats(self):
+        for client in self.http_clients:
+            client.log_stats()
+        if self.pipeline != None:
+            self.pipeline.log_stats()
+        self.actions.log_stats()
+        self.sprinkler.log_stats()
+        self.archive.log_stats()
+        self.governor.log_stats()
+
+    def apply_settings(self):
+        """
+        Pick up a reloaded config.yaml. Settings read as they are used, such as
+        thresholds and endpoints, change by themselves; the tool rebuilds
+        anything else it can in settings_changed(). The rest needs a restart.
+        """
+        if Settings.current is self.settings:
+            return
+        previous, self.settings = self.settings, Settings.current
+        self.settings_changed(previous)
+
+    def settings_changed(self, previous):
+        pass
+
+    @abc.abstractmethod
+    def stages(self):
+        """
+        The tool's pipeline stage functions, by stage name.
+        """
+
+    def read_timeout(self):
+        """
+        How long to wait for window events each cycle (ms). Run serially this
+        paces the loop, so the thermal governor's frame delay is added to it.
+        """
+        if self.pipeline.threaded:
+            return Settings.pipeline.poll_ms
+        return Settings.source.poll_ms + int(self.governor.value("frame_delay") * 1000)
+
+    def handle_event(self, event):
+        if event == "-EXPOSURE-":
+            self.set_camera_exposure(self.get_exposure())
+
+        if event == "-CONTRAST-":
+            self.set_camera_contrast(self.get_contrast())
+
+    def run(self):
+        """
+        Run frames through the tool's stages until the window is closed or the
+        frame source runs out. With pipeline.active, capture and the worker
+        stages run on their own threads and this one takes the next frame
+        from them each cycle.
+        """
+        self.pipeline = Pipeline(
+            self.source,
+            self.stages(),
+            self.pipeline_seconds,
+            Settings.pipeline.active,
+            Settings.pipeline.queue_size,
+            lambda: self.governor.value("frame_delay"))
+        self.event, self.values = self.window.read(timeout=0)
+        self.pipeline.start()
+
+        while self.pipeline.is_running():
+            self.event, self.values = self.window.read(timeout=self.read_timeout())
+            if self.event == "Exit" or self.event == WIN_CLOSED:
+                break
+            self.log_stats()
+            self.apply_settings()
+
+            if self.pipeline.next_frame() != None:
+                self.check_cpu_temperature()
+            self.handle_event(self.event)
+
+        self.pipeline.stop()
+        self.close()
+
+    def close(self):
+        """
+        Stop everything, letting queued actions and archive images finish.
+        """
+        self.source.close()
+        if self.pipeline != None:
+            self.pipeline.log_stats()
+        self.actions.stop(Settings.actions.shutdown_timeout)
+        self.actions.log_stats()
+        self.sprinkler.close()
+        self.sprinkler.log_stats()
+        self.archive.close(Settings.actions.shutdown_timeout)
+        self.archive.log_stats()
+        self.governor.close()
+        self.governor.log_stats()
+        self.metrics.log_summary()
+        self.metrics.close()
+        Settings.close()
+        for client in self.http_clients:
+            client.log_stats()
+            client.close()
+        self.window.close()
+
+def launch(app_class, description, argv=None, started=None):
+    """
+    Parse the command line and run a tool until it is closed or stopped.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--headless", action="store_true", help="run as a service, without the viewer window")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    app = app_class(args.headless, started)
+    if args.headless:
+        # Shut down cleanly, flushing what is queued, when the service is stopped
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: app.window.stop())
+    app.run()
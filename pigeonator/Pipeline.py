@@ -0,0 +1,261 @@
+import time
+import logging
+import threading
+import collections
+
+# Every frame goes through these stages in order. The first is capture from the
+# frame source; the tool supplies a function for each of the others it needs,
+# and may supply one for source to note anything about a frame as it is captured.
+STAGES = ("source", "preprocess", "infer", "postprocess", "actions", "sinks")
+
+# Stages that may run on worker threads. The rest update the window, so always
+# run on the thread that reads it.
+WORKER_STAGES = ("preprocess", "infer")
+
+# What a closed queue gives once it is empty. Each stage closes the queue after
+# it when its own is done, so every frame captured from a source that has run
+# out still goes through the rest of the stages.
+END_OF_SOURCE = object()
+
+class FrameQueue():
+    def __init__(self, name, maxsize, drop_oldest=False):
+        """
+        A bounded queue of frames between pipeline threads. One that drops the
+        oldest never blocks the producer: when it is full the oldest frame is
+        thrown away, so the consumer always gets fresh camera frames. Otherwise
+        put() waits for room, so every frame is passed on in order.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.closed = False
+        self.items = collections.deque()
+        self.condition = threading.Condition()
+        self.put_count = 0
+        self.drop_count = 0
+        self.max_depth = 0
+
+    def put(self, item, timeout=None):
+        """
+        Returns False if there was no room within timeout.
+        """
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                if self.drop_oldest:
+                    self.items.popleft()
+                    self.drop_count += 1
+                elif not self.condition.wait_for(lambda: len(self.items) < self.maxsize, timeout):
+                    return False
+            self.items.append(item)
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Returns the oldest item, None if nothing arrives within timeout, or
+        END_OF_SOURCE once the queue is closed and empty.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return END_OF_SOURCE
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+
+    def close(self):
+        """
+        No more items will be put, though those already in it can still be got.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def depth(self):
+        with self.condition:
+            return len(self.items)
+
+    def stats(self):
+        with self.condition:
+            return {"depth": len(self.items), "max_depth": self.max_depth, "puts": self.put_count, "drops": self.drop_count}
+
+class PipelineFrame():
+    def __init__(self, number, data):
+        """
+        A captured frame on its way through the pipeline. Each stage adds what it
+        works out as attributes for the stages after it.
+        """
+        self.number = number
+        self.data = data
+        self.capture_time = time.time()
+
+class Pipeline():
+    def __init__(self, source, stages, histogram=None, threaded=False, queue_size=2, delay=None):
+        """
+        Run frames from source through the STAGES. stages maps each stage to a
+        function that takes a PipelineFrame and returns it, or None to go no
+        further with it; a stage left out is skipped. A source function is
+        called on each frame as it is captured, on the capture thread, and must
+        return it. Every stage is timed, and observed in histogram with a stage
+        label if there is one.
+
+        Serially, next_frame() captures a frame and runs it through every stage.
+        Threaded, capture and the worker stages run on their own threads joined
+        by queues, waiting delay() seconds between frames, and next_frame() runs
+        the remaining stages on the next frame to have got through them. Only
+        the capture queue drops its oldest frame when full, as a camera frame
+        soon goes stale; after that every frame goes through every stage, with
+        a full queue holding back the stage before it. Once a finite source
+        runs out, the frames already captured are finished before is_running()
+        turns False.
+        """
+        unknown = [name for name in stages if name not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages: {unknown}")
+        self.source = source
+        self.stages = stages
+        self.histogram = histogram
+        self.threaded = threaded
+        self.delay = delay
+        names = [name for name in STAGES[1:] if name in stages]
+        self.worker_stages = [name for name in names if name in WORKER_STAGES] if threaded else []
+        self.main_stages = [name for name in names if name not in self.worker_stages]
+        self.queues = [FrameQueue("capture", queue_size, drop_oldest=True)] if threaded else []
+        for name in self.worker_stages:
+            self.queues.append(FrameQueue(name, queue_size))
+        self.stage_times = {name: collections.deque(maxlen=100) for name in ["source"] + names}
+        self.running = False
+        self.ended = False
+        self.threads = []
+        self.frames = None
+        self.frame_count = 0
+
+    def start(self):
+        self.frames = iter(self.source.frames())
+        self.running = True
+        self.ended = False
+        if not self.threaded:
+            return
+        self.threads = [threading.Thread(target=self.capture_loop, name="capture", daemon=True)]
+        for i, name in enumerate(self.worker_stages):
+            self.threads.append(threading.Thread(target=self.stage_loop, args=(name, self.queues[i], self.queues[i+1]), name=name, daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads[1:]:
+            thread.join(timeout=5)
+
+    def is_running(self):
+        """
+        False once stopped, or once the source has run out and its last frame
+        has been through every stage.
+        """
+        return self.running and not self.ended
+
+    def record(self, name, secs):
+        self.stage_times[name].append(secs * 1000)
+        if self.histogram != None:
+            self.histogram.observe(secs, stage=name)
+
+    def capture(self):
+        """
+        Wait for the source's next frame. Returns None once it has run out.
+        """
+        start = time.perf_counter()
+        try:
+            next(self.frames)
+        except StopIteration:
+            return None
+        stream = self.source.stream
+        self.frame_count += 1
+        frame = PipelineFrame(self.frame_count, stream.getvalue())
+        stream.seek(0)
+        stream.truncate()
+        if "source" in self.stages:
+            frame = self.stages["source"](frame)
+        self.record("source", time.perf_counter() - start)
+        return frame
+
+    def run_stage(self, name, frame):
+        start = time.perf_counter()
+        try:
+            frame = self.stages[name](frame)
+        except Exception as error:
+            logging.error("Pipeline stage {stage} failed: {error}", stage=name, error=str(error))
+            print(f"Pipeline stage {name} failed: {error}")
+            frame = None
+        self.record(name, time.perf_counter() - start)
+        return frame
+
+    def run_stages(self, names, frame):
+        for name in names:
+            if frame is None:
+                break
+            frame = self.run_stage(name, frame)
+        return frame
+
+    def capture_loop(self):
+        try:
+            while self.running:
+                # Take frames less often while eg. the CPU is being cooled
+                delay = self.delay() if self.delay != None else 0
+                if delay > 0:
+                    time.sleep(delay)
+                frame = self.capture()
+                if frame is None:
+                    break
+                self.queues[0].put(frame)
+        except Exception as error:
+            logging.error("Frame capture failed: {error}", error=str(error))
+        self.queues[0].close()
+
+    def pass_on(self, queue, frame):
+        """
+        Wait for room in the next stage's queue, unless the pipeline is stopped.
+        """
+        while self.running:
+            if queue.put(frame, timeout=0.1):
+                return
+
+    def stage_loop(self, name, input_queue, output_queue):
+        while self.running:
+            frame = input_queue.get(timeout=0.1)
+            if frame is END_OF_SOURCE:
+                output_queue.close()
+                return
+            if frame is None:
+                continue
+            frame = self.run_stage(name, frame)
+            if frame is not None:
+                self.pass_on(output_queue, frame)
+
+    def next_frame(self):
+        """
+        Run the next frame through the stages that run on this thread. Returns
+        it, or None if there was no new frame or a stage went no further with it.
+        """
+        if self.threaded:
+            frame = self.queues[-1].get(timeout=0)
+        else:
+            frame = self.capture()
+        if frame is END_OF_SOURCE or (frame is None and not self.threaded):
+            self.ended = True
+            return None
+        return self.run_stages(self.main_stages, frame)
+
+    def stats(self):
+        return {
+            "queues": {queue.name: queue.stats() for queue in self.queues},
+            "stage_ms": {name: round(sum(times) / len(times), 1) if times else 0 for name, times in self.stage_times.items()},
+        }
+
+    def log_stats(self):
+        for queue in self.queues:
+            logging.info("Pipeline queue {name}: depth {depth} (max {max_depth}), {puts} frames, {drops} dropped", name=queue.name, **queue.stats())
+        for name, ms in self.stats()["stage_ms"].items():
+            logging.info("Pipeline stage {name}: {ms}ms average", name=name, ms=ms)
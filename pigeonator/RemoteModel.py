@@ -0,0 +1,82 @@
+import json
+import time
+import logging
+import requests
+
+from pigeonator import WireFormat
+from pigeonator.HttpClient import HttpClient
+
+class RemoteModel():
+    def __init__(self, endpoint, wire_format=WireFormat.JSON_PNG, jpeg_quality=85, client=None, deadline=None):
+        """
+        Ask the model server at endpoint, a detector or a classifier. deadline is
+        the most seconds a whole get_prediction may take, including any retry in
+        another wire format.
+        """
+        if wire_format not in WireFormat.WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format: {wire_format}")
+        self.endpoint = endpoint
+        self.wire_format = wire_format
+        self.jpeg_quality = jpeg_quality
+        self.client = client or HttpClient(endpoint)
+        self.deadline = deadline
+
+        # Seconds spent encoding, on the wire and parsing in the last get_prediction
+        self.timings = {}
+
+    def encode_payload(self, image):
+        """
+        Build the request body and headers for an image in the current wire format.
+        """
+        return WireFormat.encode_image(image, self.wire_format, self.jpeg_quality)
+
+    def post(self, payload, headers=None, deadline=None):
+        return self.client.post(self.endpoint, data=payload, headers=headers, deadline=deadline)
+
+    def request_deadline(self):
+        return time.monotonic() + self.deadline if self.deadline else None
+
+    def parse_response(self, response):
+        if response.reason == "OK":
+            result = json.loads(response.text)
+            outputs = result['outputs']
+            # print(response.text)
+        else:
+            print(response.reason)
+            outputs = None
+        return outputs
+
+    def fall_back(self, response):
+        """
+        Drop back to JSON+PNG if the server rejected a binary wire format.
+        Returns True if the request should be retried.
+        """
+        if self.wire_format == WireFormat.JSON_PNG or response.status_code not in WireFormat.UNSUPPORTED_STATUS_CODES:
+            return False
+        logging.warning("{endpoint} rejected {format} payload ({code}), falling back to {fallback}", endpoint=self.endpoint, format=self.wire_format, code=response.status_code, fallback=WireFormat.JSON_PNG)
+        self.wire_format = WireFormat.JSON_PNG
+        return True
+
+    def get_prediction(self, image):
+        """
+        Predict with the remote model!
+        """
+        start = time.perf_counter()
+        payload, headers = self.encode_payload(image)
+        self.timings = {"encode": time.perf_counter() - start}
+        deadline = self.request_deadline()
+        try:
+            start = time.perf_counter()
+            response = self.post(payload, headers, deadline)
+            if self.fall_back(response):
+                payload, headers = self.encode_payload(image)
+                response = self.post(payload, headers, deadline)
+            self.timings["http"] = time.perf_counter() - start
+            start = time.perf_counter()
+            outputs = self.parse_response(response)
+            self.timings["parse"] = time.perf_counter() - start
+            return outputs
+        except (requests.RequestException, ValueError, KeyError) as error:
+            logging.error("Could not contact: {endpoint}: {error}", endpoint=self.endpoint, error=str(error))
+            print(f"Could not contact: {self.endpoint}: {error}")
+            return None
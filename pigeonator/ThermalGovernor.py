@@ -0,0 +1,107 @@
+import time
+import logging
+import threading
+
+def interpolate(curve, x):
+    """
+    Read a piecewise linear curve of [x, y] points at x, holding the end values beyond it.
+    """
+    points = sorted(curve)
+    if x <= points[0][0]:
+        return points[0][1]
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        if x <= x2:
+            return y1 + (y2 - y1) * (x - x1) / (x2 - x1) if x2 > x1 else y2
+    return points[-1][1]
+
+class ThermalGovernor():
+    def __init__(self, read_temperature, curves, interval=5, smoothing=0.3):
+        """
+        Read the CPU temperature every interval seconds on a background thread and
+        turn it into settings that slow the loop down smoothly as the Pi heats up,
+        instead of stopping it. curves maps each setting to [temperature, value]
+        points; value() reads a setting off its curve at the smoothed temperature.
+        A setting whose value has moved off its cool end means the governor is
+        throttling.
+        """
+        self.read_temperature = read_temperature
+        self.curves = curves
+        self.interval = interval
+        self.smoothing = smoothing
+        self.temperature = None
+        self.raw_temperature = None
+        self.throttling = False
+        self.throttle_count = 0
+        self.throttle_secs = 0.0
+        self.throttle_start = None
+        self.lock = threading.Lock()
+
+        self.sample()
+        self.running = True
+        self.thread = threading.Thread(target=self.sample_loop, name="thermal-governor", daemon=True)
+        self.thread.start()
+
+    def sample(self):
+        try:
+            raw = self.read_temperature()
+        except Exception as error:
+            logging.error("Could not read CPU temperature: {error}", error=str(error))
+            return
+
+        with self.lock:
+            self.raw_temperature = raw
+            if self.temperature is None:
+                self.temperature = raw
+            else:
+                self.temperature += self.smoothing * (raw - self.temperature)
+            throttling = any(self.curve_value(name) != sorted(curve)[0][1] for name, curve in self.curves.items())
+            now = time.time()
+            if throttling and not self.throttling:
+                self.throttle_count += 1
+                self.throttle_start = now
+                logging.warning("Thermal throttling at {temp}C: {settings}", temp=round(self.temperature, 1), settings=self.curve_values())
+            elif self.throttling and not throttling:
+                self.throttle_secs += now - self.throttle_start
+                logging.info("Thermal throttling ended at {temp}C", temp=round(self.temperature, 1))
+            self.throttling = throttling
+
+    def sample_loop(self):
+        while self.running:
+            time.sleep(self.interval)
+            self.sample()
+
+    def curve_value(self, name):
+        if self.temperature is None:
+            return sorted(self.curves[name])[0][1]
+        return interpolate(self.curves[name], self.temperature)
+
+    def curve_values(self):
+        return {name: round(self.curve_value(name), 3) for name in self.curves}
+
+    def value(self, name, default=0):
+        """
+        The current value of a setting, or default if it has no curve.
+        """
+        if name not in self.curves:
+            return default
+        with self.lock:
+            return self.curve_value(name)
+
+    def stats(self):
+        with self.lock:
+            throttle_secs = self.throttle_secs
+            if self.throttling:
+                throttle_secs += time.time() - self.throttle_start
+            return {
+                "temperature": round(self.temperature, 1) if self.temperature is not None else None,
+                "throttling": self.throttling,
+                "throttle_count": self.throttle_count,
+                "throttle_secs": round(throttle_secs),
+                "settings": self.curve_values(),
+            }
+
+    def log_stats(self):
+        logging.info("Thermal governor: {temperature}C, throttling={throttling}, {throttle_count} throttle episodes for {throttle_secs}s, {settings}", **self.stats())
+
+    def close(self):
+        self.running = False
@@ -0,0 +1,120 @@
+import io
+import json
+import uuid
+import base64
+
+JSON_PNG = "json-png"
+JPEG = "jpeg"
+RAW = "raw"
+MULTIPART = "multipart"
+
+WIRE_FORMATS = (JSON_PNG, JPEG, RAW, MULTIPART)
+
+# Replies from a server that doesn't understand a binary body
+UNSUPPORTED_STATUS_CODES = (400, 404, 405, 415, 422)
+
+def image_to_png_base64(image):
+    in_mem_file = io.BytesIO()
+    image.save(in_mem_file, format = "PNG")
+
+    # reset file pointer to start
+    in_mem_file.seek(0)
+    img_bytes = in_mem_file.read()
+    return base64.b64encode(img_bytes).decode('ascii')
+
+def image_to_jpeg(image, quality):
+    in_mem_file = io.BytesIO()
+    image.save(in_mem_file, format = "JPEG", quality=quality)
+    return in_mem_file.getvalue()
+
+def image_headers(image):
+    width, height = image.size
+    return {
+        "X-Image-Width": str(width),
+        "X-Image-Height": str(height),
+    }
+
+def encode_image(image, wire_format, jpeg_quality=85):
+    """
+    Encode an image as a request body in the given wire format.
+    Returns the body and any extra headers to send with it.
+
+    json-png   {"inputs":{"Image":<base64 PNG>}} as the servers have always accepted
+    jpeg       the bare JPEG bytes
+    raw        packed RGB uint8 pixels, row major, with the shape in headers
+    multipart  multipart/form-data with a JSON metadata part and a JPEG image part
+    """
+    if wire_format == JSON_PNG:
+        payload = "{\"inputs\":{\"Image\":\"%s\"}}" % image_to_png_base64(image)
+        return payload, {}
+
+    if wire_format == JPEG:
+        headers = image_headers(image)
+        headers["Content-Type"] = "image/jpeg"
+        return image_to_jpeg(image, jpeg_quality), headers
+
+    if wire_format == RAW:
+        image = image.convert("RGB")
+        headers = image_headers(image)
+        headers["Content-Type"] = "application/octet-stream"
+        headers["X-Image-Channels"] = "3"
+        headers["X-Image-Dtype"] = "uint8"
+        return image.tobytes(), headers
+
+    if wire_format == MULTIPART:
+        return encode_multipart([image], jpeg_quality)
+
+    raise ValueError(f"Unknown wire format: {wire_format}")
+
+def encode_multipart(images, jpeg_quality):
+    """
+    Build a multipart/form-data body with a JSON metadata part followed by one
+    JPEG part per image, named Image for a single image or Image0, Image1...
+    for a batch.
+    """
+    width, height = images[0].size
+    metadata = json.dumps({"width": width, "height": height, "format": "jpeg", "count": len(images)})
+    boundary = uuid.uuid4().hex
+    parts = [
+        f"--{boundary}\r\n".encode("ascii"),
+        b"Content-Disposition: form-data; name=\"metadata\"\r\n",
+        b"Content-Type: application/json\r\n\r\n",
+        metadata.encode("utf-8"), b"\r\n",
+    ]
+    for i, image in enumerate(images):
+        name = "Image" if len(images) == 1 else f"Image{i}"
+        parts += [
+            f"--{boundary}\r\n".encode("ascii"),
+            f"Content-Disposition: form-data; name=\"{name}\"; filename=\"{name.lower()}.jpg\"\r\n".encode("ascii"),
+            b"Content-Type: image/jpeg\r\n\r\n",
+            image_to_jpeg(image, jpeg_quality), b"\r\n",
+        ]
+    parts.append(f"--{boundary}--\r\n".encode("ascii"))
+    return b"".join(parts), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+def encode_batch(images, wire_format, jpeg_quality=85):
+    """
+    Encode several same-sized images as one request body.
+
+    json-png   {"inputs":{"Images":[<base64 PNG>, ...]}}
+    raw        one packed N x H x W x 3 uint8 tensor, with the shape in headers
+    jpeg and multipart are both sent as a multipart body with one part per image
+    """
+    if wire_format == JSON_PNG:
+        encoded = ",".join("\"%s\"" % image_to_png_base64(image) for image in images)
+        payload = "{\"inputs\":{\"Images\":[%s]}}" % encoded
+        return payload, {}
+
+    if wire_format == RAW:
+        images = [image.convert("RGB") for image in images]
+        headers = image_headers(images[0])
+        headers["Content-Type"] = "application/octet-stream"
+        headers["X-Image-Channels"] = "3"
+        headers["X-Image-Dtype"] = "uint8"
+        headers["X-Batch-Size"] = str(len(images))
+        return b"".join(image.tobytes() for image in images), headers
+
+    if wire_format in (JPEG, MULTIPART):
+        return encode_multipart(images, jpeg_quality)
+
+    raise ValueError(f"Unknown wire format: {wire_format}")
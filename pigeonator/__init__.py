@@ -0,0 +1,3 @@
+"""
+Run the Pigeonator tools as a package, eg. python -m pigeonator detect --headless
+"""
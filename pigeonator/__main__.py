@@ -0,0 +1,35 @@
+import time
+
+STARTED = time.time()
+
+import os
+import sys
+import argparse
+import importlib
+
+# Each tool runs from its own directory, where it finds its modules and config.yaml
+TOOLS = {
+    "detect": ("Detector", "PigeonatorDetectorUI"),
+    "classify": ("Classifier", "PigeonatorClassifierUI"),
+}
+
+def enter_tool(tool):
+    """
+    Change to a tool's directory and find its modules there.
+    """
+    folder, _ = TOOLS[tool]
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), folder)
+    os.chdir(path)
+    sys.path.insert(0, path)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m pigeonator", description="Run the Pigeonator detector or classifier, eg. python -m pigeonator detect --headless")
+    parser.add_argument("tool", choices=TOOLS, help="detect with the object detector or classify camera zones")
+    args, rest = parser.parse_known_args()
+
+    enter_tool(args.tool)
+    module = importlib.import_module(TOOLS[args.tool][1])
+    module.main(rest, STARTED)
+
+if __name__ == '__main__':
+    main()
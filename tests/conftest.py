@@ -0,0 +1,24 @@
+import os
+import sys
+import yaml
+
+# Each tool's modules are imported from its own directory, the shared package from the top
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "Detector"), os.path.join(ROOT, "Classifier")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from pigeonator.KeywordLogger import use_keyword_logging
+from pigeonator.LocalConfiguration import Snapshot
+
+use_keyword_logging()
+
+def tool_settings(tool, **sections):
+    """
+    A tool's default settings, with some sections' values replaced.
+    """
+    with open(os.path.join(ROOT, tool, "config_default.yaml")) as f:
+        values = yaml.safe_load(f)
+    for name, overrides in sections.items():
+        values[name] = {**values[name], **overrides}
+    return Snapshot(values)
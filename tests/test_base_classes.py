@@ -0,0 +1,34 @@
+import os
+import sys
+import subprocess
+import pytest
+
+from conftest import ROOT
+from pigeonator.FrameSource import FrameSource
+from pigeonator.PigeonatorApp import PigeonatorApp
+
+def test_frame_source_needs_frames():
+    class NoFrames(FrameSource):
+        pass
+    with pytest.raises(TypeError, match="frames"):
+        NoFrames(None)
+
+def test_app_needs_stages_and_layout():
+    class NoStages(PigeonatorApp):
+        def layout(self, sg):
+            return []
+    with pytest.raises(TypeError, match="stages"):
+        NoStages("test")
+
+def test_defaults_are_read_from_the_tool_directory(tmp_path):
+    detector = os.path.join(ROOT, "Detector")
+    script = f"""
+import sys
+sys.path.insert(0, {detector!r})
+sys.path.insert(1, {ROOT!r})
+from pigeonator.LocalConfiguration import Config, Settings
+print(Config.config_dir(), Settings.model.input_width)
+"""
+    output = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True, check=True).stdout.split()
+    assert output[0] == detector
+    assert int(output[1]) > 0
@@ -0,0 +1,49 @@
+import confuse
+import numpy as np
+from PIL import Image
+
+from CameraScanner import CameraScanner
+
+def config(segment_size=None, overlap=1.2):
+    values = {
+        "camera": {"width": 600, "height": 400},
+        "scanner": {"cols": 3, "rows": 2, "segment_size": segment_size, "segment_overlap": overlap},
+        "model": {"input_width": 60, "input_height": 60},
+    }
+    return confuse.RootView([confuse.ConfigSource.of(values)])
+
+def gradient():
+    x = np.linspace(0, 255, 600, dtype=np.uint8)
+    pixels = np.stack([np.tile(x, (400, 1)), np.tile(x[:400, None], (1, 600)), np.zeros((400, 600), dtype=np.uint8)], axis=2)
+    return Image.fromarray(pixels)
+
+def scanner(**options):
+    scanner = CameraScanner(gradient, config(**options))
+    scanner.get_next_frame()
+    return scanner
+
+def test_segment_size_from_the_grid_with_overlap():
+    assert scanner().segment_size == 240
+
+def test_segments_overhanging_the_frame_are_shifted_inside():
+    boxes = scanner().crop_table((600, 400))
+    assert boxes[0] == (0, 0, 240, 240)
+    assert boxes[2] == (360, 0, 600, 240)
+    assert boxes[5] == (360, 160, 600, 400)
+
+def test_model_image_matches_resizing_the_segment():
+    zones = scanner()
+    for n in range(6):
+        model_image = zones.get_model_image(n)
+        direct = zones.get_segment_image(n).resize((60, 60), Image.LANCZOS)
+        assert model_image.size == (60, 60)
+        assert np.abs(np.asarray(model_image, dtype=int) - np.asarray(direct, dtype=int)).mean() < 3
+
+def test_each_frame_is_only_resampled_once_per_size():
+    zones = scanner()
+    zones.get_model_image(0)
+    zones.get_model_image(1)
+    zones.get_thumbnail(0)
+    assert sorted(zones.scaled_frames) == [(60, 60), (100, 100)]
+    zones.get_next_frame()
+    assert zones.scaled_frames == {}
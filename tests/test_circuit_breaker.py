@@ -0,0 +1,62 @@
+from pigeonator.CircuitBreaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+def fail(breaker, times, now):
+    for _ in range(times):
+        assert breaker.allow(now)
+        breaker.failed(now)
+
+def test_opens_after_failures_in_a_row_and_turns_requests_away():
+    breaker = CircuitBreaker("detector", failure_threshold=3, reset_timeout=5)
+    fail(breaker, 2, 1000)
+    breaker.allow(1000)
+    breaker.succeeded(1000)
+    fail(breaker, 2, 1000)
+    assert breaker.state == CLOSED
+    fail(breaker, 1, 1000)
+    assert breaker.state == OPEN
+    assert not breaker.allow(1004)
+    assert breaker.stats()["rejected"] == 1
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    breaker = CircuitBreaker("detector", failure_threshold=1, reset_timeout=5)
+    fail(breaker, 1, 1000)
+    assert breaker.allow(1005)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow(1005)
+    breaker.succeeded(1006)
+    assert breaker.is_closed()
+    assert breaker.allow(1006)
+
+def test_failed_probes_back_off_up_to_the_maximum():
+    breaker = CircuitBreaker("detector", failure_threshold=1, reset_timeout=5, max_reset_timeout=30, backoff=2)
+    now = 1000
+    fail(breaker, 1, now)
+    waits = []
+    for _ in range(4):
+        wait = breaker.open_until - now
+        assert not breaker.allow(now + wait - 1)
+        now += wait
+        waits.append(wait)
+        fail(breaker, 1, now)
+    assert waits == [5, 10, 20, 30]
+    assert breaker.stats()["opens"] == 5
+
+def test_success_after_reopening_resets_the_wait():
+    breaker = CircuitBreaker("detector", failure_threshold=1, reset_timeout=5)
+    fail(breaker, 1, 1000)
+    fail(breaker, 1, 1005)
+    assert breaker.open_until == 1015
+    assert breaker.allow(1015)
+    breaker.succeeded(1015)
+    fail(breaker, 1, 1020)
+    assert breaker.open_until == 1025
+
+def test_time_in_each_state_is_counted():
+    breaker = CircuitBreaker("detector", failure_threshold=1, reset_timeout=5)
+    start = breaker.state_since
+    fail(breaker, 1, start + 10)
+    breaker.allow(start + 15)
+    breaker.succeeded(start + 16)
+    assert breaker.state_secs[CLOSED] == 10
+    assert breaker.state_secs[OPEN] == 5
+    assert breaker.state_secs[HALF_OPEN] == 1
@@ -0,0 +1,72 @@
+import time
+import argparse
+import sqlite3
+
+import DetectionStore as store
+from DetectionStore import DetectionStore
+
+BOX = ((100, 50), (140, 110))
+
+def query(path, sql):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute(sql).fetchall()
+    finally:
+        db.close()
+
+def args(**options):
+    defaults = {"label": None, "since": None, "until": None, "min_confidence": None}
+    return argparse.Namespace(**dict(defaults, **options))
+
+def test_rows_are_written_with_their_centre_and_area_on_close(tmp_path):
+    path = str(tmp_path / "detections.db")
+    detections = DetectionStore(path, flush_interval=60)
+    detections.add("Pigeon", 0.9, BOX, track=7)
+    detections.close()
+    assert query(path, "SELECT label, x, y, w, h, area, track FROM detections") == [("Pigeon", 120, 80, 40, 60, 2400, 7)]
+    assert detections.stats()["written"] == 1
+
+def test_a_full_batch_is_written_without_waiting(tmp_path):
+    path = str(tmp_path / "detections.db")
+    detections = DetectionStore(path, flush_interval=60, batch_size=3)
+    for _ in range(3):
+        detections.add("Pigeon", 0.9, BOX)
+    deadline = time.time() + 5
+    while detections.stats()["written"] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert detections.stats()["written"] == 3
+    detections.close()
+
+def test_buffer_keeps_the_newest_rows_when_full(tmp_path):
+    path = str(tmp_path / "detections.db")
+    detections = DetectionStore(path, flush_interval=60, max_buffer=2)
+    for confidence in (0.1, 0.2, 0.3):
+        detections.add("Pigeon", confidence, BOX)
+    detections.close()
+    assert query(path, "SELECT confidence FROM detections ORDER BY confidence") == [(0.2,), (0.3,)]
+    assert detections.stats()["dropped"] == 1
+
+def test_rows_past_retention_are_pruned(tmp_path):
+    path = str(tmp_path / "detections.db")
+    detections = DetectionStore(path, flush_interval=60, retention_days=1)
+    detections.add("Pigeon", 0.9, BOX, ts=time.time() - 2 * 86400)
+    detections.add("Pigeon", 0.8, BOX)
+    detections.close()
+    assert query(path, "SELECT confidence FROM detections") == [(0.8,)]
+    assert detections.stats()["deleted"] == 1
+
+def test_queries_filter_by_label_and_confidence(tmp_path, capsys):
+    db = store.connect(str(tmp_path / "detections.db"))
+    rows = [store.detection_row("Pigeon", 0.9, BOX, 1000), store.detection_row("Pigeon", 0.5, BOX, 1000), store.detection_row("Cat", 0.9, BOX, 1000)]
+    db.executemany(store.INSERT, rows)
+    store.areas(db, args(label="Pigeon", min_confidence=0.7, bin=5000))
+    assert capsys.readouterr().out.split() == ["0-4999", "1"]
+    db.close()
+
+def test_old_csv_is_imported(tmp_path, capsys):
+    csv_path = tmp_path / "rawdetect.csv"
+    csv_path.write_text("2024-05-01 06:00:00,Pigeon,0.91,100,50,140,110\n")
+    db = store.connect(str(tmp_path / "detections.db"))
+    store.import_csv(db, args(csv=str(csv_path)))
+    assert db.execute("SELECT label, area FROM detections").fetchall() == [("Pigeon", 2400)]
+    db.close()
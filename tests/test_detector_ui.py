@@ -0,0 +1,122 @@
+import io
+import time
+import threading
+import types
+import pytest
+from PIL import Image, ImageDraw
+
+import PigeonatorDetectorUI as ui
+from conftest import tool_settings
+from MotionGate import MotionGate
+from CameraFrame import CameraFrame
+from ObjectTracker import ObjectTracker
+from pigeonator.Metrics import Metrics
+from pigeonator.CircuitBreaker import CircuitBreaker
+from pigeonator.HeadlessWindow import HeadlessWindow
+from pigeonator.Pipeline import PipelineFrame
+
+class Recorder():
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args))
+
+def jpeg(square_at=None):
+    image = Image.new("RGB", (320, 320), "green")
+    if square_at:
+        ImageDraw.Draw(image).rectangle((square_at, square_at, square_at + 80, square_at + 80), fill="white")
+    data = io.BytesIO()
+    image.save(data, format="JPEG")
+    return data.getvalue()
+
+def make_detector_ui(monkeypatch, motion_actions=False, max_skip_interval=10):
+    settings = tool_settings("Detector",
+        circuit={"degraded": "motion", "motion_actions": motion_actions},
+        camera={"warm_up_cycles": 0},
+        motion={"max_skip_interval": max_skip_interval})
+    monkeypatch.setattr(ui, "Settings", settings)
+
+    app = ui.PigeonatorDetectorUI.__new__(ui.PigeonatorDetectorUI)
+    app.headless = True
+    app.window = HeadlessWindow({"-DETECT-": True, "-DETER-": True})
+    app.values = app.window.values
+    app.event = None
+    app.click_lock = threading.Lock()
+    app.clicked = False
+    app.motion_lock = threading.Lock()
+    app.preview_size = None
+    app.metrics = Metrics("test")
+    app.stage_seconds = app.metrics.histogram("stage_seconds")
+    app.degraded_total = app.metrics.counter("degraded_total")
+    app.detections_total = app.metrics.counter("detections_total")
+    app.motion_gate = MotionGate(**settings.motion)
+    app.breaker = CircuitBreaker("detector")
+    app.breaker.open(time.time())
+    app.tracker = None
+    app.confidence_threshold = settings.model.confidence_threshold
+    app.last_detect_time = 0
+    app.governor = types.SimpleNamespace(value=lambda name: 0)
+    app.detection_store = Recorder()
+    app.archive = Recorder()
+    app.actions = Recorder()
+    app.annotate = lambda *args, **kwargs: None
+    app.fired = []
+    app.fire_sprinkler = lambda secs, label: app.fired.append(label)
+    return app
+
+def run_frames(app, frames):
+    for number, data in enumerate(frames, 1):
+        frame = PipelineFrame(number, data)
+        for stage in (app.source_frame, app.preprocess_frame, app.infer_frame, app.interpret_frame, app.act_on_frame):
+            frame = stage(frame)
+
+def test_still_scene_with_open_circuit_does_not_fire(monkeypatch):
+    # Every still frame is overdue, so each one passes the gate without motion
+    app = make_detector_ui(monkeypatch, motion_actions=True, max_skip_interval=0)
+    run_frames(app, [jpeg()] * 5)
+    assert app.fired == []
+    assert app.detection_store.calls == []
+    assert app.actions.calls == []
+
+def test_clicked_frame_with_open_circuit_does_not_fire(monkeypatch):
+    app = make_detector_ui(monkeypatch, motion_actions=True)
+    app.handle_event("-IMAGE-")
+    run_frames(app, [jpeg()] * 3)
+    assert app.fired == []
+
+@pytest.mark.parametrize("motion_actions, fired", [(False, []), (True, ["Motion"])])
+def test_motion_with_open_circuit_only_acts_if_configured(monkeypatch, motion_actions, fired):
+    app = make_detector_ui(monkeypatch, motion_actions=motion_actions)
+    run_frames(app, [jpeg(), jpeg(100)])
+    assert [call[1][0] for call in app.detection_store.calls] == ["Motion"]
+    assert app.fired == fired
+    assert len(app.actions.calls) == len(fired)
+
+def test_track_is_acted_on_once_even_if_drawing_fails(monkeypatch):
+    app = make_detector_ui(monkeypatch)
+    app.tracker = ObjectTracker(app.confidence_threshold, min_hits=1, min_dwell=0)
+    def annotate(*args, **kwargs):
+        raise OSError("cannot open resource")
+    app.annotate = annotate
+    frame = types.SimpleNamespace(full=lambda: Image.new("RGB", (100, 100)), preview=lambda: None)
+    result = ("Pigeon", 0.9, ((10, 10), (50, 50)), (30, 30), 1600)
+
+    app.handle_detections(frame, [result])
+    track = app.tracker.tracks[0]
+    assert track.actioned and app.fired == ["Pigeon"]
+    assert [call[1][0] for call in app.actions.calls] == ["imgbb"]
+
+    app.handle_detections(frame, [result])
+    assert app.fired == ["Pigeon"]
+    assert len(app.actions.calls) == 1
+
+def test_missing_font_falls_back_to_the_default(monkeypatch):
+    monkeypatch.setattr(ui, "FONT_PATH", "/nonexistent/font.ttf")
+    app = ui.PigeonatorDetectorUI.__new__(ui.PigeonatorDetectorUI)
+    app.font = app.load_font(80)
+    app.fonts = {}
+    frame = CameraFrame(jpeg())
+    image = frame.preview()
+    app.annotate(frame, image, ((10, 10), (50, 50)), "Pigeon", "red")
+    assert image.getpixel((10, 10)) == (255, 0, 0)
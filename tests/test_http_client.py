@@ -0,0 +1,49 @@
+import time
+import threading
+import pytest
+import requests
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pigeonator.HttpClient import HttpClient
+
+BODY = b"x" * 20
+
+class TrickleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        # /slow sends its body a byte at a time, each well within the read timeout
+        for byte in BODY:
+            self.wfile.write(bytes([byte]))
+            self.wfile.flush()
+            if self.path == "/slow":
+                time.sleep(0.1)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TrickleHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+def test_deadline_covers_a_slowly_sent_body(server):
+    client = HttpClient("test", 1, 1)
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.post(server + "/slow", data=b"image", deadline=time.monotonic() + 0.5)
+    assert time.monotonic() - start < 1
+    assert client.stats()["timeouts"] == 1
+
+def test_deadline_keeps_connections_alive(server):
+    client = HttpClient("test", 1, 1)
+    for _ in range(3):
+        response = client.post(server + "/fast", data=b"image", deadline=time.monotonic() + 2)
+        assert response.content == BODY
+    assert client.stats()["opens"] == 1
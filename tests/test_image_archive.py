@@ -0,0 +1,47 @@
+import os
+from PIL import Image, ImageDraw
+
+from pigeonator.ImageArchive import ImageArchive
+
+def scene(shade):
+    image = Image.new("RGB", (200, 200), (shade, shade, shade))
+    ImageDraw.Draw(image).rectangle((50, 50, 150, 150), fill="white")
+    return image
+
+def saved(root, dir):
+    path = os.path.join(root, dir)
+    return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+def test_near_duplicates_are_only_skipped_from_the_same_source(tmp_path):
+    archive = ImageArchive(str(tmp_path))
+    dir = os.path.join(str(tmp_path), "images", "Pigeon")
+    archive.save(scene(10), dir, "im1")
+    archive.save(scene(12), dir, "im1")
+    archive.save(scene(12), dir, "im2")
+    archive.save(scene(12), dir, source="garden-camera")
+    archive.close()
+    assert [name.split("-")[0] for name in saved(tmp_path, dir)] == ["im", "im1", "im2"]
+    assert archive.stats()["duplicates"] == 1
+
+def test_variants_are_downscaled(tmp_path):
+    archive = ImageArchive(str(tmp_path), variants={"thumbs": 50})
+    dir = os.path.join(str(tmp_path), "images", "Full")
+    archive.save(scene(10), dir, "frame", dedupe=False)
+    archive.close()
+    thumb, = saved(tmp_path, os.path.join(dir, "thumbs"))
+    assert Image.open(os.path.join(dir, "thumbs", thumb)).size == (50, 50)
+
+def test_kept_directories_are_not_counted_or_evicted(tmp_path):
+    root = str(tmp_path)
+    training = os.path.join(root, "Training")
+    os.makedirs(training)
+    scene(10).save(os.path.join(training, "old.jpg"))
+    archive = ImageArchive(root, budget_mb=0, keep=["Training"])
+    assert archive.stats()["used_mb"] == 0
+
+    archive.save(scene(20), os.path.join(root, "Training"), "im1", dedupe=False)
+    archive.save(scene(30), os.path.join(root, "Pigeon"), "im1", dedupe=False)
+    archive.close()
+    assert len(saved(root, "Training")) == 2
+    assert saved(root, "Pigeon") == []
+    assert archive.stats()["evicted"] == 1
@@ -0,0 +1,108 @@
+import time
+import types
+import pytest
+
+from pigeonator.LinkTap import LinkTap, LinkTapError
+from pigeonator.LinkTapController import LinkTapController
+
+class FakeClient():
+    def __init__(self, response):
+        self.response = response
+
+    def post(self, url, data=None):
+        return self.response
+
+def response(status_code=200, body=None):
+    def json():
+        if body is None:
+            raise ValueError("Expecting value")
+        return body
+    return types.SimpleNamespace(status_code=status_code, json=json)
+
+@pytest.mark.parametrize("reply", [response(body=None), response(body=["not", "a", "dict"]), response(body={"result": "error", "message": "bad key"}), response(status_code=502)])
+def test_call_api_failures_are_linktap_errors(reply):
+    with pytest.raises(LinkTapError):
+        LinkTap("user", "key", client=FakeClient(reply)).get_all_devices()
+
+class FlakyLinkTap():
+    def __init__(self, error):
+        self.error = error
+        self.sent = []
+
+    def activate_instant_mode(self, gatewayId, taplinkerId, action, duration, durationSec, eco):
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+        self.sent.append(durationSec)
+
+    def get_watering_status(self, taplinkerId):
+        return {}
+
+    def get_all_devices(self):
+        return {}
+
+def test_controller_survives_unexpected_errors():
+    linktap = FlakyLinkTap(RuntimeError("boom"))
+    controller = LinkTapController(linktap, "gateway", "taplinker", min_interval=0.05)
+    try:
+        controller.spray(5)
+        deadline = time.time() + 2
+        while not linktap.sent and time.time() < deadline:
+            time.sleep(0.01)
+        assert controller.thread.is_alive()
+        assert controller.failures == 1
+        assert linktap.sent
+    finally:
+        controller.close()
+
+def wait_for(check, timeout=2):
+    deadline = time.time() + timeout
+    while not check() and time.time() < deadline:
+        time.sleep(0.01)
+    return check()
+
+def test_spray_within_a_running_one_is_coalesced():
+    linktap = FlakyLinkTap(None)
+    controller = LinkTapController(linktap, "gateway", "taplinker", min_interval=0.2)
+    try:
+        assert controller.spray(10)
+        assert wait_for(lambda: controller.stats()["commands"] == 1)
+        assert not controller.spray(8)
+        assert not controller.spray(12)
+        time.sleep(0.3)
+        assert linktap.sent == [10]
+        assert controller.stats()["coalesced"] == 2
+    finally:
+        controller.close()
+
+def test_longer_spray_waits_for_min_interval_then_extends():
+    linktap = FlakyLinkTap(None)
+    controller = LinkTapController(linktap, "gateway", "taplinker", min_interval=0.3, max_duration=20)
+    try:
+        controller.spray(5)
+        assert wait_for(lambda: controller.stats()["commands"] == 1)
+        sent_at = time.time()
+        assert controller.spray(30)
+        assert wait_for(lambda: controller.stats()["commands"] == 2)
+        assert time.time() - sent_at >= 0.25
+        assert linktap.sent == [5, 20]
+        stats = controller.stats()
+        assert stats["deferred"] == 1 and stats["extensions"] == 1 and stats["commands"] == 2
+    finally:
+        controller.close()
+
+def test_watering_status_is_cached_until_a_command_is_sent():
+    linktap = FlakyLinkTap(None)
+    calls = []
+    linktap.get_watering_status = lambda taplinker: calls.append(taplinker) or {"onDuration": 0}
+    controller = LinkTapController(linktap, "gateway", "taplinker", min_interval=0.05, status_ttl=60)
+    try:
+        controller.watering_status()
+        controller.watering_status()
+        assert calls == ["taplinker"]
+        controller.spray(5)
+        assert wait_for(lambda: controller.stats()["commands"] == 1)
+        controller.watering_status()
+        assert calls == ["taplinker", "taplinker"]
+    finally:
+        controller.close()
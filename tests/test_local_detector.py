@@ -0,0 +1,45 @@
+import types
+import numpy as np
+from PIL import Image
+
+from LocalDetector import LocalDetector
+
+def make_detector(backend, outputs, labels=None):
+    detector = LocalDetector.__new__(LocalDetector)
+    detector.endpoint = "test." + backend
+    detector.labels = labels
+    detector.score_threshold = 0.3
+    detector.model = types.SimpleNamespace(backend=backend, input_width=100, input_height=100,
+        prepare=lambda images: None, run=lambda tensor: outputs)
+    return detector
+
+def test_onnx_single_detection():
+    outputs = [
+        ("boxes", np.array([[10.0, 20.0, 30.0, 40.0]], dtype=np.float32)),
+        ("labels", np.array([2], dtype=np.int64)),
+        ("scores", np.array([0.9], dtype=np.float32)),
+    ]
+    detector = make_detector("onnx", outputs, labels=["background", "person", "pigeon"])
+    prediction = detector.get_prediction(Image.new("RGB", (200, 100)))
+    assert prediction["Items"] == [{"label": "pigeon", "score": np.float32(0.9).item(), "box": [20.0, 20.0, 60.0, 40.0]}]
+
+def test_tflite_count_limits_detections():
+    outputs = [
+        ("TFLite_Detection_PostProcess", np.array([[[0.1, 0.1, 0.5, 0.5], [0.2, 0.2, 0.6, 0.6]]], dtype=np.float32)),
+        ("TFLite_Detection_PostProcess:1", np.array([[0.0, 1.0]], dtype=np.float32)),
+        ("TFLite_Detection_PostProcess:2", np.array([[0.8, 0.7]], dtype=np.float32)),
+        ("TFLite_Detection_PostProcess:3", np.array([1.0], dtype=np.float32)),
+    ]
+    prediction = make_detector("tflite", outputs).get_prediction(Image.new("RGB", (100, 100)))
+    assert [item["label"] for item in prediction["Items"]] == ["0"]
+
+def test_tflite_single_detection_count_by_position():
+    outputs = [
+        ("StatefulPartitionedCall:0", np.array([[[0.1, 0.1, 0.5, 0.5]]], dtype=np.float32)),
+        ("StatefulPartitionedCall:1", np.array([[1.0]], dtype=np.float32)),
+        ("StatefulPartitionedCall:2", np.array([[0.75]], dtype=np.float32)),
+        ("StatefulPartitionedCall:3", np.array([1.0], dtype=np.float32)),
+    ]
+    prediction = make_detector("tflite", outputs).get_prediction(Image.new("RGB", (100, 100)))
+    assert len(prediction["Items"]) == 1
+    assert prediction["Items"][0]["score"] == np.float32(0.75).item()
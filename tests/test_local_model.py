@@ -0,0 +1,86 @@
+import types
+import threading
+import numpy as np
+import pytest
+from PIL import Image
+
+from pigeonator.LocalModel import LocalModel
+
+def bare_model(dtype, quantization=(0.0, 0), mean=None, std=None):
+    model = LocalModel.__new__(LocalModel)
+    model.model_path = "model.onnx"
+    model.input_name = "pixels"
+    model.input_dtype = dtype
+    model.input_quantization = quantization
+    model.layout = "nchw"
+    model.input_width = model.input_height = 4
+    model.mean = np.array(mean, dtype=np.float32) if mean else None
+    model.std = np.array(std, dtype=np.float32) if std else None
+    return model
+
+def test_onnx_input_quantization_from_dequantize_linear(tmp_path):
+    onnx = pytest.importorskip("onnx")
+    from onnx import helper, TensorProto
+
+    graph = helper.make_graph(
+        [helper.make_node("DequantizeLinear", ["pixels", "scale", "zero_point"], ["values"])],
+        "quantized",
+        [helper.make_tensor_value_info("pixels", TensorProto.INT8, [1, 3, 4, 4])],
+        [helper.make_tensor_value_info("values", TensorProto.FLOAT, [1, 3, 4, 4])],
+        [helper.make_tensor("scale", TensorProto.FLOAT, [], [0.02]), helper.make_tensor("zero_point", TensorProto.INT8, [], [-3])])
+    path = str(tmp_path / "model.onnx")
+    onnx.save(helper.make_model(graph), path)
+
+    model = bare_model(np.int8)
+    model.model_path = path
+    scale, zero_point = model.onnx_input_quantization(*model.onnx_graph())
+    assert scale == pytest.approx(0.02) and zero_point == -3
+
+def test_onnx_output_quantization_from_quantize_linear(tmp_path):
+    onnx = pytest.importorskip("onnx")
+    from onnx import helper, TensorProto
+
+    graph = helper.make_graph(
+        [helper.make_node("QuantizeLinear", ["values", "scale", "zero_point"], ["scores"])],
+        "quantized",
+        [helper.make_tensor_value_info("values", TensorProto.FLOAT, [1, 4])],
+        [helper.make_tensor_value_info("scores", TensorProto.UINT8, [1, 4])],
+        [helper.make_tensor("scale", TensorProto.FLOAT, [], [1 / 255]), helper.make_tensor("zero_point", TensorProto.UINT8, [], [10])])
+    path = str(tmp_path / "model.onnx")
+    onnx.save(helper.make_model(graph), path)
+
+    model = bare_model(np.float32)
+    model.model_path = path
+    quantization = model.onnx_output_quantization(*model.onnx_graph(), ["scores"])
+    assert list(quantization) == ["scores"]
+    scale, zero_point = quantization["scores"]
+    assert scale == pytest.approx(1 / 255) and zero_point == 10
+
+def test_onnx_integer_outputs_are_dequantized():
+    model = bare_model(np.float32)
+    model.backend = "onnx"
+    model.lock = threading.Lock()
+    model.output_quantization = {"scores": (0.5, 10)}
+    model.session = types.SimpleNamespace(
+        get_outputs=lambda: [types.SimpleNamespace(name="scores"), types.SimpleNamespace(name="labels")],
+        run=lambda names, feed: [np.array([[10, 12, 30]], dtype=np.uint8), np.array([[1, 2, 3]], dtype=np.int64)])
+    (_, scores), (_, labels) = model.run(np.zeros((1, 3, 4, 4), dtype=np.float32))
+    assert scores.dtype == np.float32 and scores.tolist() == [[0.0, 1.0, 10.0]]
+    assert labels.tolist() == [[1, 2, 3]]
+
+def test_normalised_pixels_are_quantized_with_scale_and_zero_point():
+    mean, std = [0.5, 0.5, 0.5], [0.25, 0.25, 0.25]
+    model = bare_model(np.int8, (0.02, -3), mean, std)
+    tensor = model.prepare([Image.new("RGB", (4, 4), (255, 128, 0))])
+    values = (np.array([255, 128, 0]) / 255.0 - 0.5) / 0.25
+    expected = np.clip(np.round(values / 0.02 - 3), -128, 127)
+    assert tensor.dtype == np.int8
+    assert tensor[0, :, 0, 0].tolist() == expected.tolist()
+
+def test_unknown_integer_input_scale_is_refused():
+    with pytest.raises(ValueError, match="quantization"):
+        bare_model(np.int8).check_quantization()
+    with pytest.raises(ValueError, match="quantization"):
+        bare_model(np.uint8, mean=[0.5, 0.5, 0.5], std=[0.25, 0.25, 0.25]).check_quantization()
+    # Raw camera pixels need no scale
+    bare_model(np.uint8).check_quantization()
@@ -0,0 +1,64 @@
+import pytest
+from PIL import Image, ImageDraw
+
+import MotionGate as motion
+from MotionGate import MotionGate
+
+def scene(square_at=None, shade=90):
+    image = Image.new("RGB", (320, 320), (shade, shade, shade))
+    if square_at is not None:
+        ImageDraw.Draw(image).rectangle((square_at, square_at, square_at + 40, square_at + 40), fill="white")
+    return image
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(motion.time, "time", lambda: now[0])
+    return now
+
+def test_first_frame_passes_without_counting_as_movement(clock):
+    gate = MotionGate()
+    assert gate.should_detect(scene())
+    assert not gate.moved
+
+def test_still_frames_are_skipped_and_movement_passes(clock):
+    gate = MotionGate()
+    gate.should_detect(scene())
+    clock[0] += 1
+    assert not gate.should_detect(scene())
+    clock[0] += 1
+    assert gate.should_detect(scene(100))
+    assert gate.moved and gate.changed_regions > 0
+    assert (gate.passed_count, gate.skipped_count) == (2, 1)
+
+def test_change_below_the_pixel_threshold_is_not_movement(clock):
+    gate = MotionGate(pixel_threshold=25)
+    gate.should_detect(scene(shade=90))
+    clock[0] += 1
+    assert not gate.should_detect(scene(shade=100))
+
+def test_still_frame_passes_once_overdue(clock):
+    gate = MotionGate(max_skip_interval=10)
+    gate.should_detect(scene())
+    clock[0] += 9
+    assert not gate.should_detect(scene())
+    clock[0] += 1
+    assert gate.should_detect(scene())
+    assert not gate.moved
+    clock[0] += 1
+    assert not gate.should_detect(scene())
+
+def test_inactive_gate_passes_everything_without_movement(clock):
+    gate = MotionGate(active=False)
+    assert all(gate.should_detect(scene()) for _ in range(3))
+    assert not gate.moved and gate.skip_ratio() == 0.0
+
+def test_reset_starts_again_from_the_next_frame(clock):
+    gate = MotionGate()
+    gate.should_detect(scene())
+    gate.reset()
+    clock[0] += 1
+    assert gate.should_detect(scene(100))
+    assert not gate.moved
+    clock[0] += 1
+    assert not gate.should_detect(scene(100))
@@ -0,0 +1,68 @@
+import pytest
+
+from ObjectTracker import ObjectTracker, iou
+
+def detection(x, y, confidence=0.9, label="Pigeon", size=40):
+    box = ((x, y), (x + size, y + size))
+    return (label, confidence, box, (x + size // 2, y + size // 2), size * size)
+
+def tracker(**options):
+    return ObjectTracker(0.8, min_hits=3, min_dwell=1, **options)
+
+def test_iou():
+    assert iou(((0, 0), (10, 10)), ((0, 0), (10, 10))) == 1.0
+    assert iou(((0, 0), (10, 10)), ((5, 0), (15, 10))) == pytest.approx(50 / 150)
+    assert iou(((0, 0), (10, 10)), ((20, 20), (30, 30))) == 0.0
+
+def test_track_is_confirmed_after_min_hits_over_min_dwell():
+    objects = tracker()
+    for n, now in enumerate([1000, 1000.5, 1000.8]):
+        track, = objects.update([detection(100 + n * 5, 100)], now)
+        assert not track.confirmed
+    track, = objects.update([detection(115, 100)], 1001.2)
+    assert track.confirmed and track.id == 1 and track.hits == 4
+    assert objects.stats()["confirmed"] == 1
+
+def test_low_smoothed_confidence_is_not_confirmed():
+    objects = tracker()
+    for n in range(5):
+        track, = objects.update([detection(100, 100, confidence=0.6)], 1000 + n)
+    assert not track.confirmed
+
+def test_stays_one_track_across_frames_so_it_is_acted_on_once():
+    objects = tracker()
+    confirmations = 0
+    for n in range(8):
+        track, = objects.update([detection(100 + n * 5, 100)], 1000 + n)
+        if track.confirmed and not track.actioned:
+            track.actioned = True
+            confirmations += 1
+    assert confirmations == 1
+    assert objects.stats()["started"] == 1
+
+def test_nearby_box_without_overlap_continues_the_track_by_centre():
+    objects = tracker(max_centroid_distance=1.5)
+    first, = objects.update([detection(100, 100)], 1000)
+    second, = objects.update([detection(145, 100)], 1001)
+    assert second is first
+
+def test_other_labels_and_distant_boxes_start_new_tracks():
+    objects = tracker()
+    objects.update([detection(100, 100)], 1000)
+    seen = objects.update([detection(100, 100, label="Cat"), detection(400, 400)], 1001)
+    assert sorted(track.id for track in seen) == [2, 3]
+    assert objects.stats()["active"] == 3
+
+def test_track_ends_after_too_many_misses():
+    objects = tracker(max_misses=2)
+    objects.update([detection(100, 100)], 1000)
+    for n in range(3):
+        objects.update([], 1001 + n)
+    assert objects.tracks == []
+    assert objects.stats()["ended_unconfirmed"] == 1
+
+def test_track_ends_when_not_seen_for_max_age():
+    objects = tracker(max_age=10)
+    objects.update([detection(100, 100)], 1000)
+    objects.update([detection(400, 400)], 1011)
+    assert [track.id for track in objects.tracks] == [2]
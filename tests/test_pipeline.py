@@ -0,0 +1,81 @@
+import io
+import time
+import threading
+import pytest
+
+from pigeonator.Pipeline import Pipeline, FrameQueue, END_OF_SOURCE
+
+class ListSource():
+    def __init__(self, count, interval=0):
+        self.count = count
+        self.interval = interval
+        self.stream = io.BytesIO()
+
+    def frames(self):
+        for n in range(self.count):
+            time.sleep(self.interval)
+            self.stream.write(str(n + 1).encode())
+            yield
+
+def run(pipeline, timeout=10):
+    seen = []
+    pipeline.start()
+    deadline = time.time() + timeout
+    while pipeline.is_running() and time.time() < deadline:
+        frame = pipeline.next_frame()
+        if frame != None:
+            seen.append(frame.number)
+        time.sleep(0.001)
+    pipeline.stop()
+    return seen
+
+def slow(secs):
+    def stage(frame):
+        time.sleep(secs)
+        return frame
+    return stage
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_every_frame_of_a_finite_source_is_finished(threaded):
+    stages = {"preprocess": slow(0.002), "infer": slow(0.01), "sinks": lambda frame: frame}
+    # Captured no faster than the slowest stage, so capture has no reason to drop any
+    pipeline = Pipeline(ListSource(20, interval=0.02), stages, threaded=threaded)
+    assert run(pipeline) == list(range(1, 21))
+    assert not pipeline.is_running()
+
+def test_capture_keeps_the_latest_frames_but_later_stages_drop_none():
+    stages = {"preprocess": slow(0.01), "infer": slow(0.01), "sinks": lambda frame: frame}
+    pipeline = Pipeline(ListSource(50), stages, threaded=True, queue_size=1)
+    seen = run(pipeline)
+    capture, preprocess, infer = [queue.stats() for queue in pipeline.queues]
+    assert capture["drops"] > 0
+    assert seen[-1] == 50
+    assert seen == sorted(seen)
+    assert preprocess["drops"] == infer["drops"] == 0
+    assert len(seen) == capture["puts"] - capture["drops"]
+
+def test_source_stage_notes_each_frame_on_the_capture_thread():
+    def note(frame):
+        frame.captured_on = threading.current_thread().name
+        return frame
+    def check(frame):
+        assert frame.captured_on == "capture"
+        return frame
+    stages = {"source": note, "preprocess": check, "sinks": lambda frame: frame}
+    pipeline = Pipeline(ListSource(5, interval=0.01), stages, threaded=True)
+    assert run(pipeline) == [1, 2, 3, 4, 5]
+
+def test_full_queue_waits_for_room():
+    queue = FrameQueue("test", 1)
+    assert queue.put(1)
+    assert not queue.put(2, timeout=0.01)
+    assert queue.get() == 1
+    assert queue.put(2, timeout=0.01)
+
+def test_closed_queue_is_emptied_before_it_ends():
+    queue = FrameQueue("test", 1, drop_oldest=True)
+    queue.put(1)
+    queue.put(2)
+    queue.close()
+    assert queue.get() == 2
+    assert queue.get() is END_OF_SOURCE
@@ -0,0 +1,42 @@
+import json
+import types
+from PIL import Image
+
+from RemoteClassifier import RemoteClassifier
+
+OUTPUT = {"Prediction": ["Pigeon"], "Labels": [["Pigeon", 0.9]]}
+
+def reply(status_code, outputs=None):
+    reason = "OK" if status_code == 200 else "Error"
+    return types.SimpleNamespace(status_code=status_code, reason=reason, text=json.dumps({"outputs": outputs}))
+
+class FakeClient():
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = 0
+
+    def post(self, url, data=None, headers=None, deadline=None):
+        self.requests += 1
+        return self.replies.pop(0)
+
+def classifier(replies):
+    return RemoteClassifier("http://classifier/predict", client=FakeClient(replies))
+
+images = [Image.new("RGB", (10, 10)), Image.new("RGB", (10, 10))]
+
+def test_transient_error_keeps_batching():
+    model = classifier([reply(503), reply(200, [OUTPUT, OUTPUT])])
+    assert model.get_predictions(images) == [None, None]
+    assert model.batch_supported
+    assert model.get_predictions(images) == [OUTPUT, OUTPUT]
+    assert model.client.requests == 2
+
+def test_unsupported_batch_falls_back_to_one_at_a_time():
+    model = classifier([reply(415), reply(200, OUTPUT), reply(200, OUTPUT)])
+    assert model.get_predictions(images) == [OUTPUT, OUTPUT]
+    assert not model.batch_supported
+
+def test_wrong_shaped_reply_falls_back_to_one_at_a_time():
+    model = classifier([reply(200, OUTPUT), reply(200, OUTPUT), reply(200, OUTPUT)])
+    assert model.get_predictions(images) == [OUTPUT, OUTPUT]
+    assert not model.batch_supported
@@ -0,0 +1,64 @@
+import json
+import types
+import pytest
+import requests
+from PIL import Image
+
+from RemoteDetectorPool import RemoteDetectorPool
+
+OUTPUTS = {"Items": [], "Elapsed": 0.1}
+
+class FakeClient():
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.posted = []
+
+    def post(self, url, data=None, headers=None, deadline=None):
+        self.posted.append(url)
+        if url in self.down:
+            raise requests.ConnectionError(f"{url} is down")
+        return types.SimpleNamespace(status_code=200, reason="OK", text=json.dumps({"outputs": OUTPUTS}))
+
+    def get(self, url, **kwargs):
+        if url in self.down:
+            raise requests.ConnectionError(f"{url} is down")
+        return types.SimpleNamespace(status_code=405)
+
+@pytest.fixture
+def image():
+    return Image.new("RGB", (10, 10))
+
+def pool(client, **options):
+    pool = RemoteDetectorPool("http://a/detect", ["http://b/detect"], probe_interval=3600, client=client, **options)
+    pool.close()
+    return pool
+
+def test_unknown_options_are_rejected():
+    with pytest.raises(TypeError):
+        pool(FakeClient(), probe_intreval=5)
+
+def test_failed_request_is_retried_on_another_server(image):
+    client = FakeClient(down=["http://a/detect"])
+    detectors = pool(client)
+    assert detectors.get_prediction(image) == OUTPUTS
+    assert client.posted == ["http://a/detect", "http://b/detect"]
+    assert detectors.stats()["http://a/detect"]["failures"] == 1
+
+def test_server_is_ejected_after_failures_in_a_row(image):
+    client = FakeClient(down=["http://a/detect"])
+    detectors = pool(client, eject_after=2)
+    for _ in range(3):
+        assert detectors.get_prediction(image) == OUTPUTS
+    stats = detectors.stats()["http://a/detect"]
+    assert not stats["healthy"] and stats["ejections"] == 1
+    assert client.posted.count("http://a/detect") == 2
+
+def test_no_answer_when_every_server_is_down(image):
+    detectors = pool(FakeClient(down=["http://a/detect", "http://b/detect"]))
+    assert detectors.get_prediction(image) is None
+
+def test_probe_counts_any_reply_but_not_a_connection_error():
+    detectors = pool(FakeClient(down=["http://b/detect"]))
+    a, b = detectors.nodes
+    assert detectors.probe(a)
+    assert not detectors.probe(b)
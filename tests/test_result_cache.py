@@ -0,0 +1,44 @@
+from PIL import Image, ImageDraw
+
+import ResultCache
+from ResultCache import ResultCache as Cache
+
+def zone_image(square_at=None):
+    image = Image.new("RGB", (300, 300), "green")
+    if square_at is not None:
+        ImageDraw.Draw(image).rectangle((square_at, square_at, square_at + 60, square_at + 60), fill="grey")
+    return image
+
+def test_unchanged_zone_image_hits():
+    cache = Cache()
+    cache.put("url", cache.key(zone_image(100), 3), "Pigeon")
+    assert cache.get("url", cache.key(zone_image(100), 3)) == "Pigeon"
+    assert cache.stats()["hits"] == 1
+
+def test_changed_zone_image_misses():
+    cache = Cache()
+    cache.put("url", cache.key(zone_image(), 3), "Lawn")
+    assert cache.get("url", cache.key(zone_image(100), 3)) is None
+    assert cache.stats()["misses"] == 1
+
+def test_same_image_in_another_zone_or_endpoint_misses():
+    cache = Cache()
+    cache.put("url", cache.key(zone_image(), 3), "Lawn")
+    assert cache.get("url", cache.key(zone_image(), 4)) is None
+    assert cache.get("other-url", cache.key(zone_image(), 3)) is None
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ResultCache.time, "time", lambda: now[0])
+    cache = Cache(ttl=60)
+    cache.put("url", cache.key(zone_image(), 3), "Lawn")
+    now[0] += 61
+    assert cache.get("url", cache.key(zone_image(), 3)) is None
+    assert cache.stats()["expired"] == 1
+
+def test_least_recently_used_entry_is_dropped():
+    cache = Cache(max_entries=2)
+    for zone in range(3):
+        cache.put("url", cache.key(zone_image(), zone), zone)
+    assert cache.get("url", cache.key(zone_image(), 0)) is None
+    assert cache.get("url", cache.key(zone_image(), 2)) == 2
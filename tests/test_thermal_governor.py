@@ -0,0 +1,56 @@
+import pytest
+
+from pigeonator.ThermalGovernor import ThermalGovernor, interpolate
+
+CURVES = {"frame_delay": [[60, 0], [80, 2]], "detect_interval": [[70, 0], [80, 10]]}
+
+class Thermometer():
+    def __init__(self, *readings):
+        self.readings = list(readings)
+
+    def __call__(self):
+        reading = self.readings.pop(0)
+        if isinstance(reading, Exception):
+            raise reading
+        return reading
+
+def governor(*readings, smoothing=1.0):
+    thermal = ThermalGovernor(Thermometer(*readings), CURVES, interval=3600, smoothing=smoothing)
+    thermal.close()
+    return thermal
+
+def test_interpolate_holds_the_end_values():
+    curve = [[80, 2], [60, 0]]
+    assert interpolate(curve, 50) == 0
+    assert interpolate(curve, 70) == 1
+    assert interpolate(curve, 90) == 2
+
+def test_settings_follow_their_curves():
+    thermal = governor(75)
+    assert thermal.value("frame_delay") == pytest.approx(1.5)
+    assert thermal.value("detect_interval") == pytest.approx(5)
+    assert thermal.value("missing", default=7) == 7
+
+def test_temperature_is_smoothed():
+    thermal = governor(60, 80, smoothing=0.5)
+    thermal.sample()
+    assert thermal.temperature == 70
+    assert thermal.raw_temperature == 80
+
+def test_throttling_episodes_are_counted():
+    thermal = governor(50, 65, 70, 55, 65)
+    assert not thermal.throttling
+    for _ in range(4):
+        thermal.sample()
+    stats = thermal.stats()
+    assert stats["throttling"] and stats["throttle_count"] == 2
+
+def test_failed_reading_keeps_the_last_temperature():
+    thermal = governor(75, OSError("no sensor"))
+    thermal.sample()
+    assert thermal.temperature == 75
+
+def test_cool_values_before_any_reading():
+    thermal = governor(OSError("no sensor"))
+    assert thermal.value("frame_delay") == 0
+    assert thermal.stats()["temperature"] is None
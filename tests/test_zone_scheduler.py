@@ -0,0 +1,51 @@
+import types
+from PIL import Image
+
+from ZoneScheduler import ZoneScheduler, count_history
+
+def zones(count, inactive=()):
+    return [types.SimpleNamespace(id=n, is_active=n not in inactive) for n in range(count)]
+
+def thumbnail(shade):
+    return Image.new("RGB", (100, 100), (shade, shade, shade))
+
+def visit_all(scheduler, now):
+    for zone in scheduler.zones:
+        scheduler.visited(zone.id, thumbnail(100), now)
+
+def test_zones_in_turn_without_adaptive():
+    scheduler = ZoneScheduler(zones(4, inactive=[2]), adaptive=False)
+    assert [scheduler.next_zone().id for _ in range(4)] == [0, 1, 3, 0]
+
+def test_zones_never_classified_go_first():
+    scheduler = ZoneScheduler(zones(3))
+    scheduler.visited(0, thumbnail(100), 1000)
+    assert scheduler.next_zone(1001).id == 1
+
+def test_changed_zone_is_picked():
+    scheduler = ZoneScheduler(zones(3))
+    visit_all(scheduler, 1000)
+    scheduler.observe(2, thumbnail(140))
+    assert scheduler.next_zone(1001).id == 2
+
+def test_zone_with_a_recent_detection_is_picked():
+    scheduler = ZoneScheduler(zones(3))
+    visit_all(scheduler, 1000)
+    scheduler.detected(1, 1000)
+    assert scheduler.next_zone(1001).id == 1
+
+def test_overdue_zone_is_forced_ahead_of_motion():
+    scheduler = ZoneScheduler(zones(3), max_revisit=30)
+    visit_all(scheduler, 1020)
+    scheduler.visited(0, thumbnail(100), 1000)
+    scheduler.observe(2, thumbnail(200))
+    assert scheduler.next_zone(1030).id == 0
+    assert scheduler.stats()["forced"] == 1
+
+def test_no_zone_when_none_are_active():
+    assert ZoneScheduler(zones(2, inactive=[0, 1])).next_zone() is None
+
+def test_history_is_counted_from_saved_images(tmp_path):
+    for name in ["im1-20240501060000-123.jpg", "im1-20240501060001-456-1.jpg", "im3-20240501060000-123.jpg", "im9-20240501060000-123.jpg", "frame-20240501060000-123.jpg"]:
+        (tmp_path / name).write_bytes(b"")
+    assert count_history(str(tmp_path), 4) == [0, 2, 0, 1]